@@ -1,10 +1,12 @@
 from create_agent import create_agent
 from tools.basetool import execute_code, execute_command
 from tools.FileEdit import read_document
+from tools.sql_engine import query_data, list_data_tables
+from tools.approx import approx_query
 
 def create_code_agent(power_llm, members, working_directory):
     """Create the code agent"""
-    tools = [read_document, execute_code, execute_command]
+    tools = [read_document, execute_code, execute_command, query_data, list_data_tables, approx_query]
     system_prompt = """
     You are an expert Python programmer specializing in data processing and analysis. Your main responsibilities include:
 
@@ -17,11 +19,15 @@ def create_code_agent(power_llm, members, working_directory):
     - Focus solely on data processing tasks; do not generate visualizations or write non-Python code.
     - Provide only valid, executable Python code, including necessary comments for complex logic.
     - Avoid unnecessary complexity; prioritize readability and efficiency.
+    - Code runs in a persistent Python session: variables and DataFrames from your earlier execute_code calls are still loaded, so reuse them instead of re-reading data.
+    - For CSV files too large to load at once, `import datastream` (in the working directory): datastream.aggregate, filter_rows, sample and iter_chunks stream the file in chunks with bounded memory.
+    - For quick questions about the CSV files (counts, filters, group-bys, joins), use query_data with SQL instead of running code; for exploratory checks on very large files, approx_query gives estimates with confidence intervals from a sample.
     """
     return create_agent(
         power_llm,
         tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="code_agent"
     )
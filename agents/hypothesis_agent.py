@@ -1,19 +1,29 @@
 from create_agent import create_agent
 from tools.FileEdit import collect_data
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
+from tools.dataset_profile import profile_dataset
+from tools.dataset_tools import aggregate_data, filter_data, sample_data
+from tools.sql_engine import query_data, list_data_tables
+from tools.approx import approx_query
 from tools.internet import google_search, scrape_webpages_with_fallback
-from langchain_community.agent_toolkits.load_tools import load_tools
+from tools.sources import wikipedia, arxiv_search, read_stored_document
 
 def create_hypothesis_agent(llm, members, working_directory):
     """Create the hypothesis agent"""
-    wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
     base_tools = [
         collect_data, 
+        profile_dataset,
+        aggregate_data,
+        filter_data,
+        sample_data,
+        query_data,
+        list_data_tables,
+        approx_query,
         wikipedia, 
         google_search, 
-        scrape_webpages_with_fallback
-    ] + load_tools(["arxiv"],)
+        scrape_webpages_with_fallback,
+        arxiv_search,
+        read_stored_document
+    ]
     
     system_prompt = '''
     As an esteemed expert in data analysis, your task is to formulate a set of research hypotheses and outline the steps to be taken based on the information table provided. Utilize statistics, machine learning, deep learning, and artificial intelligence in developing these hypotheses. Your hypotheses should be precise, achievable, professional, and innovative. To ensure the feasibility and uniqueness of your hypotheses, thoroughly investigate relevant information. For each hypothesis, include ample references to support your claims.
@@ -33,5 +43,6 @@ def create_hypothesis_agent(llm, members, working_directory):
         base_tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="hypothesis_agent"
     )
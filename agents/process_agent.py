@@ -36,6 +36,9 @@ def create_process_agent(power_llm):
     4. Adjust the analysis and reporting process based on emerging results and insights.
     5. Compile the final report, ensuring all sections are complete and well-integrated.
 
+    **Parallel Work:**
+    When two or more tasks do not depend on each other (for example a literature search and a data-cleaning script), list all of them in "assignments" so the agents work on them at the same time. Keep dependent steps sequential.
+
     **Completion Criteria:**
     Respond with "FINISH" only when:
     1. The hypothesis has been thoroughly tested and validated.
@@ -19,5 +19,6 @@ def create_quality_review_agent(llm, members, working_directory):
         tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="quality_review_agent"
     )
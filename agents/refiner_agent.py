@@ -1,21 +1,20 @@
 from create_agent import create_agent
 from tools.FileEdit import create_document, read_document, edit_document
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
 from tools.internet import google_search, scrape_webpages_with_fallback
-from langchain_community.agent_toolkits.load_tools import load_tools
+from tools.sources import wikipedia, arxiv_search, read_stored_document
 
 def create_refiner_agent(power_llm, members, working_directory):
     """Create the refiner agent"""
-    wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
     tools = [
         create_document, 
         read_document, 
         edit_document,
         wikipedia, 
         google_search, 
-        scrape_webpages_with_fallback
-    ] + load_tools(["arxiv"],)
+        scrape_webpages_with_fallback,
+        arxiv_search,
+        read_stored_document
+    ]
     
     system_prompt = '''
     You are an expert AI report refiner tasked with optimizing and enhancing research reports. Your responsibilities include:
@@ -41,5 +40,6 @@ def create_refiner_agent(power_llm, members, working_directory):
         tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="refiner_agent"
     )
@@ -24,5 +24,6 @@ def create_report_agent(power_llm, members, working_directory):
         tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="report_agent"
     )
@@ -1,21 +1,22 @@
 from create_agent import create_agent
 from tools.FileEdit import create_document, read_document, collect_data
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
+from tools.dataset_profile import profile_dataset
 from tools.internet import google_search, scrape_webpages_with_fallback
-from langchain_community.agent_toolkits.load_tools import load_tools
+from tools.sources import wikipedia, arxiv_search, read_stored_document
 
 def create_search_agent(llm, members, working_directory):
     """Create the search agent"""
-    wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
     tools = [
         create_document, 
         read_document, 
         collect_data, 
+        profile_dataset,
         wikipedia, 
         google_search, 
-        scrape_webpages_with_fallback
-    ] + load_tools(["arxiv"],)
+        scrape_webpages_with_fallback,
+        arxiv_search,
+        read_stored_document
+    ]
     
     system_prompt = """
     You are a skilled research assistant responsible for gathering and summarizing relevant information. Your main tasks include:
@@ -28,11 +29,13 @@ def create_search_agent(llm, members, working_directory):
     - Focus exclusively on information retrieval and summarization; do not engage in data analysis or processing.
     - Present information in an organized format, with clear attributions to sources.
     - Evaluate the credibility of sources and prioritize high-quality, reliable information.
+    - Fetched sources are shared with the other agents and tagged with a document ID such as [doc-3]; refer to them by that ID and use read_stored_document to re-read them instead of fetching them again.
     """
     return create_agent(
         llm,
         tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="searcher_agent"
     )
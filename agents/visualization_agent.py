@@ -24,11 +24,14 @@ def create_visualization_agent(llm, members, working_directory):
     - Focus solely on visualization tasks; do not perform data analysis or preprocessing.
     - Ensure all visual elements are suitable for the target audience, with attention to color schemes and design principles.
     - Avoid over-complicating visualizations; aim for clarity and simplicity.
+    - Code runs in a persistent Python session: data loaded by your earlier execute_code calls is still available, so reuse it instead of re-reading files.
+    - For CSV files too large to load at once, `import datastream` (in the working directory): datastream.aggregate, filter_rows, sample and iter_chunks stream the file in chunks with bounded memory.
     """
     return create_agent(
         llm,
         tools,
         system_prompt,
         members,
-        working_directory
+        working_directory,
+        agent_name="visualization_agent"
     )
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from langchain_core.tools import BaseTool, StructuredTool, Tool
+from load_cfg import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_LATENCY, CASSETTE_LOOSE_MATCH
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Tools that reach the network or execute code and are therefore recorded, and
+# tools reading the session document store, which replayed fetches leave empty
+RECORDED_TOOLS = {
+    "google_search",
+    "scrape_webpage",
+    "firecrawl_scrape_webpage",
+    "scrape_webpages_with_fallback",
+    "execute_code",
+    "execute_command",
+    "wikipedia",
+    "arxiv",
+    "read_stored_document",
+    "search_workspace",
+}
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when a call has no recorded response."""
+
+class Cassette:
+    """
+    Record every LLM and tool call of a session to a JSON Lines file and serve
+    them back offline.
+
+    Calls are matched on a hash of their full request, and a replayed call
+    without a recording raises CassetteMissError. With ``loose_match`` the next
+    unplayed recording of the same model or tool is served instead; every such
+    mismatch is logged and counted, as the replay is then no longer exact.
+    """
+
+    MODES = ("off", "record", "replay")
+
+    def __init__(self, path: str, mode: str = "off", latency: float = 0.0, loose_match: bool = False):
+        """
+        Args:
+            path (str): Location of the cassette file.
+            mode (str): One of 'off', 'record' or 'replay'.
+            latency (float): Seconds to sleep before serving each replayed call.
+            loose_match (bool): Serve the next recording of the same model or tool when nothing matches exactly.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid cassette mode: {mode}. Expected one of {self.MODES}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.loose_match = loose_match
+        self.recorded = 0
+        self.replayed = 0
+        self.mismatched = 0
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[int]] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._played = set()
+
+        if mode == "record":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Start a fresh recording for every session
+            open(path, "w", encoding="utf-8").close()
+            logger.info(f"Recording cassette to {path}")
+        elif mode == "replay":
+            self._load()
+            logger.info(f"Replaying {len(self._entries)} recorded calls from {path}")
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    @staticmethod
+    def request_key(kind: str, name: str, request: str) -> str:
+        return hashlib.sha256(f"{kind}\x00{name}\x00{request}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        position = len(self._entries)
+        self._entries.append(entry)
+        self._by_key.setdefault(entry["key"], []).append(position)
+        self._by_name.setdefault(f"{entry['kind']}:{entry['name']}", []).append(position)
+
+    def record(self, kind: str, name: str, request: str, response: Any) -> None:
+        """Append a call and its response to the cassette file."""
+        entry = {"kind": kind, "name": name, "key": self.request_key(kind, name, request), "response": response}
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def play(self, kind: str, name: str, request: str) -> Any:
+        """Return the recorded response for a call, raising CassetteMissError if none exists."""
+        key = self.request_key(kind, name, request)
+        with self._lock:
+            matches = self._by_key.get(key, [])
+            position = next((p for p in matches if p not in self._played), None)
+            if position is None and matches:
+                # Identical calls repeated more often than recorded reuse the last recording
+                position = matches[-1]
+            if position is None and self.loose_match:
+                # Fall back to the next unplayed call of the same model or tool
+                position = next((p for p in self._by_name.get(f"{kind}:{name}", []) if p not in self._played), None)
+                if position is not None:
+                    self.mismatched += 1
+                    logger.warning(f"No exact cassette match for {kind} '{name}', serving next recorded call ({self.mismatched} mismatches)")
+            if position is None:
+                raise CassetteMissError(f"No recorded response for {kind} '{name}' in {self.path}")
+            self._played.add(position)
+            self.replayed += 1
+            return self._entries[position]["response"]
+
+    def llm_cache(self, inner: Optional[BaseCache] = None) -> "CassetteLLMCache":
+        """Return a LangChain cache that records or replays model calls."""
+        return CassetteLLMCache(self, inner)
+
+    def call_tool(self, tool: BaseTool, tool_input: Any) -> Any:
+        """Run a tool through the cassette."""
+        request = json.dumps(tool_input, sort_keys=True, default=str)
+        if self.mode == "replay":
+            if self.latency:
+                time.sleep(self.latency)
+            return self.play("tool", tool.name, request)
+        result = tool.invoke(tool_input)
+        self.record("tool", tool.name, request, result)
+        return result
+
+    async def acall_tool(self, tool: BaseTool, tool_input: Any) -> Any:
+        """Async variant of call_tool."""
+        request = json.dumps(tool_input, sort_keys=True, default=str)
+        if self.mode == "replay":
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.play("tool", tool.name, request)
+        result = await tool.ainvoke(tool_input)
+        self.record("tool", tool.name, request, result)
+        return result
+
+    def wrap_tool(self, tool: BaseTool) -> BaseTool:
+        """Return a tool routed through the cassette, or the tool itself if it is not recorded."""
+        if not self.active or tool.name not in RECORDED_TOOLS:
+            return tool
+
+        if tool.args_schema is None:
+            return Tool(
+                name=tool.name,
+                description=tool.description,
+                func=lambda tool_input: self.call_tool(tool, tool_input),
+                coroutine=lambda tool_input: self.acall_tool(tool, tool_input),
+            )
+
+        def run(**kwargs):
+            return self.call_tool(tool, kwargs)
+
+        async def arun(**kwargs):
+            return await self.acall_tool(tool, kwargs)
+
+        return StructuredTool.from_function(
+            func=run,
+            coroutine=arun,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            infer_schema=False,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "path": self.path, "recorded": self.recorded, "replayed": self.replayed, "mismatched": self.mismatched}
+
+class CassetteLLMCache(BaseCache):
+    """LangChain cache adapter that records model responses or serves them from a cassette."""
+
+    def __init__(self, cassette: Cassette, inner: Optional[BaseCache] = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    @staticmethod
+    def _name(llm_string: str) -> str:
+        return hashlib.sha256(llm_string.encode("utf-8")).hexdigest()[:16]
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        name = self._name(llm_string)
+        if self.cassette.mode == "replay":
+            if self.cassette.latency:
+                time.sleep(self.cassette.latency)
+            return loads(self.cassette.play("llm", name, llm_string + prompt))
+        cached = self.inner.lookup(prompt, llm_string) if self.inner else None
+        if cached is not None:
+            # Responses served by the response cache are part of the session too
+            self.cassette.record("llm", name, llm_string + prompt, dumps(cached))
+        return cached
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.cassette.mode == "record":
+            self.cassette.record("llm", self._name(llm_string), llm_string + prompt, dumps(return_val))
+        if self.inner:
+            self.inner.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        if self.inner:
+            self.inner.clear(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        inner_stats = self.inner.stats() if self.inner is not None and hasattr(self.inner, "stats") else {}
+        return {**inner_stats, "cassette": self.cassette.stats()}
+
+_cassette: Optional[Cassette] = None
+
+def get_cassette() -> Cassette:
+    """Return the process-wide cassette configured from the environment."""
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY, CASSETTE_LOOSE_MATCH)
+    return _cassette
@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from load_cfg import CONTEXT_TOKEN_BUDGET, CONTEXT_KEEP_RECENT, AGENT_CONTEXT_BUDGETS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a multi-agent research session. "
+    "Update the current summary with the new conversation turns. Keep every decision, "
+    "finding, file name, number and open task; drop pleasantries and repetition. "
+    "Answer with the updated summary only."
+)
+
+_encoding = None
+_encoding_failed = False
+
+# Per-agent context statistics for the current process
+_context_stats: Dict[str, Dict[str, int]] = {}
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with the GPT-4o tokenizer, falling back to a 4-characters-per-token
+    estimate when tiktoken or its encoding files are unavailable.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"Tokenizer unavailable, estimating token counts: {e}")
+            _encoding_failed = True
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def count_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Count the tokens of a message list, including a small per-message overhead."""
+    return sum(count_tokens(str(message.content)) + 4 for message in messages)
+
+def get_context_stats() -> Dict[str, Dict[str, int]]:
+    """Return token usage and savings per agent since the process started."""
+    return {name: dict(stats) for name, stats in _context_stats.items()}
+
+def get_context_budget(agent_name: str) -> int:
+    """Return the configured message token budget for an agent."""
+    return int(AGENT_CONTEXT_BUDGETS.get(agent_name, CONTEXT_TOKEN_BUDGET))
+
+class ContextWindow:
+    """
+    Keep the message history sent to an agent under a token budget.
+
+    The original user request and the first hypothesis are always kept, the most
+    recent turns are kept verbatim and everything in between is replaced by a
+    rolling summary. Summaries are cached by a hash of the summarized prefix and
+    shared by all agents, so a growing history only summarizes its new turns.
+    """
+
+    # Rolling summaries keyed by the digest of the message prefix they cover
+    _summaries: "OrderedDict[str, str]" = OrderedDict()
+    _summaries_lock = threading.Lock()
+    MAX_CACHED_SUMMARIES = 256
+
+    def __init__(self, llm: Any, budget: int, keep_recent: int = CONTEXT_KEEP_RECENT, name: str = "agent"):
+        """
+        Args:
+            llm: Chat model used to write the rolling summaries.
+            budget (int): Token budget for the message history, 0 disables trimming.
+            keep_recent (int): Number of most recent messages kept verbatim.
+            name (str): Agent name used in logs.
+        """
+        self.llm = llm
+        self.budget = budget
+        self.keep_recent = max(1, keep_recent)
+        self.name = name
+        self.stats = _context_stats.setdefault(
+            name, {"calls": 0, "trimmed_calls": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0}
+        )
+
+    def fit(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Return a history that fits the budget, summarizing older turns if needed."""
+        plan = self._plan(messages)
+        if plan is None:
+            return list(messages)
+        pinned, older, recent, tokens_in = plan
+        summary, batches, digest = self._summary_steps(older)
+        for batch in batches:
+            summary = self.llm.invoke(self._summary_request(summary, batch)).content
+        self._store_summary(digest, summary)
+        return self._assemble(pinned, summary, recent, tokens_in)
+
+    async def afit(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Async variant of fit."""
+        plan = self._plan(messages)
+        if plan is None:
+            return list(messages)
+        pinned, older, recent, tokens_in = plan
+        summary, batches, digest = self._summary_steps(older)
+        for batch in batches:
+            summary = (await self.llm.ainvoke(self._summary_request(summary, batch))).content
+        self._store_summary(digest, summary)
+        return self._assemble(pinned, summary, recent, tokens_in)
+
+    def as_runnable(self) -> Runnable:
+        """Return a runnable that fits the 'messages' entry of an agent's input."""
+        def fit_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            return {**inputs, "messages": self.fit(inputs.get("messages", []))}
+
+        async def afit_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            return {**inputs, "messages": await self.afit(inputs.get("messages", []))}
+
+        return RunnableLambda(fit_inputs, afunc=afit_inputs, name=f"{self.name}_context_window")
+
+    def _plan(self, messages: Sequence[BaseMessage]) -> Optional[Tuple[List[BaseMessage], List[BaseMessage], List[BaseMessage], int]]:
+        """Split the history into pinned, summarized and recent messages, or None if it fits."""
+        messages = list(messages)
+        tokens_in = count_message_tokens(messages)
+        self.stats["calls"] += 1
+        self.stats["tokens_in"] += tokens_in
+        if not self.budget or tokens_in <= self.budget or len(messages) <= self.keep_recent + 1:
+            self.stats["tokens_out"] += tokens_in
+            return None
+
+        pinned_positions = []
+        if isinstance(messages[0], HumanMessage):
+            pinned_positions.append(0)
+        hypothesis = next((i for i, m in enumerate(messages) if getattr(m, "name", None) == "hypothesis_agent"), None)
+        if hypothesis is not None and hypothesis not in pinned_positions:
+            pinned_positions.append(hypothesis)
+
+        recent_start = max(len(messages) - self.keep_recent, 0)
+        pinned = [messages[i] for i in pinned_positions if i < recent_start]
+        older = [m for i, m in enumerate(messages[:recent_start]) if i not in pinned_positions]
+        recent = messages[recent_start:]
+        return pinned, older, recent, tokens_in
+
+    @staticmethod
+    def _digest(previous: str, message: BaseMessage) -> str:
+        text = f"{previous}\x00{message.type}\x00{getattr(message, 'name', '') or ''}\x00{message.content}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _summary_steps(self, older: List[BaseMessage]) -> Tuple[str, List[List[BaseMessage]], str]:
+        """
+        Find the longest already-summarized prefix of ``older`` and split the
+        remaining messages into batches that each fit the summarizer's budget.
+        """
+        digests = []
+        digest = ""
+        for message in older:
+            digest = self._digest(digest, message)
+            digests.append(digest)
+
+        summary, start = "", 0
+        with self._summaries_lock:
+            for position in range(len(digests) - 1, -1, -1):
+                if digests[position] in self._summaries:
+                    summary = self._summaries[digests[position]]
+                    self._summaries.move_to_end(digests[position])
+                    start = position + 1
+                    break
+
+        batches, batch, batch_tokens = [], [], 0
+        for message in older[start:]:
+            tokens = count_tokens(str(message.content)) + 4
+            if batch and batch_tokens + tokens > self.budget:
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(message)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return summary, batches, digest
+
+    def _store_summary(self, digest: str, summary: str) -> None:
+        if not digest:
+            return
+        with self._summaries_lock:
+            self._summaries[digest] = summary
+            self._summaries.move_to_end(digest)
+            while len(self._summaries) > self.MAX_CACHED_SUMMARIES:
+                self._summaries.popitem(last=False)
+
+    @staticmethod
+    def _summary_request(summary: str, batch: List[BaseMessage]) -> List[BaseMessage]:
+        turns = "\n\n".join(
+            f"[{getattr(message, 'name', None) or message.type}]: {message.content}" for message in batch
+        )
+        return [
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Current summary:\n{summary or '(empty)'}\n\nNew conversation turns:\n{turns}"),
+        ]
+
+    def _assemble(self, pinned: List[BaseMessage], summary: str, recent: List[BaseMessage], tokens_in: int) -> List[BaseMessage]:
+        """Combine the pieces and drop the oldest recent turns if still over budget."""
+        summary_message = [AIMessage(content=f"Summary of earlier conversation:\n{summary}", name="context_summary")] if summary else []
+        recent = list(recent)
+        fitted = pinned + summary_message + recent
+        while len(recent) > 1 and count_message_tokens(fitted) > self.budget:
+            recent.pop(0)
+            fitted = pinned + summary_message + recent
+
+        tokens_out = count_message_tokens(fitted)
+        saved = max(tokens_in - tokens_out, 0)
+        self.stats["trimmed_calls"] += 1
+        self.stats["tokens_out"] += tokens_out
+        self.stats["tokens_saved"] += saved
+        logger.info(f"Context window for {self.name}: {tokens_in} -> {tokens_out} tokens (saved {saved})")
+        return fitted
@@ -0,0 +1,148 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """
+    A persistent key/value store backed by a single SQLite file.
+
+    Entries are evicted least-recently-used first once the total size of the
+    stored values exceeds ``max_bytes``, and expire after ``ttl`` seconds when a
+    TTL is configured. Hit and miss counters are kept per instance.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Open (or create) the cache file.
+
+        Args:
+            path (str): Location of the SQLite file.
+            max_bytes (int, optional): Size budget for stored values, None for unbounded.
+            ttl (float, optional): Default entry lifetime in seconds, None or 0 for no expiry.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, expires REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+        logger.info(f"Disk cache opened: {path}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored value for ``key`` or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires = row
+            if expires is not None and expires <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store ``value`` under ``key`` and evict old entries if over budget."""
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+        expires = now + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed, expires) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), now, now, expires)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def get_json(self, key: str) -> Any:
+        """Return a JSON value stored with ``set_json`` or None."""
+        value = self.get(key)
+        return json.loads(value.decode("utf-8")) if value is not None else None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable value."""
+        self.set(key, json.dumps(value).encode("utf-8"), ttl=ttl)
+
+    def touch(self, key: str, ttl: Optional[float] = None) -> None:
+        """Reset the expiry of an existing entry without rewriting its value."""
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET accessed = ?, expires = ? WHERE key = ?",
+                (now, now + ttl if ttl else None, key)
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+        logger.info(f"Disk cache cleared: {self.path}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters together with the current entry count and size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least-recently-used ones until under budget."""
+        self._conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} entries from {self.path}")
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
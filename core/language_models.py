@@ -1,25 +1,61 @@
+from typing import Optional
 from langchain_openai import ChatOpenAI
 from logger import setup_logger
+from load_cfg import LLM_CACHE_ENABLED, LLM_CACHE_BYPASS, LLM_CACHE_PATH, LLM_CACHE_MAX_MB, LLM_CACHE_TTL
+from core.llm_cache import ResponseCache
+from core.cassette import get_cassette
 
 class LanguageModelManager:
-    def __init__(self):
-        """Initialize the language model manager"""
+    def __init__(self, use_cache: Optional[bool] = None, bypass_cache: Optional[bool] = None):
+        """
+        Initialize the language model manager
+
+        Args:
+            use_cache (bool, optional): Enable the persistent response cache, defaults to LLM_CACHE_ENABLED
+            bypass_cache (bool, optional): Skip cache lookups for this run, defaults to LLM_CACHE_BYPASS
+        """
         self.logger = setup_logger()
         self.llm = None
         self.power_llm = None
         self.json_llm = None
+        self.cache = None
+        use_cache = LLM_CACHE_ENABLED if use_cache is None else use_cache
+        bypass_cache = LLM_CACHE_BYPASS if bypass_cache is None else bypass_cache
+        if use_cache:
+            self.initialize_cache(bypass_cache)
+        cassette = get_cassette()
+        if cassette.active:
+            # The cassette sees every call and delegates to the response cache while recording
+            self.cache = cassette.llm_cache(inner=self.cache)
+            self.logger.info(f"LLM calls routed through cassette ({cassette.mode}): {cassette.path}")
         self.initialize_llms()
 
+    def initialize_cache(self, bypass: bool = False):
+        """Open the disk-backed response cache shared by all models"""
+        try:
+            self.cache = ResponseCache(
+                LLM_CACHE_PATH,
+                max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024),
+                ttl=LLM_CACHE_TTL,
+                bypass=bypass
+            )
+            self.logger.info(f"LLM response cache enabled at {LLM_CACHE_PATH} (bypass={bypass})")
+        except Exception as e:
+            # A broken cache must never prevent the system from running
+            self.logger.warning(f"LLM response cache disabled: {str(e)}")
+            self.cache = None
+
     def initialize_llms(self):
         """Initialize language models"""
         try:
-            self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, max_tokens=4096)
-            self.power_llm = ChatOpenAI(model="gpt-4o", temperature=0.5, max_tokens=4096)
+            self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, max_tokens=4096, cache=self.cache)
+            self.power_llm = ChatOpenAI(model="gpt-4o", temperature=0.5, max_tokens=4096, cache=self.cache)
             self.json_llm = ChatOpenAI(
                 model="gpt-4o",
                 model_kwargs={"response_format": {"type": "json_object"}},
                 temperature=0,
-                max_tokens=4096
+                max_tokens=4096,
+                cache=self.cache
             )
             self.logger.info("Language models initialized successfully.")
         except Exception as e:
@@ -33,3 +69,7 @@ class LanguageModelManager:
             "power_llm": self.power_llm,
             "json_llm": self.json_llm
         }
+
+    def get_cache_stats(self):
+        """Return response cache hit/miss counters, or None when caching is off"""
+        return self.cache.stats() if self.cache else None
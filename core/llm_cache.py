@@ -0,0 +1,59 @@
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from core.disk_cache import DiskCache
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+class ResponseCache(BaseCache):
+    """
+    Exact-match LLM response cache persisted on disk.
+
+    LangChain hands the cache the serialized message list as ``prompt`` and a
+    description of the model call as ``llm_string``; the latter already covers
+    the model name, temperature, model_kwargs such as response_format and any
+    bound functions, so the pair identifies a request exactly.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, ttl: Optional[float] = None, bypass: bool = False):
+        """
+        Args:
+            path (str): Location of the SQLite cache file.
+            max_bytes (int, optional): Size budget, least recently used entries are evicted first.
+            ttl (float, optional): Entry lifetime in seconds.
+            bypass (bool): Skip lookups for this run while still storing fresh responses.
+        """
+        self.store = DiskCache(path, max_bytes=max_bytes, ttl=ttl)
+        self.bypass = bypass
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return cached generations for the request, if any."""
+        if self.bypass:
+            return None
+        value = self.store.get(self._key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            return loads(value.decode("utf-8"))
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the generations returned for the request."""
+        self.store.set(self._key(prompt, llm_string), dumps(return_val).encode("utf-8"))
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove every cached response."""
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current cache size."""
+        return {**self.store.stats(), "bypass": self.bypass}
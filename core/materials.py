@@ -0,0 +1,344 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from langchain_core.messages import HumanMessage
+from core.context_window import count_tokens
+from core.disk_cache import DiskCache
+from load_cfg import REFINER_TOKEN_BUDGET, REFINER_CHUNK_TOKENS, REFINER_MAX_CONCURRENCY, MATERIALS_INDEX_PATH, MATERIALS_INDEX_MAX_MB
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+MAP_PROMPT = (
+    "Summarize part {part} of {parts} of the research report file '{name}'. "
+    "Keep every finding, number, figure or table reference, source and conclusion; "
+    "drop formatting and repetition.\n\n{text}"
+)
+
+REDUCE_PROMPT = (
+    "Merge these summaries of research report files into one shorter summary. "
+    "Keep every finding, number, figure reference, source and conclusion, and keep "
+    "the file names they came from.\n\n{text}"
+)
+
+class ReportMaterials(NamedTuple):
+    """Markdown files (name, content), their content hashes and PNG file names found in the storage path."""
+    md_files: List[Tuple[str, str]]
+    png_names: List[str]
+    md_hashes: List[str]
+
+    def fingerprint(self, *extra: str) -> str:
+        """Hash of every file name and content hash, plus any extra context."""
+        digest = hashlib.sha256()
+        for (name, _), content_hash in zip(self.md_files, self.md_hashes):
+            digest.update(f"md\x00{name}\x00{content_hash}\x00".encode("utf-8"))
+        for name in self.png_names:
+            digest.update(f"png\x00{name}\x00".encode("utf-8"))
+        for value in extra:
+            digest.update(f"extra\x00{value}\x00".encode("utf-8"))
+        return digest.hexdigest()
+
+class MaterialsIndex:
+    """
+    Persistent index of report files keyed by path, mtime and size.
+
+    It caches each file's content and content hash, the summary of each content
+    hash, and the refiner output for each materials fingerprint, so unchanged
+    files are neither re-read nor re-summarized and an unchanged workspace is not
+    refined twice. The store has a size budget with LRU eviction.
+    """
+
+    def __init__(self, path: str = MATERIALS_INDEX_PATH, max_bytes: int = int(MATERIALS_INDEX_MAX_MB * 1024 * 1024)):
+        self.store = DiskCache(path, max_bytes=max_bytes)
+        self.reads = 0
+        self.reuses = 0
+
+    def read(self, md_file: Path) -> Tuple[str, str]:
+        """Return the content and sha256 of a file, reading it only if it changed."""
+        stat = md_file.stat()
+        key = f"file:{md_file.resolve()}"
+        entry = self.store.get_json(key)
+        if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            self.reuses += 1
+            return entry["text"], entry["sha256"]
+
+        with open(md_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.store.set_json(key, {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": content_hash, "text": text})
+        self.reads += 1
+        return text, content_hash
+
+    def get_summary(self, content_hash: str, chunk_tokens: int) -> Optional[str]:
+        return self.store.get_json(f"summary:{chunk_tokens}:{content_hash}")
+
+    def set_summary(self, content_hash: str, chunk_tokens: int, summary: str) -> None:
+        self.store.set_json(f"summary:{chunk_tokens}:{content_hash}", summary)
+
+    def get_refinement(self, fingerprint: str) -> Optional[str]:
+        return self.store.get_json(f"refined:{fingerprint}")
+
+    def set_refinement(self, fingerprint: str, output: str) -> None:
+        self.store.set_json(f"refined:{fingerprint}", output)
+
+_index: Optional[MaterialsIndex] = None
+_index_failed = False
+
+def get_materials_index() -> Optional[MaterialsIndex]:
+    """Return the shared materials index, or None if it cannot be opened."""
+    global _index, _index_failed
+    if _index is None and not _index_failed:
+        try:
+            _index = MaterialsIndex()
+        except Exception as e:
+            # The index is an optimization only, refinement works without it
+            logger.warning(f"Materials index disabled: {e}")
+            _index_failed = True
+    return _index
+
+def collect_materials(storage_path: Path, index: Optional[MaterialsIndex] = None) -> ReportMaterials:
+    """
+    Read every Markdown file and list every PNG file in the storage path.
+    With an index, files whose mtime and size are unchanged are served from it.
+    """
+    md_files, md_hashes = [], []
+    for md_file in sorted(storage_path.glob("*.md")):
+        if index is not None:
+            text, content_hash = index.read(md_file)
+        else:
+            with open(md_file, "r", encoding="utf-8") as f:
+                text = f.read()
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        md_files.append((md_file.name, text))
+        md_hashes.append(content_hash)
+    png_names = [png_file.name for png_file in sorted(storage_path.glob("*.png"))]
+    if index is not None:
+        logger.info(f"Materials index: {index.reads} files read, {index.reuses} reused so far")
+    return ReportMaterials(md_files, png_names, md_hashes)
+
+def format_materials(sections: List[str], png_names: List[str], title: str = "Report materials") -> str:
+    """Combine material sections and PNG file names into a single message body."""
+    parts = sections + [f"PNG file: '{name}'" for name in png_names]
+    return f"{title}:\n" + "\n\n".join(parts)
+
+def file_names_only(materials: ReportMaterials) -> str:
+    """Describe the materials by file name only."""
+    names = [f"MD file: '{name}'" for name, _ in materials.md_files]
+    names += [f"PNG file: '{name}'" for name in materials.png_names]
+    return "Report materials (file names only):\n" + "\n".join(names)
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens, preferring paragraph boundaries
+    and falling back to line and character splits for oversized paragraphs.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in text.split("\n\n"):
+        pieces = [paragraph]
+        if count_tokens(paragraph) > max_tokens:
+            pieces = _split_oversized(paragraph, max_tokens)
+        for piece in pieces:
+            tokens = count_tokens(piece) + 1
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _split_oversized(paragraph: str, max_tokens: int) -> List[str]:
+    pieces, current, current_tokens = [], [], 0
+    for line in paragraph.split("\n"):
+        tokens = count_tokens(line) + 1
+        if tokens > max_tokens:
+            # A single huge line: cut it by characters at roughly the token budget
+            width = max(max_tokens * 4, 1)
+            pieces.extend(line[i:i + width] for i in range(0, len(line), width))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+class MaterialsPacker:
+    """
+    Fit report materials into the refiner's token budget.
+
+    If every file fits, the files are passed through verbatim. Otherwise the files
+    are chunked and summarized concurrently (map), and the summaries are merged
+    until they fit (reduce). With an index, file summaries are cached by content
+    hash so only new or changed files are summarized. Without a summarizer the
+    files that fit are kept and the rest are listed by name.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Any] = None,
+        budget: int = REFINER_TOKEN_BUDGET,
+        chunk_tokens: int = REFINER_CHUNK_TOKENS,
+        max_concurrency: int = REFINER_MAX_CONCURRENCY,
+        max_reduce_rounds: int = 3,
+        index: Optional[MaterialsIndex] = None
+    ):
+        self.summarizer = summarizer
+        self.index = index
+        self.budget = budget
+        self.chunk_tokens = min(chunk_tokens, budget)
+        self.max_concurrency = max_concurrency
+        self.max_reduce_rounds = max_reduce_rounds
+
+    def pack(self, materials: ReportMaterials) -> str:
+        """Return the materials message body, summarizing with the summarizer if needed."""
+        content = self._verbatim(materials)
+        if content is not None:
+            return content
+        if self.summarizer is None:
+            return self._truncated(materials)
+
+        summaries = self._cached_summaries(materials)
+        jobs = self._map_jobs(materials, summaries)
+        outputs = self.summarizer.batch(
+            [prompt for _, _, prompt in jobs],
+            config={"max_concurrency": self.max_concurrency},
+            return_exceptions=True
+        ) if jobs else []
+        sections = self._map_sections(materials, summaries, jobs, outputs)
+        for _ in range(self.max_reduce_rounds):
+            if self._fits(sections, materials.png_names):
+                break
+            prompts = self._reduce_prompts(sections)
+            outputs = self.summarizer.batch(
+                prompts, config={"max_concurrency": self.max_concurrency}, return_exceptions=True
+            )
+            sections = self._reduce_sections(sections, prompts, outputs)
+        return self._summarized(sections, materials)
+
+    async def apack(self, materials: ReportMaterials) -> str:
+        """Async variant of pack."""
+        content = self._verbatim(materials)
+        if content is not None:
+            return content
+        if self.summarizer is None:
+            return self._truncated(materials)
+
+        summaries = self._cached_summaries(materials)
+        jobs = self._map_jobs(materials, summaries)
+        outputs = await self.summarizer.abatch(
+            [prompt for _, _, prompt in jobs],
+            config={"max_concurrency": self.max_concurrency},
+            return_exceptions=True
+        ) if jobs else []
+        sections = self._map_sections(materials, summaries, jobs, outputs)
+        for _ in range(self.max_reduce_rounds):
+            if self._fits(sections, materials.png_names):
+                break
+            prompts = self._reduce_prompts(sections)
+            outputs = await self.summarizer.abatch(
+                prompts, config={"max_concurrency": self.max_concurrency}, return_exceptions=True
+            )
+            sections = self._reduce_sections(sections, prompts, outputs)
+        return self._summarized(sections, materials)
+
+    def _fits(self, sections: List[str], png_names: List[str]) -> bool:
+        return count_tokens(format_materials(sections, png_names)) <= self.budget
+
+    def _verbatim(self, materials: ReportMaterials) -> Optional[str]:
+        sections = [f"MD file '{name}':\n{text}" for name, text in materials.md_files]
+        content = format_materials(sections, materials.png_names)
+        tokens = count_tokens(content)
+        if tokens <= self.budget:
+            logger.info(f"Report materials fit the refiner budget ({tokens}/{self.budget} tokens)")
+            return content
+        logger.info(f"Report materials exceed the refiner budget ({tokens}/{self.budget} tokens), condensing")
+        return None
+
+    def _truncated(self, materials: ReportMaterials) -> str:
+        """Keep whole files in order while they fit and list the rest by name."""
+        sections, omitted = [], []
+        for name, text in materials.md_files:
+            section = f"MD file '{name}':\n{text}"
+            if not omitted and self._fits(sections + [section], materials.png_names):
+                sections.append(section)
+            else:
+                omitted.append(f"MD file (not included, over budget): '{name}'")
+        logger.warning(f"No summarizer available, {len(omitted)} report files listed by name only")
+        return format_materials(sections + omitted, materials.png_names)
+
+    def _cached_summaries(self, materials: ReportMaterials) -> Dict[str, str]:
+        """Return the summaries already known for unchanged files, by file name."""
+        if self.index is None:
+            return {}
+        summaries = {}
+        for (name, _), content_hash in zip(materials.md_files, materials.md_hashes):
+            summary = self.index.get_summary(content_hash, self.chunk_tokens)
+            if summary is not None:
+                summaries[name] = summary
+        return summaries
+
+    def _map_jobs(self, materials: ReportMaterials, summaries: Dict[str, str]) -> List[Tuple[str, str, List[HumanMessage]]]:
+        jobs = []
+        for name, text in materials.md_files:
+            if name in summaries:
+                continue
+            chunks = chunk_text(text, self.chunk_tokens) or [""]
+            for part, chunk in enumerate(chunks, start=1):
+                prompt = MAP_PROMPT.format(part=part, parts=len(chunks), name=name, text=chunk)
+                jobs.append((name, chunk, [HumanMessage(content=prompt)]))
+        logger.info(
+            f"Summarizing {len(jobs)} chunks from {len(materials.md_files) - len(summaries)} report files "
+            f"({len(summaries)} unchanged files reuse their summaries)"
+        )
+        return jobs
+
+    def _map_sections(
+        self,
+        materials: ReportMaterials,
+        summaries: Dict[str, str],
+        jobs: List[Tuple[str, str, Any]],
+        outputs: List[Any]
+    ) -> List[str]:
+        """Group chunk summaries into one section per file, in file order."""
+        new_summaries: Dict[str, List[str]] = {}
+        failed = set()
+        for (name, chunk, _), output in zip(jobs, outputs):
+            if isinstance(output, Exception):
+                failed.add(name)
+            new_summaries.setdefault(name, []).append(self._output_text(output, chunk))
+
+        hashes = dict(zip((name for name, _ in materials.md_files), materials.md_hashes))
+        for name, parts in new_summaries.items():
+            summaries[name] = "\n".join(parts)
+            if self.index is not None and name not in failed and name in hashes:
+                self.index.set_summary(hashes[name], self.chunk_tokens, summaries[name])
+
+        return [f"MD file '{name}' (summary):\n{summaries[name]}" for name, _ in materials.md_files if name in summaries]
+
+    def _reduce_prompts(self, sections: List[str]) -> List[List[HumanMessage]]:
+        groups = chunk_text("\n\n".join(sections), self.chunk_tokens)
+        return [[HumanMessage(content=REDUCE_PROMPT.format(text=group))] for group in groups]
+
+    def _reduce_sections(self, sections: List[str], prompts: List[Any], outputs: List[Any]) -> List[str]:
+        reduced = [self._output_text(output, prompt[0].content) for prompt, output in zip(prompts, outputs)]
+        if len(reduced) >= len(sections):
+            # Merging did not shrink the material count, cut the summaries instead
+            width = max(self.budget * 4 // max(len(reduced), 1), 1)
+            reduced = [section[:width] for section in reduced]
+        return reduced
+
+    def _output_text(self, output: Any, fallback: str) -> str:
+        if isinstance(output, Exception):
+            logger.warning(f"Summarizing report materials failed: {output}")
+            return fallback[: self.chunk_tokens // 4]
+        return str(getattr(output, "content", output))
+
+    def _summarized(self, sections: List[str], materials: ReportMaterials) -> str:
+        content = format_materials(sections, materials.png_names, title="Report materials (summarized)")
+        logger.info(f"Condensed report materials to {count_tokens(content)} tokens")
+        return content
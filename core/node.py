@@ -1,7 +1,14 @@
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage,ToolMessage
 from openai import InternalServerError
 from core.state import State
+from core.router import get_parallel_assignments
+from core.session import current_agent
+from core.materials import MaterialsPacker, collect_materials, file_names_only, get_materials_index
+from load_cfg import MAX_PARALLEL_AGENTS
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import logging
 import json
 import re
@@ -16,42 +23,148 @@ def agent_node(state: State, agent: AgentExecutor, name: str) -> State:
     Process an agent's action and update the state accordingly.
     """
     logger.info(f"Processing agent: {name}")
+    token = current_agent.set(name)
     try:
         result = agent.invoke(state)
-        logger.debug(f"Agent {name} result: {result}")
-        
-        output = result["output"] if isinstance(result, dict) and "output" in result else str(result)
-        
-        ai_message = AIMessage(content=output, name=name)
-        state["messages"].append(ai_message)
-        state["sender"] = name
-        
-        if name == "hypothesis_agent" and not state["hypothesis"]:
-            state["hypothesis"] = ai_message
-            logger.info("Hypothesis updated")
-        elif name == "process_agent":
-            state["process_decision"] = ai_message
-            logger.info("Process decision updated")
-        elif name == "visualization_agent":
-            state["visualization_state"] = ai_message
-            logger.info("Visualization state updated")
-        elif name == "searcher_agent":
-            state["searcher_state"] = ai_message
-            logger.info("Searcher state updated")
-        elif name == "report_agent":
-            state["report_section"] = ai_message
-            logger.info("Report section updated")
-        elif name == "quality_review_agent":
-            state["quality_review"] = ai_message
-            state["needs_revision"] = "revision needed" in output.lower()
-            logger.info(f"Quality review updated. Needs revision: {state['needs_revision']}")
-        
-        logger.info(f"Agent {name} processing completed")
-        return state
+        return _apply_agent_result(state, result, name)
+    except Exception as e:
+        logger.error(f"Error occurred while processing agent {name}: {str(e)}", exc_info=True)
+        error_message = AIMessage(content=f"Error: {str(e)}", name=name)
+        return {"messages": [error_message]}
+    finally:
+        current_agent.reset(token)
+
+async def aagent_node(state: State, agent: AgentExecutor, name: str) -> State:
+    """
+    Async variant of agent_node using the agent's ainvoke.
+    """
+    logger.info(f"Processing agent (async): {name}")
+    token = current_agent.set(name)
+    try:
+        result = await agent.ainvoke(state)
+        return _apply_agent_result(state, result, name)
     except Exception as e:
         logger.error(f"Error occurred while processing agent {name}: {str(e)}", exc_info=True)
         error_message = AIMessage(content=f"Error: {str(e)}", name=name)
         return {"messages": [error_message]}
+    finally:
+        current_agent.reset(token)
+
+def _result_output(result: Any) -> str:
+    """
+    Extract the output text from an agent result.
+    """
+    return result["output"] if isinstance(result, dict) and "output" in result else str(result)
+
+def _apply_agent_result(state: State, result: Any, name: str) -> State:
+    """
+    Append an agent's output to the state and update the fields it owns.
+    """
+    logger.debug(f"Agent {name} result: {result}")
+    
+    output = _result_output(result)
+    
+    ai_message = AIMessage(content=output, name=name)
+    state["messages"].append(ai_message)
+    state["sender"] = name
+    
+    if name == "hypothesis_agent" and not state["hypothesis"]:
+        state["hypothesis"] = ai_message
+        logger.info("Hypothesis updated")
+    elif name == "process_agent":
+        state["process_decision"] = ai_message
+        logger.info("Process decision updated")
+    elif name == "visualization_agent":
+        state["visualization_state"] = ai_message
+        logger.info("Visualization state updated")
+    elif name == "searcher_agent":
+        state["searcher_state"] = ai_message
+        logger.info("Searcher state updated")
+    elif name == "report_agent":
+        state["report_section"] = ai_message
+        logger.info("Report section updated")
+    elif name == "quality_review_agent":
+        state["quality_review"] = ai_message
+        state["needs_revision"] = "revision needed" in output.lower()
+        logger.info(f"Quality review updated. Needs revision: {state['needs_revision']}")
+    
+    logger.info(f"Agent {name} processing completed")
+    return state
+
+def parallel_node(state: State, workers: Dict[str, Tuple[AgentExecutor, str]]) -> State:
+    """
+    Run the supervisor's independent assignments concurrently and join their results.
+
+    Args:
+        state (State): The current state of the system.
+        workers (Dict[str, Tuple[AgentExecutor, str]]): Agent and agent name for each worker node.
+    """
+    assignments = get_parallel_assignments(state)
+    logger.info(f"Dispatching {len(assignments)} assignments in parallel: {[member for member, _ in assignments]}")
+    worker_states = [_parallel_worker_state(state, member, task) for member, task in assignments]
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_AGENTS, len(assignments)))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, agent_node, worker_state, *workers[member])
+            for (member, _), worker_state in zip(assignments, worker_states)
+        ]
+        results = [future.result() for future in futures]
+    
+    return _merge_parallel_results(state, worker_states, results, [workers[member][1] for member, _ in assignments])
+
+async def aparallel_node(state: State, workers: Dict[str, Tuple[AgentExecutor, str]]) -> State:
+    """
+    Async variant of parallel_node using the agents' ainvoke.
+    """
+    assignments = get_parallel_assignments(state)
+    logger.info(f"Dispatching {len(assignments)} assignments in parallel (async): {[member for member, _ in assignments]}")
+    worker_states = [_parallel_worker_state(state, member, task) for member, task in assignments]
+    semaphore = asyncio.Semaphore(max(1, MAX_PARALLEL_AGENTS))
+    
+    async def run_worker(member: str, worker_state: State) -> State:
+        async with semaphore:
+            return await aagent_node(worker_state, *workers[member])
+    
+    results = await asyncio.gather(*(
+        run_worker(member, worker_state) for (member, _), worker_state in zip(assignments, worker_states)
+    ))
+    
+    return _merge_parallel_results(state, worker_states, list(results), [workers[member][1] for member, _ in assignments])
+
+def _parallel_worker_state(state: State, member: str, task: str) -> State:
+    """
+    Build a private copy of the state for one parallel assignment.
+    """
+    decision = AIMessage(content=str({"next": member, "task": task}), name="process_agent")
+    return {
+        **state,
+        "messages": list(state["messages"]) + [AIMessage(content=f"Task for {member}: {task}", name="process_agent")],
+        "process_decision": decision,
+    }
+
+def _merge_parallel_results(state: State, worker_states: List[State], results: List[State], names: List[str]) -> State:
+    """
+    Join the assignments and outputs of parallel workers back into the shared state,
+    in assignment order, so each output follows the task message that produced it.
+    """
+    original = dict(state)
+    base_length = len(state["messages"])
+    
+    for worker_state, result, name in zip(worker_states, results, names):
+        if result is worker_state:
+            # The worker's messages start with its "Task for X" assignment
+            state["messages"].extend(result["messages"][base_length:])
+            for key, value in result.items():
+                # Only take over the fields this worker actually changed
+                if key not in ("messages", "process_decision", "sender") and value is not original.get(key):
+                    state[key] = value
+        else:
+            state["messages"].append(worker_state["messages"][base_length])
+            state["messages"].extend(result.get("messages", []))
+    
+    state["sender"] = ", ".join(names)
+    logger.info(f"Parallel assignments completed: {names}")
+    return state
 
 def human_choice_node(state: State) -> State:
     """
@@ -105,59 +218,92 @@ def note_agent_node(state: State, agent: AgentExecutor, name: str) -> State:
     Process the note agent's action and update the entire state.
     """
     logger.info(f"Processing note agent: {name}")
+    output = ""
     try:
-        current_messages = state.get("messages", [])
-        
-        head_messages, tail_messages = [], []
-        
-        if len(current_messages) > 6:
-            head_messages = current_messages[:2] 
-            tail_messages = current_messages[-2:]
-            state = {**state, "messages": current_messages[2:-2]}
-            logger.debug("Trimmed messages for processing")
-        
-        result = agent.invoke(state)
-        logger.debug(f"Note agent {name} result: {result}")
-        output = result["output"] if isinstance(result, dict) and "output" in result else str(result)
+        note_state, head_messages, tail_messages = _trim_note_messages(state)
+        result = agent.invoke(note_state)
+        output = _result_output(result)
+        return _build_note_state(note_state, output, name, head_messages, tail_messages, state.get("messages", []))
+    except Exception as e:
+        return _note_error_state(state, e, name, output)
+
+async def anote_agent_node(state: State, agent: AgentExecutor, name: str) -> State:
+    """
+    Async variant of note_agent_node using the agent's ainvoke.
+    """
+    logger.info(f"Processing note agent (async): {name}")
+    output = ""
+    try:
+        note_state, head_messages, tail_messages = _trim_note_messages(state)
+        result = await agent.ainvoke(note_state)
+        output = _result_output(result)
+        return _build_note_state(note_state, output, name, head_messages, tail_messages, state.get("messages", []))
+    except Exception as e:
+        return _note_error_state(state, e, name, output)
 
-        cleaned_output = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', output)
-        parsed_output = json.loads(cleaned_output)
-        logger.debug(f"Parsed output: {parsed_output}")
+def _trim_note_messages(state: State) -> tuple:
+    """
+    Keep the first and last two messages out of long histories sent to the note agent.
+    """
+    current_messages = state.get("messages", [])
+    
+    head_messages, tail_messages = [], []
+    
+    if len(current_messages) > 6:
+        head_messages = current_messages[:2] 
+        tail_messages = current_messages[-2:]
+        state = {**state, "messages": current_messages[2:-2]}
+        logger.debug("Trimmed messages for processing")
+    
+    return state, head_messages, tail_messages
 
-        new_messages = [create_message(msg, name) for msg in parsed_output.get("messages", [])]
-        
-        messages = new_messages if new_messages else current_messages
-        
-        combined_messages = head_messages + messages + tail_messages
-        
-        updated_state: State = {
-            "messages": combined_messages,
-            "hypothesis": str(parsed_output.get("hypothesis", state.get("hypothesis", ""))),
-            "process": str(parsed_output.get("process", state.get("process", ""))),
-            "process_decision": str(parsed_output.get("process_decision", state.get("process_decision", ""))),
-            "visualization_state": str(parsed_output.get("visualization_state", state.get("visualization_state", ""))),
-            "searcher_state": str(parsed_output.get("searcher_state", state.get("searcher_state", ""))),
-            "code_state": str(parsed_output.get("code_state", state.get("code_state", ""))),
-            "report_section": str(parsed_output.get("report_section", state.get("report_section", ""))),
-            "quality_review": str(parsed_output.get("quality_review", state.get("quality_review", ""))),
-            "needs_revision": bool(parsed_output.get("needs_revision", state.get("needs_revision", False))),
-            "sender": 'note_agent'
-        }
-        
-        logger.info("Updated state successfully")
-        return updated_state
+def _build_note_state(state: State, output: str, name: str, head_messages: list, tail_messages: list, current_messages: list) -> State:
+    """
+    Parse the note agent's JSON output into a new state.
+    """
+    logger.debug(f"Note agent {name} result: {output}")
+
+    cleaned_output = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', output)
+    parsed_output = json.loads(cleaned_output)
+    logger.debug(f"Parsed output: {parsed_output}")
+
+    new_messages = [create_message(msg, name) for msg in parsed_output.get("messages", [])]
+    
+    messages = new_messages if new_messages else current_messages
+    
+    combined_messages = head_messages + messages + tail_messages
+    
+    updated_state: State = {
+        "messages": combined_messages,
+        "hypothesis": str(parsed_output.get("hypothesis", state.get("hypothesis", ""))),
+        "process": str(parsed_output.get("process", state.get("process", ""))),
+        "process_decision": str(parsed_output.get("process_decision", state.get("process_decision", ""))),
+        "visualization_state": str(parsed_output.get("visualization_state", state.get("visualization_state", ""))),
+        "searcher_state": str(parsed_output.get("searcher_state", state.get("searcher_state", ""))),
+        "code_state": str(parsed_output.get("code_state", state.get("code_state", ""))),
+        "report_section": str(parsed_output.get("report_section", state.get("report_section", ""))),
+        "quality_review": str(parsed_output.get("quality_review", state.get("quality_review", ""))),
+        "needs_revision": bool(parsed_output.get("needs_revision", state.get("needs_revision", False))),
+        "sender": 'note_agent'
+    }
+    
+    logger.info("Updated state successfully")
+    return updated_state
 
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}", exc_info=True)
+def _note_error_state(state: State, error: Exception, name: str, output: str) -> State:
+    """
+    Map an exception raised while running the note agent to an error state.
+    """
+    if isinstance(error, json.JSONDecodeError):
+        logger.error(f"JSON decode error: {error}", exc_info=True)
         return _create_error_state(state, AIMessage(content=f"Error parsing output: {output}", name=name), name, "JSON decode error")
 
-    except InternalServerError as e:
-        logger.error(f"OpenAI Internal Server Error: {e}", exc_info=True)
-        return _create_error_state(state, AIMessage(content=f"OpenAI Error: {str(e)}", name=name), name, "OpenAI error")
+    if isinstance(error, InternalServerError):
+        logger.error(f"OpenAI Internal Server Error: {error}", exc_info=True)
+        return _create_error_state(state, AIMessage(content=f"OpenAI Error: {str(error)}", name=name), name, "OpenAI error")
 
-    except Exception as e:
-        logger.error(f"Unexpected error in note_agent_node: {e}", exc_info=True)
-        return _create_error_state(state, AIMessage(content=f"Unexpected error: {str(e)}", name=name), name, "Unexpected error")
+    logger.error(f"Unexpected error in note_agent_node: {error}", exc_info=True)
+    return _create_error_state(state, AIMessage(content=f"Unexpected error: {str(error)}", name=name), name, "Unexpected error")
 
 def _create_error_state(state: State, error_message: AIMessage, name: str, error_type: str) -> State:
     """
@@ -218,65 +364,109 @@ def human_review_node(state: State) -> State:
         logger.error(f"An error occurred during human review: {str(e)}", exc_info=True)
         return None
     
-def refiner_node(state: State, agent: AgentExecutor, name: str) -> State:
+def refiner_node(state: State, agent: AgentExecutor, name: str, summarizer: Optional[Any] = None) -> State:
     """
     Read MD file contents and PNG file names from the specified storage path,
-    add them as report materials to a new message,
+    pack them into the refiner's token budget as report materials,
     then process with the agent and update the original state.
-    If token limit is exceeded, use only MD file names instead of full content.
+    Materials over the budget are summarized chunk by chunk with the summarizer
+    model before the refiner sees them. If the materials are unchanged since the
+    previous refinement, its output is reused without calling the agent.
     """
     try:
-        # Get storage path
         storage_path = Path(os.getenv('STORAGE_PATH', 'data'))
-        
-        # Collect materials
-        materials = []
-        md_files = list(storage_path.glob("*.md"))
-        png_files = list(storage_path.glob("*.png"))
-        
-        # Process MD files
-        for md_file in md_files:
-            with open(md_file, "r", encoding="utf-8") as f:
-                materials.append(f"MD file '{md_file.name}':\n{f.read()}")
-        
-        # Process PNG files
-        materials.extend(f"PNG file: '{png_file.name}'" for png_file in png_files)
-        
-        # Combine materials
-        combined_materials = "\n\n".join(materials)
-        report_content = f"Report materials:\n{combined_materials}"
+        index = get_materials_index()
+        materials = collect_materials(storage_path, index)
+        fingerprint = materials.fingerprint(_hypothesis_text(state))
+        previous = index.get_refinement(fingerprint) if index else None
+        if previous is not None:
+            logger.info("Report materials unchanged since the last refinement, reusing it")
+            return _apply_refiner_result(state, previous, name)
+
+        report_content = MaterialsPacker(summarizer, index=index).pack(materials)
         
         # Create refiner state
         refiner_state = state.copy()
         refiner_state["messages"] = [AIMessage(content=report_content, name="materials_agent")]
         
         try:
-            # Attempt to invoke agent with full content
             result = agent.invoke(refiner_state)
-        except Exception as token_error:
-            # If token limit is exceeded, retry with only MD file names
-            logger.warning("Token limit exceeded. Retrying with MD file names only.")
-            md_file_names = [f"MD file: '{md_file.name}'" for md_file in md_files]
-            png_file_names = [f"PNG file: '{png_file.name}'" for png_file in png_files]
-            
-            simplified_materials = "\n".join(md_file_names + png_file_names)
-            simplified_report_content = f"Report materials (file names only):\n{simplified_materials}"
-            
-            refiner_state["messages"] = [BaseMessage(content=simplified_report_content)]
+        except Exception as e:
+            # Last resort if the request still fails: retry with only the file names
+            logger.warning(f"Refiner failed with packed materials ({e}). Retrying with file names only.")
+            refiner_state["messages"] = [AIMessage(content=file_names_only(materials), name="materials_agent")]
             result = agent.invoke(refiner_state)
         
-        # Extract output from result and ensure it's a string
-        output = result["output"] if isinstance(result, dict) and "output" in result else str(result)
+        _remember_refinement(index, storage_path, fingerprint, state, result)
+        return _apply_refiner_result(state, result, name)
+    except Exception as e:
+        logger.error(f"Error occurred while processing refiner node: {str(e)}", exc_info=True)
+        state["messages"].append(AIMessage(content=f"Error: {str(e)}", name=name))
+        return state
+
+async def arefiner_node(state: State, agent: AgentExecutor, name: str, summarizer: Optional[Any] = None) -> State:
+    """
+    Async variant of refiner_node; chunk summaries run concurrently with abatch.
+    """
+    try:
+        storage_path = Path(os.getenv('STORAGE_PATH', 'data'))
+        index = get_materials_index()
+        materials = collect_materials(storage_path, index)
+        fingerprint = materials.fingerprint(_hypothesis_text(state))
+        previous = index.get_refinement(fingerprint) if index else None
+        if previous is not None:
+            logger.info("Report materials unchanged since the last refinement, reusing it")
+            return _apply_refiner_result(state, previous, name)
+
+        report_content = await MaterialsPacker(summarizer, index=index).apack(materials)
         
-        # Update original state with proper AIMessage
-        state["messages"].append(AIMessage(content=output, name=name))
-        state["sender"] = name
+        refiner_state = state.copy()
+        refiner_state["messages"] = [AIMessage(content=report_content, name="materials_agent")]
         
-        logger.info("Refiner node processing completed")
-        return state
+        try:
+            result = await agent.ainvoke(refiner_state)
+        except Exception as e:
+            logger.warning(f"Refiner failed with packed materials ({e}). Retrying with file names only.")
+            refiner_state["messages"] = [AIMessage(content=file_names_only(materials), name="materials_agent")]
+            result = await agent.ainvoke(refiner_state)
+        
+        _remember_refinement(index, storage_path, fingerprint, state, result)
+        return _apply_refiner_result(state, result, name)
     except Exception as e:
         logger.error(f"Error occurred while processing refiner node: {str(e)}", exc_info=True)
         state["messages"].append(AIMessage(content=f"Error: {str(e)}", name=name))
         return state
+
+def _hypothesis_text(state: State) -> str:
+    """The hypothesis as text; the hypothesis agent stores its whole message in the state."""
+    hypothesis = state.get("hypothesis", "")
+    return str(getattr(hypothesis, "content", hypothesis))
+
+def _remember_refinement(index: Any, storage_path: Path, fingerprint: str, state: State, result: Any) -> None:
+    """
+    Store the refiner output under the materials fingerprint from before and
+    after the refinement, since the refiner may itself edit the report files.
+    """
+    if index is None:
+        return
+    output = _result_output(result)
+    index.set_refinement(fingerprint, output)
+    refined = collect_materials(storage_path, index).fingerprint(_hypothesis_text(state))
+    if refined != fingerprint:
+        index.set_refinement(refined, output)
+
+def _apply_refiner_result(state: State, result: Any, name: str) -> State:
+    """
+    Append the refiner's output to the original state.
+    """
+    # Extract output from result and ensure it's a string
+    output = _result_output(result)
+    
+    # Update original state with proper AIMessage
+    state["messages"].append(AIMessage(content=output, name=name))
+    state["sender"] = name
+    
+    logger.info("Refiner node processing completed")
+    return state
     
 logger.info("Agent processing module initialized")
\ No newline at end of file
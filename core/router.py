@@ -1,5 +1,5 @@
 from core.state import State
-from typing import Literal, Union, Dict, List, Optional
+from typing import Literal, Union, Dict, List, Optional, Tuple
 from langchain_core.messages import AIMessage
 import logging
 import json
@@ -10,7 +10,10 @@ logger = logging.getLogger(__name__)
 
 # Define types for node routing
 NodeType = Literal['Visualization', 'Search', 'Coder', 'Report', 'Process', 'NoteTaker', 'Hypothesis', 'QualityReview']
-ProcessNodeType = Literal['Coder', 'Search', 'Visualization', 'Report', 'Process', 'Refiner']
+ProcessNodeType = Literal['Coder', 'Search', 'Visualization', 'Report', 'Process', 'Refiner', 'Parallel']
+
+# Worker nodes the supervisor can assign tasks to
+WORKER_NODES = ("Coder", "Search", "Visualization", "Report")
 
 def hypothesis_router(state: State) -> NodeType:
     """
@@ -78,51 +81,86 @@ def QualityReview_router(state: State) -> NodeType:
         return "NoteTaker"
     
 
-def process_router(state: State) -> ProcessNodeType:
+def parse_process_decision(state: State) -> Dict:
     """
-    Route based on the process decision in the state.
+    Parse the supervisor's latest decision into a dictionary.
 
     Args:
         state (State): The current state of the system.
 
     Returns:
-        ProcessNodeType: The next process node to route to based on the process decision.
+        Dict: The decision with at least a 'next' key, empty if it cannot be parsed.
     """
-    logger.info("Entering process_router")
     process_decision: Union[AIMessage, Dict, str, None] = state.get("process_decision", "")
     
-    decision_str: str = ""
-    
     try:
         if isinstance(process_decision, AIMessage):
             logger.debug("Process decision is an AIMessage")
             try:
                 python_dict = ast.literal_eval(process_decision.content)
                 cleaned_content = json.dumps(python_dict)
-                decision_dict = json.loads(cleaned_content)
-                decision_str = str(decision_dict.get('next', ''))
+                return json.loads(cleaned_content)
             except json.JSONDecodeError as e:
                 logger.warning(f"JSON parse error: {e}. Using content directly.")
-                decision_str = process_decision.content
+                return {"next": process_decision.content}
         elif isinstance(process_decision, dict):
-            decision_str = str(process_decision.get('next', ''))
+            return process_decision
         else:
-            decision_str = str(process_decision)
+            return {"next": str(process_decision)}
     except Exception as e:
         logger.error(f"Error processing decision: {e}")
-        decision_str = ""
+        return {}
+
+def get_parallel_assignments(state: State) -> List[Tuple[str, str]]:
+    """
+    Return the independent (worker, task) pairs the supervisor asked to run concurrently.
+
+    Args:
+        state (State): The current state of the system.
+
+    Returns:
+        List[Tuple[str, str]]: Valid, de-duplicated assignments in the order given.
+    """
+    assignments = parse_process_decision(state).get("assignments") or []
+    valid: List[Tuple[str, str]] = []
+    if not isinstance(assignments, list):
+        return valid
+    for assignment in assignments:
+        if not isinstance(assignment, dict):
+            continue
+        pair = (str(assignment.get("next", "")), str(assignment.get("task", "")))
+        if pair[0] in WORKER_NODES and pair not in valid:
+            valid.append(pair)
+    return valid
+
+def process_router(state: State) -> ProcessNodeType:
+    """
+    Route based on the process decision in the state.
+
+    Args:
+        state (State): The current state of the system.
+
+    Returns:
+        ProcessNodeType: The next process node to route to based on the process decision.
+    """
+    logger.info("Entering process_router")
+    decision_str: str = str(parse_process_decision(state).get('next', ''))
     
     # Define valid decisions
-    valid_decisions = {"Coder", "Search", "Visualization", "Report"}
-    
-    if decision_str in valid_decisions:
-        logger.info(f"Valid process decision: {decision_str}")
-        return decision_str
+    valid_decisions = set(WORKER_NODES)
     
     if decision_str == "FINISH":
         logger.info("Process decision is FINISH. Ending process.")
         return "Refiner"
     
+    if len(get_parallel_assignments(state)) > 1:
+        logger.info("Multiple independent assignments. Dispatching in parallel.")
+        return "Parallel"
+    
+    if decision_str in valid_decisions:
+        logger.info(f"Valid process decision: {decision_str}")
+        return decision_str
+    
     # If decision_str is empty or not a valid decision, return "Process"
     if not decision_str or decision_str not in valid_decisions:
         logger.warning(f"Invalid or empty process decision: {decision_str}. Defaulting to 'Process'.")
@@ -0,0 +1,20 @@
+import contextvars
+from typing import Optional
+
+# Research session (graph thread) the current call belongs to
+current_thread_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_thread_id", default=None)
+
+# Agent whose node is currently running
+current_agent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_agent", default=None)
+
+def get_thread_id() -> str:
+    """Return the current research session ID, or 'default' outside a session."""
+    return current_thread_id.get() or "default"
+
+def get_agent_name() -> str:
+    """Return the name of the agent currently running, or 'default' outside an agent node."""
+    return current_agent.get() or "default"
+
+def session_key() -> str:
+    """Key identifying per-agent, per-session resources such as Python kernels."""
+    return f"{get_thread_id()}:{get_agent_name()}"
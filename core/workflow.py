@@ -1,8 +1,17 @@
-from typing import Dict, Any
+import os
+import functools
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Optional
 from langgraph.graph import StateGraph, END, START
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langchain_core.runnables import RunnableLambda
 from core.state import State
-from core.node import agent_node, human_choice_node, note_agent_node, human_review_node, refiner_node
+from core.node import (
+    agent_node, aagent_node, human_choice_node, note_agent_node, anote_agent_node,
+    human_review_node, refiner_node, arefiner_node, parallel_node, aparallel_node
+)
 from core.router import QualityReview_router, hypothesis_router, process_router
 from agents.hypothesis_agent import create_hypothesis_agent
 from agents.process_agent import create_process_agent
@@ -13,22 +22,32 @@ from agents.report_agent import create_report_agent
 from agents.quality_review_agent import create_quality_review_agent
 from agents.note_agent import create_note_agent
 from agents.refiner_agent import create_refiner_agent
+from load_cfg import CHECKPOINT_PATH
 
 class WorkflowManager:
-    def __init__(self, language_models, working_directory):
+    def __init__(self, language_models, working_directory, checkpoint_path: Optional[str] = None):
         """
         Initialize the workflow manager with language models and working directory.
         
         Args:
             language_models (dict): Dictionary containing language model instances
             working_directory (str): Path to the working directory
+            checkpoint_path (str, optional): SQLite file for graph checkpoints, defaults to CHECKPOINT_PATH
         """
         self.language_models = language_models
         self.working_directory = working_directory
+        self.checkpoint_path = checkpoint_path or CHECKPOINT_PATH
         self.workflow = None
         self.memory = None
         self.graph = None
         self.members = ["Hypothesis", "Process", "Visualization", "Search", "Coder", "Report", "QualityReview", "Refiner"]
+        # Worker nodes the supervisor can dispatch, with the agent behind each
+        self.worker_agents = {
+            "Visualization": "visualization_agent",
+            "Search": "searcher_agent",
+            "Coder": "code_agent",
+            "Report": "report_agent",
+        }
         self.agents = self.create_agents()
         self.setup_workflow()
 
@@ -96,17 +115,33 @@ class WorkflowManager:
         self.workflow = StateGraph(State)
         
         # Add nodes
-        self.workflow.add_node("Hypothesis", lambda state: agent_node(state, self.agents["hypothesis_agent"], "hypothesis_agent"))
-        self.workflow.add_node("Process", lambda state: agent_node(state, self.agents["process_agent"], "process_agent"))
-        self.workflow.add_node("Visualization", lambda state: agent_node(state, self.agents["visualization_agent"], "visualization_agent"))
-        self.workflow.add_node("Search", lambda state: agent_node(state, self.agents["searcher_agent"], "searcher_agent"))
-        self.workflow.add_node("Coder", lambda state: agent_node(state, self.agents["code_agent"], "code_agent"))
-        self.workflow.add_node("Report", lambda state: agent_node(state, self.agents["report_agent"], "report_agent"))
-        self.workflow.add_node("QualityReview", lambda state: agent_node(state, self.agents["quality_review_agent"], "quality_review_agent"))
-        self.workflow.add_node("NoteTaker", lambda state: note_agent_node(state, self.agents["note_agent"], "note_agent"))
+        self.add_agent_node("Hypothesis", "hypothesis_agent")
+        self.add_agent_node("Process", "process_agent")
+        self.add_agent_node("Visualization", "visualization_agent")
+        self.add_agent_node("Search", "searcher_agent")
+        self.add_agent_node("Coder", "code_agent")
+        self.add_agent_node("Report", "report_agent")
+        self.add_agent_node("QualityReview", "quality_review_agent")
+        self.add_agent_node("NoteTaker", "note_agent", note_agent_node, anote_agent_node)
         self.workflow.add_node("HumanChoice", human_choice_node)
         self.workflow.add_node("HumanReview", human_review_node)
-        self.workflow.add_node("Refiner", lambda state: refiner_node(state, self.agents["refiner_agent"], "refiner_agent"))
+        # Oversized report materials are condensed with the cheaper model before refining
+        summarizer = self.language_models["llm"]
+        self.add_agent_node(
+            "Refiner",
+            "refiner_agent",
+            functools.partial(refiner_node, summarizer=summarizer),
+            functools.partial(arefiner_node, summarizer=summarizer)
+        )
+        workers = {member: (self.agents[name], name) for member, name in self.worker_agents.items()}
+        self.workflow.add_node(
+            "Parallel",
+            RunnableLambda(
+                lambda state: parallel_node(state, workers),
+                afunc=lambda state: aparallel_node(state, workers),
+                name="Parallel"
+            )
+        )
 
         # Add edges
         self.workflow.add_edge(START, "Hypothesis")
@@ -131,10 +166,11 @@ class WorkflowManager:
                 "Report": "Report",
                 "Process": "Process",
                 "Refiner": "Refiner",
+                "Parallel": "Parallel",
             }
         )
 
-        for member in ["Visualization", 'Search', 'Coder', 'Report']:
+        for member in ["Visualization", 'Search', 'Coder', 'Report', 'Parallel']:
             self.workflow.add_edge(member, "QualityReview")
 
         self.workflow.add_conditional_edges(
@@ -161,10 +197,40 @@ class WorkflowManager:
             }
         )
 
-        # Compile workflow
-        self.memory = MemorySaver()
-        self.graph = self.workflow.compile()
+        # Compile workflow with a durable checkpointer so sessions can be resumed
+        self.memory = self.create_checkpointer()
+        self.graph = self.workflow.compile(checkpointer=self.memory)
+
+    def create_checkpointer(self) -> SqliteSaver:
+        """Open the SQLite checkpointer used by the synchronous graph"""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.checkpoint_path, check_same_thread=False)
+        return SqliteSaver(connection)
+
+    def add_agent_node(self, node_name, agent_name, node=agent_node, anode=aagent_node):
+        """
+        Add a node that runs an agent, with a sync and an async implementation.
+
+        The sync variant is used by graph.stream, the async one by graph.astream.
+        """
+        agent = self.agents[agent_name]
+        self.workflow.add_node(
+            node_name,
+            RunnableLambda(
+                lambda state: node(state, agent, agent_name),
+                afunc=lambda state: anode(state, agent, agent_name),
+                name=node_name
+            )
+        )
 
     def get_graph(self):
         """Return the compiled workflow graph"""
         return self.graph
+
+    @asynccontextmanager
+    async def aget_graph(self) -> AsyncIterator[Any]:
+        """Yield the workflow compiled with an async checkpointer on the same SQLite file"""
+        async with AsyncSqliteSaver.from_conn_string(self.checkpoint_path) as checkpointer:
+            yield self.workflow.compile(checkpointer=checkpointer)
@@ -6,10 +6,15 @@ from typing import List
 from langchain.tools import tool
 import os
 from logger import setup_logger
+from core.cassette import get_cassette
+from core.context_window import ContextWindow, get_context_budget
+from tools.executor import offload_blocking
+from tools.workspace_search import search_workspace
 
 # Set up logger
 logger = setup_logger()
 
+@offload_blocking
 @tool
 def list_directory_contents(directory: str = 'data') -> str:
     """
@@ -35,7 +40,8 @@ def create_agent(
     tools: list[tool],
     system_message: str,
     team_members: list[str],
-    working_directory: str = 'data'
+    working_directory: str = 'data',
+    agent_name: str = 'agent'
 ) -> AgentExecutor:
     """
     Create an agent with the given language model, tools, system message, and team members.
@@ -46,6 +52,7 @@ def create_agent(
         system_message (str): A message defining the agent's role and tasks.
         team_members (list[str]): A list of team member roles for collaboration.
         working_directory (str): The directory where the agent's data will be stored.
+        agent_name (str): Name of the agent, used to look up its context token budget.
         
     Returns:
         AgentExecutor: An executor that manages the agent's task execution.
@@ -53,9 +60,15 @@ def create_agent(
     
     logger.info("Creating agent")
 
-    # Ensure the ListDirectoryContents tool is available
+    # Ensure the ListDirectoryContents and workspace search tools are available
     if list_directory_contents not in tools:
         tools.append(list_directory_contents)
+    if search_workspace not in tools:
+        tools.append(search_workspace)
+
+    # Route network and execution tools through the record/replay cassette when enabled
+    cassette = get_cassette()
+    tools = [cassette.wrap_tool(t) for t in tools]
 
     # Prepare the tool names and team members for the system prompt
     tool_names = ", ".join([tool.name for tool in tools])
@@ -99,6 +112,10 @@ def create_agent(
 
     # Create the agent using the defined prompt and tools
     agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
+
+    # Keep the message history under the agent's token budget
+    context_window = ContextWindow(llm, get_context_budget(agent_name), name=agent_name)
+    agent = context_window.as_runnable() | agent
     
     logger.info("Agent created successfully")
     
@@ -131,6 +148,22 @@ def create_supervisor(llm: ChatOpenAI, system_prompt: str, members: list[str]) -
                     "title": "Task",
                     "type": "string",
                     "description": "The task to be performed by the selected agent"
+                },
+                "assignments": {
+                    "title": "Assignments",
+                    "type": "array",
+                    "description": (
+                        "Optional. Independent tasks that can run at the same time, one entry per role. "
+                        "Only use this when no task depends on the output of another."
+                    ),
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "next": {"title": "Next", "enum": members},
+                            "task": {"title": "Task", "type": "string"}
+                        },
+                        "required": ["next", "task"]
+                    }
                 }
             },
             "required": ["next", "task"],
@@ -146,17 +179,23 @@ def create_supervisor(llm: ChatOpenAI, system_prompt: str, members: list[str]) -
                 "system",
                 "Given the conversation above, who should act next? "
                 "Or should we FINISH? Select one of: {options}. "
-                "Additionally, specify the task that the selected role should perform."
+                "Additionally, specify the task that the selected role should perform. "
+                "If several roles can work independently at the same time, "
+                "also list every (role, task) pair in assignments."
             ),
         ]
     ).partial(options=str(options), team_members=", ".join(members))
     
+    # Keep the message history under the supervisor's token budget
+    context_window = ContextWindow(llm, get_context_budget("process_agent"), name="process_agent")
+
     # Log successful creation of supervisor
     logger.info("Supervisor created successfully")
     
     # Return the chained operations
     return (
-        prompt
+        context_window.as_runnable()
+        | prompt
         | llm.bind_functions(functions=[function_def], function_call="route")
         | JsonOutputFunctionsParser()
     )
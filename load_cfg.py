@@ -1,8 +1,16 @@
 import os
+import json
 from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean flag from the environment (true/1/yes/on)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('true', '1', 'yes', 'on')
+
 # Set up API keys and environment variables
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 LANGCHAIN_API_KEY = os.getenv('LANGCHAIN_API_KEY')
@@ -13,4 +21,173 @@ WORKING_DIRECTORY = os.getenv('WORKING_DIRECTORY', 'data')
 CONDA_PATH = os.getenv('CONDA_PATH', '/home/user/anaconda3')
 CONDA_ENV = os.getenv('CONDA_ENV', 'base')
 # Get ChromeDriver
-CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH', './chromedriver/chromedriver')
\ No newline at end of file
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH', './chromedriver/chromedriver')
+
+# Directory for persistent caches (LLM responses, fetched pages, ...)
+CACHE_DIRECTORY = os.getenv('CACHE_DIRECTORY', os.path.join(WORKING_DIRECTORY, '.cache'))
+
+# LLM response cache, opt-in: cached calls replay the same response on every rerun
+LLM_CACHE_ENABLED = _env_flag('LLM_CACHE_ENABLED', False)
+# Skip cache lookups for this run (fresh responses are still written back)
+LLM_CACHE_BYPASS = _env_flag('LLM_CACHE_BYPASS', False)
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(CACHE_DIRECTORY, 'llm_cache.sqlite'))
+LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', '512'))
+# Entry lifetime in seconds, 0 keeps entries until they are evicted
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '0'))
+
+# Record/replay of LLM and tool calls: off, record or replay
+CASSETTE_MODE = os.getenv('CASSETTE_MODE', 'off').strip().lower()
+CASSETTE_PATH = os.getenv('CASSETTE_PATH', os.path.join(CACHE_DIRECTORY, 'cassette.jsonl'))
+# Seconds of simulated latency added to every replayed call
+CASSETTE_LATENCY = float(os.getenv('CASSETTE_LATENCY', '0'))
+# Serve the next recording of the same model or tool when a replayed call has no exact match
+CASSETTE_LOOSE_MATCH = _env_flag('CASSETTE_LOOSE_MATCH', False)
+
+# Maximum number of blocking tool calls running concurrently in async sessions
+TOOL_EXECUTOR_WORKERS = int(os.getenv('TOOL_EXECUTOR_WORKERS', '8'))
+
+# Maximum number of worker agents dispatched concurrently by the supervisor
+MAX_PARALLEL_AGENTS = int(os.getenv('MAX_PARALLEL_AGENTS', '4'))
+
+# SQLite file holding graph checkpoints, used to resume interrupted sessions
+CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', os.path.join(WORKING_DIRECTORY, '.checkpoints.sqlite'))
+# SQLite file holding the documents fetched in each session, so resumed sessions can read them back
+DOCUMENT_STORE_PATH = os.getenv('DOCUMENT_STORE_PATH', os.path.join(WORKING_DIRECTORY, '.documents.sqlite'))
+
+# Token budget for the message history sent to each agent, 0 disables trimming
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '16000'))
+# Number of most recent messages always kept verbatim
+CONTEXT_KEEP_RECENT = int(os.getenv('CONTEXT_KEEP_RECENT', '8'))
+# Per-agent overrides as JSON, e.g. {"report_agent": 32000}
+AGENT_CONTEXT_BUDGETS = json.loads(os.getenv('AGENT_CONTEXT_BUDGETS', '{}'))
+
+# Token budget for the refiner's report materials; larger materials are summarized in chunks
+REFINER_TOKEN_BUDGET = int(os.getenv('REFINER_TOKEN_BUDGET', '48000'))
+REFINER_CHUNK_TOKENS = int(os.getenv('REFINER_CHUNK_TOKENS', '6000'))
+REFINER_MAX_CONCURRENCY = int(os.getenv('REFINER_MAX_CONCURRENCY', '4'))
+
+# Persistent index of report file contents, summaries and refinements, with LRU eviction
+MATERIALS_INDEX_PATH = os.getenv('MATERIALS_INDEX_PATH', os.path.join(CACHE_DIRECTORY, 'materials_index.sqlite'))
+MATERIALS_INDEX_MAX_MB = float(os.getenv('MATERIALS_INDEX_MAX_MB', '256'))
+
+# Warm Python kernels for execute_code, one per research thread and agent
+KERNEL_POOL_ENABLED = _env_flag('KERNEL_POOL_ENABLED', True)
+KERNEL_POOL_SIZE = int(os.getenv('KERNEL_POOL_SIZE', '4'))
+# Seconds without calls before a kernel is closed
+KERNEL_IDLE_TIMEOUT = float(os.getenv('KERNEL_IDLE_TIMEOUT', '900'))
+KERNEL_START_TIMEOUT = float(os.getenv('KERNEL_START_TIMEOUT', '60'))
+# Modules imported when a kernel starts
+KERNEL_PRELOAD = [m.strip() for m in os.getenv('KERNEL_PRELOAD', 'pandas,numpy,matplotlib.pyplot').split(',') if m.strip()]
+
+# Opt-in cache of successful execute_code runs, keyed by session, code and input file hashes;
+# only used with KERNEL_POOL_ENABLED=false, as replayed runs leave no variables in a kernel
+EXEC_CACHE_ENABLED = _env_flag('EXEC_CACHE_ENABLED', False)
+EXEC_CACHE_PATH = os.getenv('EXEC_CACHE_PATH', os.path.join(CACHE_DIRECTORY, 'exec_cache.sqlite'))
+EXEC_CACHE_MAX_MB = float(os.getenv('EXEC_CACHE_MAX_MB', '1024'))
+# Runs producing a larger file than this are not cached
+EXEC_CACHE_MAX_FILE_MB = float(os.getenv('EXEC_CACHE_MAX_FILE_MB', '50'))
+
+# Limits for execute_code and execute_command
+# Default and maximum wall-clock seconds per call
+EXEC_TIMEOUT = float(os.getenv('EXEC_TIMEOUT', '300'))
+EXEC_MAX_TIMEOUT = float(os.getenv('EXEC_MAX_TIMEOUT', '1800'))
+# CPU seconds per call and address-space cap in MB, 0 disables (POSIX only)
+EXEC_CPU_LIMIT = float(os.getenv('EXEC_CPU_LIMIT', '600'))
+EXEC_MEMORY_LIMIT_MB = float(os.getenv('EXEC_MEMORY_LIMIT_MB', '8192'))
+# Output beyond head + tail characters is cut from the result and saved to a file
+EXEC_OUTPUT_HEAD_CHARS = int(os.getenv('EXEC_OUTPUT_HEAD_CHARS', '6000'))
+EXEC_OUTPUT_TAIL_CHARS = int(os.getenv('EXEC_OUTPUT_TAIL_CHARS', '4000'))
+
+# Web scraping: total and per-host concurrent requests, per-request timeout in seconds
+SCRAPE_MAX_CONCURRENCY = int(os.getenv('SCRAPE_MAX_CONCURRENCY', '10'))
+SCRAPE_PER_HOST = int(os.getenv('SCRAPE_PER_HOST', '2'))
+SCRAPE_TIMEOUT = float(os.getenv('SCRAPE_TIMEOUT', '30'))
+
+# Persistent HTTP cache for scraped pages; honours Cache-Control and revalidates with ETag/Last-Modified
+HTTP_CACHE_ENABLED = _env_flag('HTTP_CACHE_ENABLED', True)
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', os.path.join(CACHE_DIRECTORY, 'http_cache.sqlite'))
+HTTP_CACHE_MAX_MB = float(os.getenv('HTTP_CACHE_MAX_MB', '512'))
+# Seconds a cached page is served without revalidation, overriding the server's headers; 0 follows the headers
+HTTP_CACHE_TTL = float(os.getenv('HTTP_CACHE_TTL', '0'))
+# Lifetime of cached FireCrawl results, which carry no HTTP headers
+FIRECRAWL_CACHE_TTL = float(os.getenv('FIRECRAWL_CACHE_TTL', '86400'))
+
+# Hedged scraping: the direct fetch starts if FireCrawl has not returned a usable page after
+# SCRAPE_HEDGE_DELAY seconds (0 starts both at once); adaptive mode uses FireCrawl's recent p95 latency
+SCRAPE_HEDGE_ENABLED = _env_flag('SCRAPE_HEDGE_ENABLED', True)
+SCRAPE_HEDGE_DELAY = float(os.getenv('SCRAPE_HEDGE_DELAY', '3'))
+SCRAPE_HEDGE_ADAPTIVE = _env_flag('SCRAPE_HEDGE_ADAPTIVE', True)
+# Pages with less extracted text than this count as failed scrapes
+SCRAPE_MIN_TEXT_CHARS = int(os.getenv('SCRAPE_MIN_TEXT_CHARS', '200'))
+
+# Pool of reusable browsers for Google search; each browser is replaced after BROWSER_MAX_PAGES pages
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', '50'))
+BROWSER_HEADLESS = _env_flag('BROWSER_HEADLESS', True)
+# Seconds to wait for a result page, and for a CAPTCHA to be solved by hand in a visible browser
+BROWSER_PAGE_TIMEOUT = float(os.getenv('BROWSER_PAGE_TIMEOUT', '20'))
+CAPTCHA_WAIT_TIMEOUT = float(os.getenv('CAPTCHA_WAIT_TIMEOUT', '300'))
+
+# Web search: backend ('google' scrapes Google with the browser pool, 'local' searches SEARCH_LOCAL_DIRECTORY offline)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'google').strip().lower()
+SEARCH_LOCAL_DIRECTORY = os.getenv('SEARCH_LOCAL_DIRECTORY', os.path.join(WORKING_DIRECTORY, 'search_corpus'))
+# Searches per session, refilled by one every SEARCH_QUOTA_REFILL_SECONDS (0 never refills)
+SEARCH_QUOTA = int(os.getenv('SEARCH_QUOTA', '5'))
+SEARCH_QUOTA_REFILL_SECONDS = float(os.getenv('SEARCH_QUOTA_REFILL_SECONDS', '120'))
+# Cached queries are answered without using the quota
+SEARCH_CACHE_ENABLED = _env_flag('SEARCH_CACHE_ENABLED', True)
+SEARCH_CACHE_PATH = os.getenv('SEARCH_CACHE_PATH', os.path.join(CACHE_DIRECTORY, 'search_cache.sqlite'))
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Extraction of scraped pages: worker processes for HTML parsing (0 parses in threads),
+# and the token cap per page returned to agents, applied in chunks of SCRAPE_CHUNK_TOKENS (0 disables)
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', str(min(4, os.cpu_count() or 1))))
+SCRAPE_PAGE_TOKEN_CAP = int(os.getenv('SCRAPE_PAGE_TOKEN_CAP', '6000'))
+SCRAPE_CHUNK_TOKENS = int(os.getenv('SCRAPE_CHUNK_TOKENS', '1000'))
+
+# Workspace search: lines per indexed passage, and the largest text file indexed in MB
+WORKSPACE_SEARCH_PASSAGE_LINES = int(os.getenv('WORKSPACE_SEARCH_PASSAGE_LINES', '20'))
+WORKSPACE_SEARCH_MAX_FILE_MB = float(os.getenv('WORKSPACE_SEARCH_MAX_FILE_MB', '5'))
+
+# Document reads: most bytes returned per read_document call (0 disables the cap), and the
+# sparse line index holding every LINE_INDEX_STEP-th line offset, persisted for files of at
+# least LINE_INDEX_MIN_FILE_MB within a LINE_INDEX_MAX_MB budget
+READ_DOCUMENT_MAX_BYTES = int(os.getenv('READ_DOCUMENT_MAX_BYTES', '40000'))
+LINE_INDEX_PATH = os.getenv('LINE_INDEX_PATH', os.path.join(CACHE_DIRECTORY, 'line_index.sqlite'))
+LINE_INDEX_MIN_FILE_MB = float(os.getenv('LINE_INDEX_MIN_FILE_MB', '1'))
+LINE_INDEX_STEP = int(os.getenv('LINE_INDEX_STEP', '256'))
+LINE_INDEX_MAX_MB = float(os.getenv('LINE_INDEX_MAX_MB', '64'))
+
+# Dataset loading: cache of parsed CSV files (Parquet when pyarrow is installed), the bytes
+# sampled to detect a CSV's encoding, and the largest CSV loaded whole (larger ones are streamed)
+DATASET_CACHE_ENABLED = _env_flag('DATASET_CACHE_ENABLED', True)
+DATASET_CACHE_DIRECTORY = os.getenv('DATASET_CACHE_DIRECTORY', os.path.join(CACHE_DIRECTORY, 'datasets'))
+DATASET_SNIFF_BYTES = int(os.getenv('DATASET_SNIFF_BYTES', str(1024 * 1024)))
+DATASET_IN_MEMORY_MB = float(os.getenv('DATASET_IN_MEMORY_MB', '256'))
+
+# Dataset profiles: files larger than DATASET_IN_MEMORY_MB are profiled in chunks; quantiles
+# and correlations use a sample, value counts stop at MAX_DISTINCT; cached profiles take at most MAX_MB
+DATASET_PROFILE_PATH = os.getenv('DATASET_PROFILE_PATH', os.path.join(CACHE_DIRECTORY, 'dataset_profiles.sqlite'))
+DATASET_PROFILE_MAX_MB = float(os.getenv('DATASET_PROFILE_MAX_MB', '64'))
+DATASET_PROFILE_CHUNK_ROWS = int(os.getenv('DATASET_PROFILE_CHUNK_ROWS', '200000'))
+DATASET_PROFILE_SAMPLE_ROWS = int(os.getenv('DATASET_PROFILE_SAMPLE_ROWS', '100000'))
+DATASET_PROFILE_MAX_DISTINCT = int(os.getenv('DATASET_PROFILE_MAX_DISTINCT', '10000'))
+
+# Streaming data tools: rows read per chunk, and the most rows a data tool returns
+DATASTREAM_CHUNK_ROWS = int(os.getenv('DATASTREAM_CHUNK_ROWS', '250000'))
+DATA_TOOL_MAX_ROWS = int(os.getenv('DATA_TOOL_MAX_ROWS', '50'))
+
+# SQL queries over the workspace CSVs: engine (duckdb or sqlite), database file (the engine name is
+# appended as extension) and the time limit per query in seconds
+SQL_ENGINE = os.getenv('SQL_ENGINE', 'duckdb')
+SQL_DATABASE_PATH = os.getenv('SQL_DATABASE_PATH', os.path.join(CACHE_DIRECTORY, 'workspace_tables'))
+SQL_TIMEOUT = float(os.getenv('SQL_TIMEOUT', '60'))
+
+# Approximate queries: rows of a uniform sample, rows per stratum of a stratified one, the most
+# strata allowed, where samples are kept and their size budget, and the confidence level of the reported intervals
+APPROX_SAMPLE_ROWS = int(os.getenv('APPROX_SAMPLE_ROWS', '100000'))
+APPROX_STRATUM_ROWS = int(os.getenv('APPROX_STRATUM_ROWS', '5000'))
+APPROX_MAX_STRATA = int(os.getenv('APPROX_MAX_STRATA', '200'))
+APPROX_SAMPLE_PATH = os.getenv('APPROX_SAMPLE_PATH', os.path.join(CACHE_DIRECTORY, 'samples.sqlite'))
+APPROX_SAMPLE_MAX_MB = float(os.getenv('APPROX_SAMPLE_MAX_MB', '1024'))
+APPROX_CONFIDENCE = float(os.getenv('APPROX_CONFIDENCE', '0.95'))
@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 
 import os
-from typing import Dict, Any
+import uuid
+import argparse
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, Optional
 from logger import setup_logger
 from langchain_core.messages import HumanMessage
 
 from load_cfg import OPENAI_API_KEY, LANGCHAIN_API_KEY, WORKING_DIRECTORY
 from core.workflow import WorkflowManager
 from core.language_models import LanguageModelManager
+from core.cassette import get_cassette
+from core.context_window import get_context_stats
+from core.session import current_thread_id
+from tools.scraper import engine as scrape_engine
+from tools.document_store import document_store
+from tools.datasets import dataset_cache
+from tools.workspace_search import workspace_index
 
 class MultiAgentSystem:
     def __init__(self):
@@ -21,48 +31,170 @@ class MultiAgentSystem:
 
     def setup_environment(self):
         """Initialize environment variables"""
-        os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-        os.environ["LANGCHAIN_API_KEY"] = LANGCHAIN_API_KEY
-        os.environ["LANGCHAIN_TRACING_V2"] = "true"
+        if get_cassette().mode == "replay":
+            # Replayed sessions run offline: no credentials or tracing needed
+            os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY or "cassette-replay"
+            os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        else:
+            os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
+            os.environ["LANGCHAIN_API_KEY"] = LANGCHAIN_API_KEY
+            os.environ["LANGCHAIN_TRACING_V2"] = "true"
         os.environ["LANGCHAIN_PROJECT"] = "Multi-Agent Data Analysis System"
 
         if not os.path.exists(WORKING_DIRECTORY):
             os.makedirs(WORKING_DIRECTORY)
             self.logger.info(f"Created working directory: {WORKING_DIRECTORY}")
 
-    def run(self, user_input: str) -> None:
-        """Run the multi-agent system with user input"""
+    def initial_state(self, user_input: str) -> Dict[str, Any]:
+        """Build the initial graph state for a user query"""
+        return {
+            "messages": [HumanMessage(content=user_input)],
+            "hypothesis": "",
+            "process_decision": "",
+            "process": "",
+            "visualization_state": "",
+            "searcher_state": "",
+            "code_state": "",
+            "report_section": "",
+            "quality_review": "",
+            "needs_revision": False,
+            "last_sender": "",
+        }
+
+    def run_config(self, thread_id: str) -> Dict[str, Any]:
+        """Build the graph run configuration for a session thread"""
+        return {"configurable": {"thread_id": thread_id}, "recursion_limit": 3000}
+
+    def new_thread_id(self) -> str:
+        """Create a unique thread ID for a new research session"""
+        return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+    def run(self, user_input: str, thread_id: Optional[str] = None) -> str:
+        """Run the multi-agent system with user input and return the session thread ID"""
+        thread_id = thread_id or self.new_thread_id()
+        self.announce_thread(thread_id)
+        self.stream_session(self.initial_state(user_input), thread_id)
+        return thread_id
+
+    def resume(self, thread_id: str) -> None:
+        """Continue an interrupted session from its last completed node"""
         graph = self.workflow_manager.get_graph()
+        if not self.can_resume(graph.get_state(self.run_config(thread_id)), thread_id):
+            return
+        self.stream_session(None, thread_id)
+
+    def stream_session(self, graph_input: Optional[Dict[str, Any]], thread_id: str) -> None:
+        """Stream a session, starting fresh from graph_input or resuming when it is None"""
+        graph = self.workflow_manager.get_graph()
+        # Tools look up per-session resources (e.g. Python kernels) by thread ID
+        current_thread_id.set(thread_id)
         events = graph.stream(
-            {
-                "messages": [HumanMessage(content=user_input)],
-                "hypothesis": "",
-                "process_decision": "",
-                "process": "",
-                "visualization_state": "",
-                "searcher_state": "",
-                "code_state": "",
-                "report_section": "",
-                "quality_review": "",
-                "needs_revision": False,
-                "last_sender": "",
-            },
-            {"configurable": {"thread_id": "1"}, "recursion_limit": 3000},
+            graph_input,
+            self.run_config(thread_id),
             stream_mode="values",
             debug=False
         )
         
-        for event in events:
-            message = event["messages"][-1]
-            if isinstance(message, tuple):
-                print(message, end='', flush=True)
-            else:
-                message.pretty_print()
+        try:
+            for event in events:
+                self.print_event(event)
+        finally:
+            workspace_index.end_session(thread_id)
+            document_store.end_session(thread_id)
+
+        self.log_stats()
+
+    async def astream(self, user_input: Optional[str], thread_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream graph states using the async node implementations.
+        Pass user_input=None to resume the session stored under thread_id.
+        """
+        graph_input = self.initial_state(user_input) if user_input is not None else None
+        current_thread_id.set(thread_id)
+        async with self.workflow_manager.aget_graph() as graph:
+            if graph_input is None and not self.can_resume(await graph.aget_state(self.run_config(thread_id)), thread_id):
+                return
+            try:
+                async for event in graph.astream(
+                    graph_input,
+                    self.run_config(thread_id),
+                    stream_mode="values",
+                    debug=False
+                ):
+                    yield event
+            finally:
+                workspace_index.end_session(thread_id)
+                document_store.end_session(thread_id)
+
+    async def arun(self, user_input: str, thread_id: Optional[str] = None) -> str:
+        """Async variant of run, so several sessions can share one event loop"""
+        thread_id = thread_id or self.new_thread_id()
+        self.announce_thread(thread_id)
+        async for event in self.astream(user_input, thread_id):
+            self.print_event(event)
+
+        self.log_stats()
+        return thread_id
+
+    async def aresume(self, thread_id: str) -> None:
+        """Async variant of resume"""
+        async for event in self.astream(None, thread_id):
+            self.print_event(event)
+
+        self.log_stats()
+
+    def announce_thread(self, thread_id: str) -> None:
+        """Tell the user how to resume this session"""
+        self.logger.info(f"Session thread ID: {thread_id}")
+        print(f"Session thread ID: {thread_id} (resume with: python main.py --resume {thread_id})")
+
+    def can_resume(self, snapshot: Any, thread_id: str) -> bool:
+        """Check that a stored session exists and still has work left"""
+        if not snapshot.values:
+            self.logger.error(f"No checkpoint found for thread ID: {thread_id}")
+            print(f"No saved session found for thread ID: {thread_id}")
+            return False
+        if not snapshot.next:
+            self.logger.info(f"Session {thread_id} has already finished")
+            print(f"Session {thread_id} has already finished.")
+            return False
+        self.logger.info(f"Resuming session {thread_id} at: {', '.join(snapshot.next)}")
+        return True
+
+    def print_event(self, event: Dict[str, Any]) -> None:
+        """Print the latest message of a streamed state"""
+        message = event["messages"][-1]
+        if isinstance(message, tuple):
+            print(message, end='', flush=True)
+        else:
+            message.pretty_print()
+
+    def log_stats(self) -> None:
+        """Log cache and context window statistics collected during the run"""
+        cache_stats = self.lm_manager.get_cache_stats()
+        if cache_stats:
+            self.logger.info(f"LLM cache stats: {cache_stats}")
+        context_stats = get_context_stats()
+        if context_stats:
+            self.logger.info(f"Context window stats: {context_stats}")
+        self.logger.info(f"Scraping stats: {scrape_engine.stats()}")
+        self.logger.info(f"Document store stats: {document_store.stats()}")
+        self.logger.info(f"Dataset cache stats: {dataset_cache.stats()}")
+        if scrape_engine.cache is not None:
+            self.logger.info(f"HTTP cache stats: {scrape_engine.cache.stats()}")
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Multi-Agent Data Analysis System")
+    parser.add_argument("--resume", metavar="THREAD_ID", help="Resume an interrupted session from its last checkpoint")
+    args = parser.parse_args()
+
     system = MultiAgentSystem()
     
+    if args.resume:
+        system.resume(args.resume)
+        return
+
     # Example usage
     user_input = input("Enter your query: ")
     system.run(user_input)
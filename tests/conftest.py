@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+# load_cfg reads the environment at import, so point the working and cache
+# directories at a scratch location before any project module is imported
+_scratch = tempfile.mkdtemp(prefix="research-agent-tests-")
+os.environ["WORKING_DIRECTORY"] = os.path.join(_scratch, "data")
+os.environ["CACHE_DIRECTORY"] = os.path.join(_scratch, "cache")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+# Keep FireCrawl out of the scraping paths under test
+os.environ["FIRECRAWL_API_KEY"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+class StubServer:
+    """
+    Local HTTP server answering GET requests from per-path handlers. It records
+    the headers of every request and the highest number of requests in flight.
+    """
+
+    def __init__(self):
+        self.routes: Dict[str, Callable[[Dict[str, str]], Response]] = {}
+        self.requests: List[Tuple[str, Dict[str, str]]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                headers = dict(self.headers.items())
+                with stub._lock:
+                    stub.requests.append((self.path, headers))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    route = stub.routes.get(self.path)
+                    status, response_headers, body = route(headers) if route else (404, {}, b"not found")
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+                self.send_response(status)
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
@@ -0,0 +1,121 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import tools.approx as approx
+from load_cfg import WORKING_DIRECTORY
+from tools.approx import (
+    ALL_ROWS, Sample, _estimate, approx_aggregate, approx_query, exact_aggregate, parse_function, parse_metric
+)
+
+Z95 = 1.959963984540054
+
+@pytest.fixture(scope="module")
+def population():
+    rng = np.random.default_rng(42)
+    rows = 5000
+    return pd.DataFrame({
+        "city": rng.choice(["oslo", "lima", "pune"], rows, p=[0.7, 0.25, 0.05]),
+        "price": rng.lognormal(3, 0.8, rows).round(2),
+        "rooms": rng.integers(1, 6, rows),
+    })
+
+@pytest.fixture(scope="module")
+def csv_path(population, tmp_path_factory):
+    path = tmp_path_factory.mktemp("approx") / "listings.csv"
+    population.to_csv(path, index=False)
+    return str(path)
+
+def test_parse_function():
+    assert parse_function(" Mean ") == ("mean", None)
+    assert parse_function("median") == ("quantile", 0.5)
+    assert parse_function("p90") == ("quantile", 0.9)
+    assert parse_function("p0") == ("quantile", 0.0)
+    for bad in ("p101", "pxx", "mode", "percent"):
+        with pytest.raises(ValueError, match="Unknown function"):
+            parse_function(bad)
+
+def test_parse_metric():
+    assert parse_metric("price:mean") == ("price", "mean")
+    assert parse_metric("a:b:p90") == ("a:b", "p90")
+    assert parse_metric("*:count") == (None, "count")
+    assert parse_metric("count") == (None, "count")
+    with pytest.raises(ValueError, match="needs a column"):
+        parse_metric("*:mean")
+    with pytest.raises(ValueError, match="column:function"):
+        parse_metric("price:")
+
+METRICS = [(None, "count"), ("price", "sum"), ("price", "mean"), ("price", "median"), ("rooms", "p90")]
+
+def test_complete_sample_is_exact(population, csv_path):
+    # The whole file fits in the sample, so every estimate equals the exact figure
+    result, sample = approx_aggregate(csv_path, METRICS, by=["city"], where="rooms > 1")
+    exact = exact_aggregate(csv_path, METRICS, by=["city"], where="rooms > 1")
+    assert sample.complete and sample.total_rows == len(population)
+    pd.testing.assert_series_equal(result["estimate"], exact["estimate"].astype(float), check_exact=False, rtol=1e-9)
+    assert (result["ci_low"] == result["estimate"]).all() and (result["ci_high"] == result["estimate"]).all()
+
+def test_exact_aggregate_matches_pandas(population, csv_path):
+    result = exact_aggregate(csv_path, METRICS, by=["city"])
+    for city, group in population.groupby("city"):
+        estimates = result[result["city"] == city].set_index("metric")["estimate"]
+        assert estimates["*:count"] == len(group)
+        assert estimates["price:sum"] == pytest.approx(group["price"].sum())
+        assert estimates["price:mean"] == pytest.approx(group["price"].mean())
+        assert estimates["price:median"] == pytest.approx(group["price"].quantile(0.5))
+        assert estimates["rooms:p90"] == pytest.approx(group["rooms"].quantile(0.9))
+    overall = exact_aggregate(csv_path, [(None, "count")], where="city == 'pune'")
+    assert overall["estimate"].tolist() == [(population["city"] == "pune").sum()]
+
+def uniform_sample(population, n, seed):
+    rows = population.sample(n, random_state=seed)
+    return Sample(rows, pd.Series(ALL_ROWS, index=rows.index), {ALL_ROWS: len(population)}, None)
+
+@pytest.mark.parametrize("function, truth", [
+    ("sum", lambda p: p["price"].sum()),
+    ("mean", lambda p: p["price"].mean()),
+    ("quantile", lambda p: np.quantile(p["price"], 0.5)),
+])
+def test_confidence_intervals_cover_the_truth(population, function, truth):
+    true_value = truth(population)
+    domain = np.ones(400, dtype=bool)
+    covered = 0
+    for seed in range(300):
+        sample = uniform_sample(population, 400, seed)
+        estimate, low, high, used = _estimate(sample, domain, "price", function, 0.5, Z95)
+        assert low <= estimate <= high and used == 400
+        covered += low <= true_value <= high
+    # About 95% of the intervals should contain the true value
+    assert 0.9 <= covered / 300 <= 0.99
+
+def test_domain_estimates(population):
+    # Counting a subgroup is a sum of indicators, estimated from the rows of that subgroup only
+    sample = uniform_sample(population, 1000, 0)
+    domain = (sample.rows["city"] == "lima").to_numpy()
+    count, low, high, used = _estimate(sample, domain, None, "count", None, Z95)
+    assert used == domain.sum()
+    assert count == pytest.approx(domain.sum() * len(population) / 1000)
+    assert low < (population["city"] == "lima").sum() < high
+
+def test_stratified_sample_keeps_small_strata(population, csv_path, monkeypatch):
+    monkeypatch.setattr(approx, "APPROX_STRATUM_ROWS", 200)
+    monkeypatch.setattr(approx, "DATASTREAM_CHUNK_ROWS", 700)
+    sample = Sample.build(csv_path, stratify_by="city", seed=3)
+    sizes = population["city"].value_counts()
+    assert sample.population == sizes.to_dict()
+    assert sample.sampled == {city: min(200, n) for city, n in sizes.items()}
+    assert not sample.complete
+    # Weights scale every stratum back to its size
+    totals = pd.Series(sample.weights).groupby(sample.strata).sum()
+    assert totals.to_dict() == pytest.approx({city: float(n) for city, n in sizes.items()})
+    with pytest.raises(ValueError, match="No column"):
+        Sample.build(csv_path, stratify_by="missing")
+
+def test_approx_query_tool(population):
+    os.makedirs(WORKING_DIRECTORY, exist_ok=True)
+    population.to_csv(os.path.join(WORKING_DIRECTORY, "approx_listings.csv"), index=False)
+    output = approx_query.invoke({"data_path": "approx_listings.csv", "metrics": ["*:count", "price:mean"], "group_by": ["city"]})
+    assert output.startswith(f"Exact results (the sample holds all {len(population)} rows):")
+    assert "oslo" in output and "price:mean" in output
+    assert approx_query.invoke({"data_path": "approx_listings.csv", "metrics": ["price:mode"]}).startswith("Error")
+    assert approx_query.invoke({"data_path": "missing.csv", "metrics": ["*:count"]}).startswith("Error")
@@ -0,0 +1,71 @@
+import math
+from tools.bm25 import BM25Index, tokenize
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert tokenize("The Rate of CO2 uptake isn't linear, it's 3.5x") == ["rate", "co2", "uptake", "isn't", "linear", "it's", "3", "5x"]
+    assert tokenize("the and of") == []
+
+def build(docs):
+    index = BM25Index()
+    for doc_id, text in docs.items():
+        index.add(doc_id, text)
+    return index
+
+def test_ranks_matching_documents():
+    index = build({
+        "solar": "solar panel efficiency depends on temperature",
+        "wind": "wind turbine output depends on wind speed",
+        "both": "solar and wind generation complement each other",
+    })
+    hits = index.search("solar efficiency")
+    assert [doc_id for doc_id, _ in hits] == ["solar", "both"]
+    assert hits[0][1] > hits[1][1] > 0
+
+def test_term_frequency_and_length_normalization():
+    index = build({
+        "repeated": "battery battery battery cell",
+        "once": "battery cell",
+        "long": "battery " + " ".join(f"filler{i}" for i in range(40)),
+        "other": "unrelated text",
+    })
+    scores = dict(index.search("battery"))
+    assert scores["repeated"] > scores["once"] > scores["long"]
+
+def test_rare_terms_weigh_more():
+    index = build({
+        "a": "common rare",
+        "b": "common",
+        "c": "common",
+        "d": "common",
+    })
+    scores = dict(index.search("common rare"))
+    assert scores["a"] > scores["b"]
+    # IDF of a term in every document is small but positive
+    assert scores["b"] == scores["c"] > 0
+
+def test_score_matches_formula():
+    index = build({"x": "alpha beta", "y": "gamma delta epsilon zeta"})
+    k1, b, n, average = 1.5, 0.75, 2, 3.0
+    idf = math.log(1 + (n - 1 + 0.5) / (1 + 0.5))
+    expected = idf * 1 * (k1 + 1) / (1 + k1 * (1 - b + b * 2 / average))
+    assert index.search("alpha") == [("x", expected)]
+
+def test_replace_and_remove():
+    index = build({"doc": "graphene conductivity", "other": "copper conductivity"})
+    index.add("doc", "silicon anodes")
+    assert len(index) == 2
+    assert [doc_id for doc_id, _ in index.search("graphene")] == []
+    assert [doc_id for doc_id, _ in index.search("silicon")] == ["doc"]
+
+    index.remove("doc")
+    index.remove("missing")
+    assert "doc" not in index and len(index) == 1
+    assert index.search("silicon") == []
+    # Postings and lengths of the remaining document are unaffected
+    assert index.search("copper") == build({"other": "copper conductivity"}).search("copper")
+
+def test_limit_and_empty_queries():
+    index = build({i: f"term document {i}" for i in range(20)})
+    assert len(index.search("term", k=3)) == 3
+    assert index.search("the of") == []
+    assert BM25Index().search("term") == []
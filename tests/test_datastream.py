@@ -0,0 +1,128 @@
+import codecs
+import numpy as np
+import pandas as pd
+import pytest
+from tools.workspace.datastream import (
+    _merge, _partial, aggregate, count_rows, filter_rows, sample, sniff_encoding
+)
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 503
+    frame = pd.DataFrame({
+        "id": np.arange(rows),
+        "region": rng.choice(["north", "south", "east", None], rows),
+        "kind": rng.choice(["a", "b"], rows),
+        "amount": rng.normal(100, 30, rows).round(2),
+        "units": rng.integers(0, 50, rows).astype(float),
+    })
+    frame.loc[rng.choice(rows, 40, replace=False), "amount"] = np.nan
+    # A group with a single numeric value has no variance
+    frame.loc[rows] = [rows, "west", "a", 5.0, 1.0]
+    return frame
+
+@pytest.fixture(scope="module")
+def csv_path(frame, tmp_path_factory):
+    path = tmp_path_factory.mktemp("datastream") / "sales.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
+
+FUNCTIONS = ["count", "sum", "mean", "min", "max", "std", "var"]
+
+def expected(frame, by):
+    grouped = frame.groupby(by, dropna=False) if by else frame.assign(_all=0).groupby("_all")
+    result = grouped.size().to_frame("rows")
+    for column in ("amount", "units"):
+        for function in FUNCTIONS:
+            values = grouped[column].agg(function)
+            if function == "sum":
+                # An all-missing group sums to NaN rather than zero
+                values = values.where(grouped[column].count() > 0)
+            result[f"{column}_{function}"] = values
+    return result.reset_index(drop=not by)
+
+@pytest.mark.parametrize("chunksize", [7, 100, 10_000])
+@pytest.mark.parametrize("by", [None, ["region"], ["region", "kind"]])
+def test_aggregate_matches_pandas(frame, csv_path, by, chunksize):
+    result = aggregate(csv_path, {"amount": FUNCTIONS, "units": FUNCTIONS}, by=by, chunksize=chunksize)
+    want = expected(pd.read_csv(csv_path), by)
+    if by:
+        sort = lambda df: df.sort_values(by, na_position="last").reset_index(drop=True)
+        result, want = sort(result), sort(want)
+    pd.testing.assert_frame_equal(result, want, check_dtype=False, check_exact=False, rtol=1e-9)
+
+def test_aggregate_with_filter(csv_path):
+    result = aggregate(csv_path, {"units": "sum"}, by="kind", where="amount > 100", chunksize=13)
+    data = pd.read_csv(csv_path).query("amount > 100")
+    assert result["units_sum"].tolist() == data.groupby("kind")["units"].sum().tolist()
+    assert result["rows"].tolist() == data.groupby("kind").size().tolist()
+
+def test_aggregate_non_numeric_values_count_but_are_missing(tmp_path):
+    path = tmp_path / "mixed.csv"
+    path.write_text("value\n1\n2\nunknown\nx\n3\n", encoding="utf-8")
+    result = aggregate(str(path), {"value": ["count", "sum", "mean"]}, chunksize=2)
+    assert result.to_dict("records") == [{"rows": 5, "value_count": 5, "value_sum": 6.0, "value_mean": 2.0}]
+
+def test_aggregate_empty_result_and_unknown_function(csv_path):
+    result = aggregate(csv_path, {"amount": "mean"}, by="region", where="amount > 10000")
+    assert result.empty and list(result.columns) == ["region", "rows", "amount_mean"]
+    with pytest.raises(ValueError, match="median"):
+        aggregate(csv_path, {"amount": ["mean", "median"]})
+
+def test_merge_of_partials_equals_partial_of_whole(frame):
+    columns, by = ["amount", "units"], ["region"]
+    whole = _partial(frame, columns, by)
+    parts = [_partial(frame.iloc[i:i + 50], columns, by) for i in range(0, len(frame), 50)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = _merge(merged, part)
+    for name in whole:
+        pd.testing.assert_frame_equal(
+            merged[name].sort_index(), whole[name].sort_index(), check_dtype=False, check_exact=False, rtol=1e-9
+        )
+
+def test_merge_is_order_independent(frame):
+    columns = ["amount"]
+    a, b = _partial(frame.iloc[:100], columns, ["kind"]), _partial(frame.iloc[100:], columns, ["kind"])
+    ab, ba = _merge(a, b), _merge(b, a)
+    for name in ab:
+        pd.testing.assert_frame_equal(ab[name].sort_index(), ba[name].sort_index(), check_exact=False, rtol=1e-12)
+
+def test_count_filter_and_sample(frame, csv_path, tmp_path):
+    data = pd.read_csv(csv_path)
+    assert count_rows(csv_path, chunksize=50) == len(data)
+    assert count_rows(csv_path, where="units >= 25", chunksize=50) == (data["units"] >= 25).sum()
+
+    rows = filter_rows(csv_path, "units >= 25", columns=["kind", "units"], limit=30, chunksize=7)
+    pd.testing.assert_frame_equal(rows, data.loc[data["units"] >= 25, ["kind", "units"]].head(30).reset_index(drop=True))
+
+    output = tmp_path / "matches.csv"
+    assert filter_rows(csv_path, "units >= 25", output=str(output), chunksize=7) == (data["units"] >= 25).sum()
+    assert len(pd.read_csv(output)) == (data["units"] >= 25).sum()
+    assert filter_rows(csv_path, "units > 1000", output=str(output)) == 0
+    assert list(pd.read_csv(output).columns) == list(data.columns)
+
+    drawn = sample(csv_path, 40, seed=1, chunksize=30)
+    assert len(drawn) == 40
+    pd.testing.assert_frame_equal(drawn, sample(csv_path, 40, seed=1, chunksize=30))
+    # Rows come back in file order
+    assert drawn["id"].is_monotonic_increasing and drawn["id"].is_unique
+    assert len(sample(csv_path, 10_000)) == len(data)
+
+@pytest.mark.parametrize("data, encoding", [
+    (codecs.BOM_UTF8 + "a,b\n1,é\n".encode("utf-8"), "utf-8-sig"),
+    ("a,b\n1,é\n".encode("utf-16"), "utf-16"),
+    ("a,b\n1,é\n".encode("utf-8"), "utf-8"),
+    ("a,b\n1,é€\n".encode("cp1252"), "cp1252"),
+    (b"a,b\n1,\x81\x8d\n", "latin1"),
+])
+def test_sniff_encoding(tmp_path, data, encoding):
+    path = tmp_path / "data.csv"
+    path.write_bytes(data)
+    assert sniff_encoding(str(path)) == encoding
+
+def test_sniff_encoding_ignores_character_cut_by_sample(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes("ab€".encode("utf-8"))
+    assert sniff_encoding(str(path), sample_bytes=3) == "utf-8"
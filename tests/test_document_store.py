@@ -0,0 +1,49 @@
+from core.session import current_thread_id
+from tools.document_store import DocumentStore, key_for_url
+
+def in_session(session, function, *args):
+    token = current_thread_id.set(session)
+    try:
+        return function(*args)
+    finally:
+        current_thread_id.reset(token)
+
+def fetch(store, session, url, title):
+    return in_session(session, store.get_or_fetch, key_for_url(url), lambda: (title, f"Text of {title}"), "web")
+
+def test_ids_survive_a_restart(tmp_path):
+    path = str(tmp_path / "documents.sqlite")
+    store = DocumentStore(path)
+    assert fetch(store, "thread-1", "https://example.com/a", "A").doc_id == "doc-1"
+    assert fetch(store, "thread-1", "https://example.com/b", "B").doc_id == "doc-2"
+    assert fetch(store, "thread-2", "https://example.com/c", "C").doc_id == "doc-1"
+
+    # A resumed session in a new process reads back the cited documents and continues the IDs
+    resumed = DocumentStore(path)
+    document = in_session("thread-1", resumed.get_by_id, "doc-2")
+    assert (document.title, document.text) == ("B", "Text of B")
+    assert fetch(resumed, "thread-1", "https://example.com/a", "A again").title == "A"
+    assert fetch(resumed, "thread-1", "https://example.com/d", "D").doc_id == "doc-3"
+    assert [d.doc_id for d in in_session("thread-2", resumed.documents)] == ["doc-1"]
+
+def test_default_session_is_not_persisted(tmp_path):
+    path = str(tmp_path / "documents.sqlite")
+    fetch(DocumentStore(path), "default", "https://example.com/a", "A")
+    assert in_session("default", DocumentStore(path).documents) == []
+
+def test_end_session_releases_memory(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.sqlite"))
+    fetch(store, "thread-1", "https://example.com/a", "A")
+    fetch(store, "thread-2", "https://example.com/b", "B")
+    store.end_session("thread-1")
+    assert "thread-1" not in store._by_id and "thread-1" not in store._by_key
+    assert "thread-2" in store._by_id
+    # Resuming the session later loads it again
+    assert in_session("thread-1", store.get_by_id, "doc-1").title == "A"
+
+def test_memory_only_store(tmp_path):
+    store = DocumentStore(None)
+    fetch(store, "thread-1", "https://example.com/a", "A")
+    store.end_session("thread-1")
+    assert in_session("thread-1", store.documents) == []
+    assert store.stats()["documents"] == 1
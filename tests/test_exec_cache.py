@@ -0,0 +1,43 @@
+import os
+import pytest
+from load_cfg import WORKING_DIRECTORY
+from tools.exec_cache import ExecCache
+
+@pytest.fixture
+def cache(tmp_path):
+    os.makedirs(WORKING_DIRECTORY, exist_ok=True)
+    with open(os.path.join(WORKING_DIRECTORY, "exec_input.csv"), "w") as f:
+        f.write("a\n1\n")
+    return ExecCache(str(tmp_path / "exec_cache.sqlite"), max_bytes=1 << 20)
+
+def test_key_covers_session_and_named_inputs(cache):
+    code = "import pandas as pd\nprint(pd.read_csv('exec_input.csv').sum())"
+    key = cache.key(code, "thread:agent")
+    assert key is not None and key == cache.key(code, "thread:agent")
+    assert key != cache.key(code, "other:agent")
+    with open(os.path.join(WORKING_DIRECTORY, "exec_input.csv"), "a") as f:
+        f.write("2\n")
+    assert cache.key(code, "thread:agent") != key
+
+@pytest.mark.parametrize("code", [
+    "import glob\nprint(glob.glob('*.csv'))",
+    "from glob import glob\nprint(glob('*.csv'))",
+    "import os\nprint(os.listdir('.'))",
+    "import os\nfor root, dirs, files in os.walk('.'):\n    print(files)",
+    "import os\nDATA_DIR = 'data'\nprint(open(os.path.join(DATA_DIR, 'x.csv')).read())",
+    "from os.path import join\nprint(join('a', 'b'))",
+    "from pathlib import Path\nprint(list(Path('.').glob('*.csv')))",
+    "import os\nprint([e.name for e in os.scandir('.')])",
+])
+def test_code_finding_files_at_run_time_is_not_cached(cache, code):
+    assert cache.key(code, "thread:agent") is None
+
+@pytest.mark.parametrize("code", [
+    "print(', '.join(['a', 'b']))",
+    "x = 1\nprint(x + 1)",
+])
+def test_plain_code_is_cached(cache, code):
+    assert cache.key(code, "thread:agent") is not None
+
+def test_code_using_session_variables_is_not_cached(cache):
+    assert cache.key("print(df.head())", "thread:agent") is None
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+import tools.extraction as extraction
+from tools.extraction import extract_main_content, aextract_main_content
+
+ARTICLE = "<p>" + "Measured capacity fell by four percent per year. " * 12 + "</p>"
+
+def page(body):
+    return f"<html><head><title>Report</title></head><body>{body}</body></html>"
+
+@pytest.mark.parametrize("classes", [
+    "container has-sidebar",
+    "content-area with-sidebar",
+    "post-content comments-open",
+    "wrapper ads-enabled",
+    "main-content sidebar-left",
+])
+def test_content_wrappers_with_modifier_classes_are_kept(classes):
+    html = page(f'<div class="{classes}"><h1>Results</h1>{ARTICLE}<div class="sidebar">Popular posts</div></div>')
+    text = extract_main_content(html)
+    assert "Measured capacity fell" in text
+    assert "Popular posts" not in text
+
+def test_wrapper_of_the_article_is_kept():
+    html = page(
+        '<div class="sidebar-layout"><article><h1>Results</h1>' + ARTICLE + '</article></div>'
+        '<div class="related-posts">' + "<p>Other story teaser text.</p>" * 30 + '</div>'
+    )
+    text = extract_main_content(html)
+    assert "Measured capacity fell" in text
+
+@pytest.mark.parametrize("name", ["sidebar", "sidebar-widget", "cookie_banner", "share", "comments", "nav-links"])
+def test_boilerplate_classes_and_ids_are_dropped(name):
+    html = page(f'<main><h1>Results</h1>{ARTICLE}<div class="{name}">Chrome text</div><div id="{name}">Id text</div></main>')
+    text = extract_main_content(html)
+    assert "Measured capacity fell" in text
+    assert "Chrome text" not in text and "Id text" not in text
+
+def test_structure_is_kept():
+    html = page(
+        "<nav>Home</nav><main><h2>Data</h2><ul><li>first</li><li>second</li></ul>"
+        "<table><tr><th>year</th><th>fade</th></tr><tr><td>2023</td><td>4%</td></tr></table>"
+        + ARTICLE + "</main><footer>Copyright</footer>"
+    )
+    text = extract_main_content(html)
+    assert text.startswith("# Report\n\n## Data\n\n- first\n\n- second")
+    assert "| year | fade |\n| --- | --- |\n| 2023 | 4% |" in text
+    assert "Home" not in text and "Copyright" not in text
+
+def test_worker_pool_does_not_fork(monkeypatch):
+    monkeypatch.setattr(extraction, "_pool", None)
+    pool = extraction._get_pool()
+    try:
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+        text = asyncio.run(aextract_main_content(page(ARTICLE)))
+        assert "Measured capacity fell" in text
+    finally:
+        pool.shutdown()
@@ -0,0 +1,111 @@
+import time
+from email.utils import formatdate
+import pytest
+from tools.http_cache import HttpCache, canonicalize_url, freshness_lifetime
+from tools.scraper import ScrapeEngine
+
+BODY = ("<html><body><article><p>" + "Cached article text. " * 20 + "</p></article></body></html>").encode("utf-8")
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://Example.COM:80/a?b=2&a=1#section", "http://example.com/a?a=1&b=2"),
+    ("https://example.com:443", "https://example.com/"),
+    ("https://example.com:8443/x", "https://example.com:8443/x"),
+    ("https://example.com/x?utm_source=feed&id=7&fbclid=abc&gclid=1", "https://example.com/x?id=7"),
+    ("  https://example.com/x?empty=  ", "https://example.com/x?empty="),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+def test_freshness_lifetime():
+    now = time.time()
+    assert freshness_lifetime({"Cache-Control": "no-store, max-age=60"}, now) is None
+    assert freshness_lifetime({"Cache-Control": "no-cache"}, now) == 0.0
+    assert freshness_lifetime({"Cache-Control": 'public, max-age="120"'}, now) == 120.0
+    assert freshness_lifetime({"Cache-Control": "max-age=abc"}, now) == 0.0
+    expires = {"Date": formatdate(now, usegmt=True), "Expires": formatdate(now + 300, usegmt=True)}
+    assert freshness_lifetime(expires, now) == pytest.approx(300, abs=1)
+    # A tenth of the time since the last change, capped at a day
+    assert freshness_lifetime({"Last-Modified": formatdate(now - 1000, usegmt=True)}, now) == pytest.approx(100, abs=1)
+    assert freshness_lifetime({"Last-Modified": formatdate(now - 10 ** 7, usegmt=True)}, now) == 24 * 3600
+    assert freshness_lifetime({}, now) == 0.0
+
+@pytest.fixture
+def cache(tmp_path):
+    return HttpCache(str(tmp_path / "http_cache.sqlite"), max_bytes=10 * 1024 * 1024, ttl_override=0)
+
+@pytest.fixture
+def engine(cache):
+    engine = ScrapeEngine(timeout=5, cache=cache, hedge=False)
+    yield engine
+    engine.close()
+
+def test_revalidation_with_etag(engine, cache, stub_server):
+    def page(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"', "Cache-Control": "max-age=0"}, b""
+        return 200, {"Content-Type": "text/html", "ETag": '"v1"', "Cache-Control": "max-age=0"}, BODY
+
+    stub_server.routes["/article"] = page
+    url = stub_server.url("/article")
+    first = engine.run(engine.scrape_web(url))
+    second = engine.run(engine.scrape_web(url))
+
+    assert "Cached article text." in first
+    assert second == first
+    assert "If-None-Match" not in stub_server.requests[0][1]
+    assert stub_server.requests[1][1]["If-None-Match"] == '"v1"'
+    assert (cache.misses, cache.revalidated, cache.hits) == (1, 1, 0)
+
+def test_revalidation_renews_lifetime(engine, cache, stub_server):
+    last_modified = formatdate(time.time() - 3600, usegmt=True)
+
+    def page(headers):
+        if headers.get("If-Modified-Since") == last_modified:
+            return 304, {"Cache-Control": "max-age=600"}, b""
+        return 200, {"Content-Type": "text/html", "Last-Modified": last_modified, "Cache-Control": "no-cache"}, BODY
+
+    stub_server.routes["/article"] = page
+    url = stub_server.url("/article")
+    for _ in range(3):
+        engine.run(engine.scrape_web(url))
+
+    # The 304 made the entry fresh for ten minutes, so the third read sends no request
+    assert len(stub_server.requests) == 2
+    assert (cache.revalidated, cache.hits) == (1, 1)
+    assert cache.lookup(url)["lifetime"] == 600
+
+def test_changed_page_replaces_entry(engine, cache, stub_server):
+    versions = iter([("v1", BODY), ("v2", BODY.replace(b"Cached", b"Updated"))])
+
+    def page(headers):
+        etag, body = next(versions)
+        return 200, {"Content-Type": "text/html", "ETag": f'"{etag}"'}, body
+
+    stub_server.routes["/article"] = page
+    url = stub_server.url("/article")
+    engine.run(engine.scrape_web(url))
+    text = engine.run(engine.scrape_web(url))
+
+    assert "Updated article text." in text
+    assert cache.lookup(url)["etag"] == '"v2"'
+    assert cache.revalidated == 0
+
+def test_no_store_is_not_cached(engine, cache, stub_server):
+    stub_server.routes["/private"] = lambda headers: (200, {"Content-Type": "text/html", "Cache-Control": "no-store"}, BODY)
+    url = stub_server.url("/private")
+    engine.run(engine.scrape_web(url))
+    assert cache.peek(url) is None
+
+def test_ttl_override_serves_without_request(tmp_path, stub_server):
+    cache = HttpCache(str(tmp_path / "http_cache.sqlite"), max_bytes=10 * 1024 * 1024, ttl_override=60)
+    engine = ScrapeEngine(timeout=5, cache=cache, hedge=False)
+    stub_server.routes["/article"] = lambda headers: (200, {"Content-Type": "text/html", "Cache-Control": "no-store"}, BODY)
+    url = stub_server.url("/article")
+    try:
+        engine.run(engine.scrape_web(url))
+        # Tracking parameters and fragments map to the same entry
+        engine.run(engine.scrape_web(url + "?utm_source=test#top"))
+    finally:
+        engine.close()
+    assert len(stub_server.requests) == 1
+    assert cache.hits == 1
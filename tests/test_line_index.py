@@ -0,0 +1,88 @@
+import random
+import pytest
+from tools.line_index import LineIndex, LineIndexCache, read_lines
+
+def write_random_file(path, rng):
+    lines = ["".join(rng.choice("abcé€x ") for _ in range(rng.choice([0, 1, 5, 40, 300]))) for _ in range(rng.randint(0, 60))]
+    text = "\n".join(lines) + (rng.choice(["", "\n"]) if lines else "")
+    path.write_bytes(text.encode("utf-8"))
+    return text.splitlines(keepends=True)
+
+def expected_range(lines, start, end):
+    total = len(lines)
+    start = max(total + start, 0) if start < 0 else min(start, total)
+    end = total if end is None else (max(total + end, 0) if end < 0 else min(end, total))
+    return "".join(lines[start:end])
+
+@pytest.mark.parametrize("seed", range(40))
+def test_read_lines_matches_splitlines(tmp_path, seed):
+    rng = random.Random(seed)
+    path = tmp_path / "file.txt"
+    for _ in range(5):
+        lines = write_random_file(path, rng)
+        index = LineIndex.build(str(path), rng.choice([1, 2, 3, 7, 256]))
+        assert index.line_count == len(lines)
+
+        start, end = rng.randint(-5, len(lines) + 2), rng.choice([None, rng.randint(-3, len(lines) + 3)])
+        text, _, _, truncated = read_lines(str(path), index, start, end, 0)
+        assert text == expected_range(lines, start, end)
+        assert not truncated
+
+        # Continuing from the returned line and column with a small budget reproduces the range
+        budget, line, column, parts = rng.choice([7, 16, 50]), start, 0, []
+        for _ in range(10000):
+            text, line, column, truncated = read_lines(str(path), index, line, end, budget, column)
+            assert len(text.encode("utf-8")) <= budget
+            parts.append(text)
+            if not truncated:
+                break
+        assert "".join(parts) == expected_range(lines, start, end)
+
+def test_long_line_is_cut_at_a_character_boundary(tmp_path):
+    path = tmp_path / "long.txt"
+    path.write_text("short\n" + "€" * 10 + "\nlast\n", encoding="utf-8")
+    index = LineIndex.build(str(path), 2)
+
+    # Each euro sign is three bytes, so eight bytes hold two of them
+    text, line, column, truncated = read_lines(str(path), index, 1, None, 8)
+    assert (text, line, column, truncated) == ("€€", 1, 6, True)
+    text, line, column, truncated = read_lines(str(path), index, 1, None, 8, column)
+    assert (text, line, column, truncated) == ("€€", 1, 12, True)
+    # Whole lines are returned once the rest of the line fits
+    text, line, column, truncated = read_lines(str(path), index, 1, None, 30, 24)
+    assert (text, line, column, truncated) == ("€€\nlast\n", 3, 0, False)
+
+def test_checkpoints_every_step_lines(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"".join(b"%d\n" % i for i in range(1000)))
+    index = LineIndex.build(str(path), 100)
+    assert len(index.offsets) == 10
+    with open(path, "rb") as f:
+        for line in (0, 99, 100, 101, 555, 999):
+            assert index.line_offset(f, line) == len(b"".join(b"%d\n" % i for i in range(line)))
+        assert index.line_offset(f, 1000) == index.size
+
+def test_serialization_round_trip(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"a\nbb\nccc" * 100)
+    index = LineIndex.build(str(path), 3)
+    copy = LineIndex.from_bytes(index.to_bytes())
+    assert (copy.mtime_ns, copy.size, copy.line_count, copy.step) == (index.mtime_ns, index.size, index.line_count, index.step)
+    assert list(copy.offsets) == list(index.offsets)
+
+def test_cache_rebuilds_changed_files_and_persists(tmp_path, monkeypatch):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"one\ntwo\n")
+    cache = LineIndexCache(str(tmp_path / "index.sqlite"))
+    cache.min_persist_bytes = 0
+
+    index = cache.get(str(path))
+    assert cache.get(str(path)) is index
+    path.write_bytes(b"one\ntwo\nthree\n")
+    assert cache.get(str(path)).line_count == 3
+
+    # A new cache, e.g. after a restart, loads the persisted index instead of rescanning
+    restarted = LineIndexCache(str(tmp_path / "index.sqlite"))
+    restarted.min_persist_bytes = 0
+    monkeypatch.setattr(LineIndex, "build", classmethod(lambda cls, path, step=0: pytest.fail("index rebuilt")))
+    assert restarted.get(str(path)).line_count == 3
@@ -0,0 +1,134 @@
+import time
+import asyncio
+import pytest
+import tools.scraper as scraper
+from tools.scraper import ScrapeEngine, ScrapeError, decode_body
+
+PAGE = (
+    "<html><head><title>Stub</title></head><body><nav>Home | About</nav>"
+    "<article><h1>Findings</h1><p>" + "The stub server returned this paragraph. " * 20 + "</p></article>"
+    "<footer>Copyright</footer></body></html>"
+).encode("utf-8")
+
+def delayed(seconds, status=200, headers=None, body=PAGE):
+    def handle(request_headers):
+        time.sleep(seconds)
+        return status, headers or {"Content-Type": "text/html; charset=utf-8"}, body
+    return handle
+
+@pytest.fixture
+def engine():
+    engine = ScrapeEngine(max_concurrency=10, per_host=2, timeout=5, cache=None, hedge=False)
+    yield engine
+    engine.close()
+
+def test_decode_body_uses_charset():
+    assert decode_body("café".encode("latin-1"), 'text/html; charset="ISO-8859-1"') == "café"
+    assert decode_body("café".encode("utf-8"), "text/html") == "café"
+    assert decode_body("café".encode("utf-8"), "text/html; charset=no-such-codec") == "café"
+
+def test_request_returns_status_headers_and_body(engine, stub_server):
+    stub_server.routes["/page"] = delayed(0, headers={"Content-Type": "text/html", "ETag": '"v1"'})
+    status, headers, body = engine.run(engine.request(stub_server.url("/page"), {"X-Probe": "1"}))
+    assert status == 200
+    assert headers["ETag"] == '"v1"'
+    assert body == PAGE
+    assert stub_server.requests[0][1]["X-Probe"] == "1"
+
+def test_http_error_raises_scrape_error(engine, stub_server):
+    stub_server.routes["/gone"] = delayed(0, status=410, body=b"gone")
+    with pytest.raises(ScrapeError, match="HTTP 410"):
+        engine.run(engine.request(stub_server.url("/gone")))
+
+def test_timeout_raises_scrape_error(stub_server):
+    engine = ScrapeEngine(timeout=0.3, cache=None, hedge=False)
+    stub_server.routes["/hang"] = delayed(2)
+    try:
+        with pytest.raises(ScrapeError, match="Timed out"):
+            engine.run(engine.request(stub_server.url("/hang")))
+    finally:
+        engine.close()
+
+def test_connection_error_raises_scrape_error(engine, stub_server):
+    url = stub_server.url("/page")
+    stub_server.close()
+    with pytest.raises(ScrapeError, match="Request failed"):
+        engine.run(engine.request(url))
+
+def test_scrape_web_extracts_main_content(engine, stub_server):
+    stub_server.routes["/page"] = delayed(0)
+    text = engine.run(engine.scrape_web(stub_server.url("/page")))
+    assert "The stub server returned this paragraph." in text
+    assert "Home | About" not in text
+
+def test_per_host_limit(engine, stub_server):
+    stub_server.routes["/slow"] = delayed(0.2)
+
+    async def batch():
+        return await asyncio.gather(*(engine.request(stub_server.url("/slow")) for _ in range(6)))
+
+    start = time.monotonic()
+    results = engine.run(batch())
+    assert [status for status, _, _ in results] == [200] * 6
+    assert stub_server.max_in_flight == 2
+    # Six requests two at a time take three rounds
+    assert time.monotonic() - start >= 0.55
+
+def test_global_limit_spans_hosts(stub_server):
+    # 127.0.0.1 and localhost are separate hosts to the engine, served by the same stub
+    engine = ScrapeEngine(max_concurrency=3, per_host=2, timeout=5, cache=None, hedge=False)
+    stub_server.routes["/slow"] = delayed(0.3)
+    urls = [stub_server.url("/slow"), stub_server.url("/slow").replace("127.0.0.1", "localhost")] * 4
+
+    async def batch():
+        return await asyncio.gather(*(engine.request(url) for url in urls))
+
+    try:
+        engine.run(batch())
+    finally:
+        engine.close()
+    assert stub_server.max_in_flight == 3
+
+def test_batch_results_keep_input_order(engine, stub_server):
+    # Later URLs answer first
+    for i in range(4):
+        stub_server.routes[f"/page{i}"] = delayed(0.4 - i * 0.1, body=f"<p>{'page %d ' % i * 40}</p>".encode())
+    urls = [stub_server.url(f"/page{i}") for i in range(4)]
+
+    async def batch():
+        return await asyncio.gather(*(engine.scrape_with_fallback(url) for url in urls))
+
+    texts = engine.run(batch())
+    assert [text.split()[1] for text in texts] == ["0", "1", "2", "3"]
+
+def test_arun_from_another_event_loop(engine, stub_server):
+    stub_server.routes["/page"] = delayed(0)
+    status, _, _ = asyncio.run(engine.arun(engine.request(stub_server.url("/page"))))
+    assert status == 200
+
+def test_hedged_scrape_falls_back_to_direct_fetch(stub_server, monkeypatch):
+    monkeypatch.setattr(scraper, "FIRECRAWL_API_KEY", "fc-test")
+    engine = ScrapeEngine(cache=None, hedge=True, hedge_delay=0.1, adaptive_hedge=False, min_text_chars=50)
+    cancelled = []
+
+    async def stalled_firecrawl(url):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return ""
+
+    engine.scrape_firecrawl = stalled_firecrawl
+    stub_server.routes["/page"] = delayed(0)
+    try:
+        start = time.monotonic()
+        text = engine.run(engine.scrape_with_fallback(stub_server.url("/page")))
+        elapsed = time.monotonic() - start
+    finally:
+        engine.close()
+    assert "The stub server returned this paragraph." in text
+    assert elapsed < 2
+    assert cancelled == [stub_server.url("/page")]
+    assert engine.backend_stats["firecrawl"].cancelled == 1
+    assert engine.backend_stats["direct"].success_rate() == 1.0
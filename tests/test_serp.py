@@ -0,0 +1,70 @@
+import os
+import pytest
+from tools.serp import parse_search_results, format_search_results
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+@pytest.fixture(scope="module")
+def results_page():
+    with open(os.path.join(FIXTURES, "google_results.html"), encoding="utf-8") as f:
+        return f.read()
+
+def test_parses_organic_results_in_page_order(results_page):
+    results = parse_search_results(results_page, limit=10)
+    assert [r["link"] for r in results] == [
+        "https://www.nature.com/articles/s41560-023-01234-5",
+        "https://batteryuniversity.com/article/bu-808-how-to-prolong-lithium-based-batteries",
+        "https://arxiv.org/abs/2301.01234",
+        "https://en.wikipedia.org/wiki/Lithium_iron_phosphate_battery",
+        "https://www.sciencedirect.com/science/article/pii/S0378775321000123",
+        "https://www.energy.gov/eere/vehicles/batteries",
+        "https://www.reddit.com/r/batteries/comments/abc123/lfp_degradation/",
+    ]
+
+def test_titles_and_snippets(results_page):
+    first, second, third, fourth = parse_search_results(results_page, limit=4)
+    assert first["title"] == "Degradation mechanisms of lithium iron phosphate cells"
+    assert first["snippet"] == (
+        "12 Mar 2023 — Capacity fade in LiFePO4 cells is dominated by loss of lithium inventory through SEI growth."
+    )
+    # Runs of spaces inside a title are kept as they appear on the page
+    assert second["title"] == "BU-808: How to Prolong   Lithium-based Batteries"
+    assert "partial charges are gentler" in second["snippet"]
+    # Snippet found through the fallback selector
+    assert third["snippet"].startswith("We train gradient boosted models")
+    assert fourth["snippet"] == "No Snippet"
+
+def test_skips_blocks_without_title_and_duplicate_links(results_page):
+    results = parse_search_results(results_page, limit=10)
+    assert all("People also ask" not in r["title"] for r in results)
+    assert len({r["link"] for r in results}) == len(results)
+    assert all("Duplicate listing" not in r["snippet"] for r in results)
+
+def test_limit(results_page):
+    assert len(parse_search_results(results_page)) == 5
+    assert [r["link"] for r in parse_search_results(results_page, limit=2)] == [
+        r["link"] for r in parse_search_results(results_page, limit=10)[:2]
+    ]
+
+def test_older_markup_without_result_wrappers():
+    html = (
+        '<div id="rso">'
+        '<div class="g"><a href="https://example.com/a"><h3>Result A</h3></a><div class="IsZvec">About A</div></div>'
+        '<div class="g"><div><a href="https://example.com/b">Link</a></div><h3>Result B</h3></div>'
+        '</div>'
+    )
+    assert parse_search_results(html) == [
+        {"title": "Result A", "snippet": "About A", "link": "https://example.com/a"},
+        {"title": "Result B", "snippet": "No Snippet", "link": "https://example.com/b"},
+    ]
+
+def test_page_without_results():
+    assert parse_search_results("<html><body><div id='search'>No results found</div></body></html>") == []
+
+def test_format_search_results(results_page):
+    formatted = format_search_results(parse_search_results(results_page, limit=1))
+    assert formatted == (
+        "Degradation mechanisms of lithium iron phosphate cells\n"
+        "12 Mar 2023 — Capacity fade in LiFePO4 cells is dominated by loss of lithium inventory through SEI growth.\n"
+        "https://www.nature.com/articles/s41560-023-01234-5\n\n"
+    )
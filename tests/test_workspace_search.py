@@ -0,0 +1,71 @@
+import pytest
+from core.session import current_thread_id
+from tools.document_store import document_store
+from tools.workspace_search import WorkspaceIndex, split_passages
+
+def test_split_passages_prefers_blank_lines():
+    lines = ["a", "b", "", "c", "d", "e", "f", "g"]
+    assert split_passages(lines, 2) == [(1, 3), (4, 7), (8, 8)]
+    assert split_passages([], 2) == []
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "notes.md").write_text("# Notes\nPerovskite cells degrade under humidity.\n", encoding="utf-8")
+    (tmp_path / "table.csv").write_text("country,perovskite_output\nA,1\n", encoding="utf-8")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "secret.md").write_text("perovskite\n", encoding="utf-8")
+    return tmp_path
+
+def in_session(session, function, *args):
+    token = current_thread_id.set(session)
+    try:
+        return function(*args)
+    finally:
+        current_thread_id.reset(token)
+
+def store(session, key, title, text):
+    return in_session(session, document_store.get_or_fetch, key, lambda: (title, text), "test")
+
+def test_files_are_indexed_and_refreshed(workspace):
+    index = WorkspaceIndex(root=str(workspace), passage_lines=5)
+    references = [reference for reference, _, _ in in_session("files", index.search, "perovskite")]
+    assert sorted(references) == ["notes.md:1-2", "table.csv:1-1"]
+
+    (workspace / "notes.md").write_text("# Notes\nNothing here.\n", encoding="utf-8")
+    (workspace / "table.csv").unlink()
+    assert in_session("files", index.search, "perovskite") == []
+
+def test_documents_are_scoped_to_their_session(workspace):
+    index = WorkspaceIndex(root=str(workspace), passage_lines=5)
+    document = store("session-a", "test:tandem", "Tandem cells", "Tandem perovskite silicon cells reach 33% efficiency.")
+
+    results = in_session("session-a", index.search, "tandem efficiency")
+    assert results[0][0] == f"{document.doc_id}:1-1"
+    assert "33% efficiency" in results[0][2]
+    assert in_session("session-b", index.search, "tandem efficiency") == []
+
+def test_end_session_drops_its_documents(workspace):
+    index = WorkspaceIndex(root=str(workspace), passage_lines=5)
+    store("session-c", "test:quantum", "Quantum dots", "Quantum dot films emit narrow spectra.")
+    store("session-d", "test:quantum", "Quantum dots", "Quantum dot films emit narrow spectra.")
+    in_session("session-c", index.search, "quantum")
+    in_session("session-d", index.search, "quantum")
+
+    index.end_session("session-c")
+    assert "session-c" not in index._document_passages
+    assert all(passage_id[:2] != ("doc", "session-c") for passage_id in index._text)
+    assert all(passage_id[:2] != ("doc", "session-c") for passage_id in index.index._lengths)
+    assert len(in_session("session-d", index.search, "quantum")) == 1
+    # Files stay indexed
+    assert in_session("session-d", index.search, "humidity")[0][0] == "notes.md:1-2"
+
+def test_documents_and_files_are_ranked_on_one_scale(tmp_path):
+    for i in range(30):
+        (tmp_path / f"notes{i}.md").write_text(f"Meeting notes {i} about budgets and schedules.\n", encoding="utf-8")
+    (tmp_path / "log.md").write_text("Cell 7 showed lithium plating once, among many other routine observations today.\n", encoding="utf-8")
+    index = WorkspaceIndex(root=str(tmp_path), passage_lines=5)
+    document = store("session-e", "test:plating", "Plating study", "Lithium plating lithium plating at low temperature.")
+
+    results = in_session("session-e", index.search, "lithium plating", 2)
+    # The document mentions the terms more often in fewer words, so it ranks first
+    assert [reference for reference, _, _ in results] == [f"{document.doc_id}:1-1", "log.md:1-1"]
@@ -1,10 +1,13 @@
 import os
 from langchain_core.tools import tool
-import pandas as pd
 from typing import Dict, Optional, Annotated, List
 from logger import setup_logger
-from load_cfg import WORKING_DIRECTORY
+from load_cfg import WORKING_DIRECTORY, READ_DOCUMENT_MAX_BYTES, DATASET_IN_MEMORY_MB
 from pydantic import BaseModel, Field
+from tools.executor import offload_blocking
+from tools.datasets import load_dataset
+from tools.line_index import line_indexes, read_lines
+from tools.workspace.datastream import iter_chunks
 
 # Set up logger
 logger = setup_logger()
@@ -14,6 +17,10 @@ if not os.path.exists(WORKING_DIRECTORY):
     os.makedirs(WORKING_DIRECTORY)
     logger.info(f"Created working directory: {WORKING_DIRECTORY}")
 
+# Rows and columns shown by collect_data
+PREVIEW_ROWS = 5
+PREVIEW_COLUMNS = 20
+
 def normalize_path(file_path: str) -> str:
     """
     Normalize file path for cross-platform compatibility.
@@ -28,32 +35,44 @@ def normalize_path(file_path: str) -> str:
         file_path = os.path.join(WORKING_DIRECTORY, file_path)
     return os.path.normpath(file_path)
 
+@offload_blocking
 @tool
-def collect_data(data_path: Annotated[str, "Path to the CSV file"] = './data.csv'):
+def collect_data(data_path: Annotated[str, "Path to the CSV file"] = './data.csv') -> str:
     """
     Collect data from a CSV file.
 
-    This function attempts to read a CSV file using different encodings.
+    The encoding is detected from the start of the file and the file is parsed once;
+    later calls reuse the cached result while the file is unchanged. Files too large
+    to load at once are only previewed.
 
     Returns:
-    pandas.DataFrame: The data read from the CSV file.
-
-    Raises:
-    ValueError: If unable to read the file with any of the provided encodings.
+    str: The size and column types of the data and its first rows, or an error message.
+    Use profile_dataset for column statistics.
     """
     data_path = normalize_path(data_path)
     logger.info(f"Attempting to read CSV file: {data_path}")
-    encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-    for encoding in encodings:
-        try:
-            data = pd.read_csv(data_path, encoding=encoding)
-            logger.info(f"Successfully read CSV file with encoding: {encoding}")
-            return data
-        except Exception as e:
-            logger.warning(f"Error with encoding {encoding}: {e}")
-    logger.error("Unable to read file with provided encodings")
-    raise ValueError("Unable to read file with provided encodings")
-
+    try:
+        size_mb = os.path.getsize(data_path) / (1024 * 1024)
+        if size_mb > DATASET_IN_MEMORY_MB:
+            # Too large to load whole: preview the first rows only
+            data = next(iter_chunks(data_path, PREVIEW_ROWS), None)
+            shape = f"{size_mb:.0f} MB, {len(data.columns)} columns, too large to load at once"
+        else:
+            data = load_dataset(data_path)
+            shape = f"{len(data)} rows x {len(data.columns)} columns"
+    except Exception as e:
+        logger.error(f"Unable to read file {data_path}: {e}")
+        return f"Error: Unable to read file {data_path}: {e}"
+    columns = ", ".join(f"{name} ({dtype})" for name, dtype in data.dtypes.items())
+    preview = data.head(PREVIEW_ROWS).to_string(max_cols=PREVIEW_COLUMNS, max_colwidth=40)
+    return (
+        f"{os.path.basename(data_path)}: {shape}\n"
+        f"Columns: {columns}\n"
+        f"First {min(PREVIEW_ROWS, len(data))} rows:\n{preview}\n"
+        f"Use profile_dataset for column statistics and aggregate_data, filter_data or sample_data to query the rows."
+    )
+
+@offload_blocking
 @tool
 def create_document(
     points: Annotated[List[str], "List of points to be included in the document"],
@@ -79,17 +98,20 @@ def create_document(
         logger.error(f"Error while saving outline: {str(e)}")
         return f"Error while saving outline: {str(e)}"
 
+@offload_blocking
 @tool
 def read_document(
     file_name: Annotated[str, "Name of the file to read"],
-    start: Annotated[Optional[int], "Starting line number to read from"] = None,
-    end: Annotated[Optional[int], "Ending line number to read to"] = None
+    start: Annotated[Optional[int], "Starting line number to read from (0-based, negative counts from the end)"] = None,
+    end: Annotated[Optional[int], "Ending line number to read to (exclusive)"] = None,
+    column: Annotated[int, "Byte position within the start line to begin at, to continue inside a very long line"] = 0
 ) -> str:
     """
     Read the specified document.
 
     This function reads a document from the specified file and returns its content.
-    Optionally, it can return a specific range of lines.
+    Optionally, it can return a specific range of lines. Long reads are cut at a size
+    limit and end with the start line (and column, inside a very long line) to continue from.
 
     Returns:
     str: The content of the document or an error message.
@@ -97,11 +119,20 @@ def read_document(
     try:
         file_path = normalize_path(file_name)
         logger.info(f"Reading document: {file_path}")
-        with open(file_path, "r", encoding='utf-8') as file:
-            lines = file.readlines()
+        index = line_indexes.get(file_path)
         if start is None:
             start = 0
-        content = "\n".join(lines[start:end])
+        content, next_line, next_column, truncated = read_lines(
+            file_path, index, start, end, READ_DOCUMENT_MAX_BYTES, column
+        )
+        if truncated:
+            cursor = f"start={next_line}" + (f", column={next_column}" if next_column else "")
+            if end is not None:
+                cursor += f", end={end}"
+            content = content.rstrip("\n") + (
+                f"\n\n[Output truncated; the file has {index.line_count} lines. "
+                f"Call read_document with {cursor} to continue.]"
+            )
         logger.info(f"Document read successfully: {file_path}")
         return content
     except FileNotFoundError:
@@ -111,6 +142,7 @@ def read_document(
         logger.error(f"Error while reading document: {str(e)}")
         return f"Error while reading document: {str(e)}"
 
+@offload_blocking
 @tool
 def write_document(
     content: Annotated[str, "Content to be written to the document"],
@@ -136,6 +168,7 @@ class EditDocumentInput(BaseModel):
     file_name: str = Field(description="Name of the file to edit")
     inserts: Dict[int, str] = Field(description="Dictionary of line numbers and text to insert")
 
+@offload_blocking
 @tool(args_schema=EditDocumentInput)
 def edit_document(
     file_name: str,
@@ -0,0 +1,315 @@
+import os
+import json
+import pickle
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+from typing import Annotated, Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import (
+    APPROX_SAMPLE_PATH, APPROX_SAMPLE_MAX_MB, APPROX_SAMPLE_ROWS, APPROX_STRATUM_ROWS, APPROX_MAX_STRATA, APPROX_CONFIDENCE,
+    DATASTREAM_CHUNK_ROWS, DATA_TOOL_MAX_ROWS
+)
+from core.disk_cache import DiskCache
+from tools.datasets import fingerprint
+from tools.dataset_tools import format_frame
+from tools.executor import offload_blocking
+from tools.FileEdit import normalize_path
+from tools.workspace import datastream
+
+# Set up logger
+logger = setup_logger()
+
+# Stratum label of every row in a uniform sample
+ALL_ROWS = ""
+
+def parse_function(function: str) -> Tuple[str, Optional[float]]:
+    """'mean' -> ('mean', None), 'median' -> ('quantile', 0.5), 'p90' -> ('quantile', 0.9)."""
+    function = function.strip().lower()
+    if function == "median":
+        return "quantile", 0.5
+    if function.startswith("p"):
+        try:
+            q = float(function[1:]) / 100
+        except ValueError:
+            q = -1
+        if 0 <= q <= 1:
+            return "quantile", q
+    if function in ("count", "sum", "mean"):
+        return function, None
+    raise ValueError(f"Unknown function '{function}'; use count, sum, mean, median or pNN such as p90")
+
+class Sample:
+    """
+    A reservoir sample of a dataset, stratified by one column or uniform, with the
+    number of rows of each stratum in the full dataset for design-based estimates.
+    """
+
+    def __init__(self, rows: pd.DataFrame, strata: pd.Series, population: Dict[str, int], stratify_by: Optional[str]):
+        self.rows = rows.reset_index(drop=True)
+        self.strata = strata.reset_index(drop=True)
+        self.stratify_by = stratify_by
+        self.population = population
+        sampled = self.strata.value_counts()
+        self.sampled = {label: int(sampled.get(label, 0)) for label in population}
+        # Each sampled row stands for N_h / n_h rows of its stratum
+        self.weights = self.strata.map({h: population[h] / n for h, n in self.sampled.items() if n}).to_numpy(dtype=float)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.population.values())
+
+    @property
+    def complete(self) -> bool:
+        """Whether the sample holds every row, so estimates are exact."""
+        return all(self.sampled[h] == n for h, n in self.population.items())
+
+    def total_variance(self, z: np.ndarray) -> float:
+        """Variance of the estimated total of ``z`` under stratified simple random sampling."""
+        frame = pd.DataFrame({"z": z, "h": self.strata})
+        s2 = frame.groupby("h", sort=False)["z"].var(ddof=1).fillna(0.0)
+        variance = 0.0
+        for h, s2_h in s2.items():
+            n_h, big_n = self.sampled[h], self.population[h]
+            variance += big_n ** 2 * (1 - n_h / big_n) * s2_h / n_h
+        return variance
+
+    @classmethod
+    def build(cls, path: str, stratify_by: Optional[str] = None, seed: int = 0) -> "Sample":
+        """One streaming pass: keep the rows with the smallest random keys in each stratum."""
+        per_stratum = APPROX_STRATUM_ROWS if stratify_by else APPROX_SAMPLE_ROWS
+        rng = np.random.default_rng(seed)
+        kept: Optional[pd.DataFrame] = None
+        population = pd.Series(dtype="int64")
+        for chunk in datastream.iter_chunks(path, DATASTREAM_CHUNK_ROWS):
+            if stratify_by is not None and stratify_by not in chunk.columns:
+                raise ValueError(f"No column '{stratify_by}' to stratify by")
+            labels = chunk[stratify_by].astype(str) if stratify_by else pd.Series(ALL_ROWS, index=chunk.index)
+            population = population.add(labels.value_counts(), fill_value=0)
+            if len(population) > APPROX_MAX_STRATA:
+                raise ValueError(f"'{stratify_by}' has more than {APPROX_MAX_STRATA} values; stratify by a coarser column")
+            chunk = chunk.assign(_key=rng.random(len(chunk)), _stratum=labels)
+            kept = chunk if kept is None else pd.concat([kept, chunk], ignore_index=True)
+            if len(kept) > per_stratum * len(population):
+                kept = kept.sort_values("_key").groupby("_stratum", sort=False).head(per_stratum)
+        if kept is None:
+            raise ValueError("The dataset has no rows")
+        kept = kept.sort_values("_key").groupby("_stratum", sort=False).head(per_stratum)
+        strata = kept["_stratum"]
+        return cls(kept.drop(columns=["_key", "_stratum"]), strata, {h: int(n) for h, n in population.items()}, stratify_by)
+
+class SampleStore:
+    """Samples persisted per dataset fingerprint and stratification column."""
+
+    def __init__(self, path: str = APPROX_SAMPLE_PATH, memory_entries: int = 4):
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Sample]" = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            self.store: Optional[DiskCache] = DiskCache(path, max_bytes=int(APPROX_SAMPLE_MAX_MB * 1024 * 1024))
+        except Exception as e:
+            logger.warning(f"Sample persistence disabled: {str(e)}")
+            self.store = None
+
+    def get(self, path: str, stratify_by: Optional[str] = None) -> Sample:
+        path = os.path.abspath(path)
+        key = f"sample:{path}:{stratify_by or ''}:" + json.dumps(fingerprint(path), sort_keys=True)
+        with self._lock:
+            sample = self._memory.get(key)
+            if sample is None and self.store is not None:
+                data = self.store.get(key)
+                if data is not None:
+                    sample = pickle.loads(data)
+            if sample is None:
+                sample = Sample.build(path, stratify_by)
+                logger.info(f"Built {len(sample.rows)}-row sample of {path} ({sample.total_rows} rows)")
+                if self.store is not None:
+                    self.store.set(key, pickle.dumps(sample, protocol=pickle.HIGHEST_PROTOCOL))
+            self._memory[key] = sample
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+            return sample
+
+sample_store = SampleStore()
+
+def _weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+    order = np.argsort(values, kind="stable")
+    cdf = np.cumsum(weights[order]) / weights.sum()
+    return float(values[order][min(np.searchsorted(cdf, q), len(values) - 1)])
+
+def _estimate(sample: Sample, domain: np.ndarray, column: Optional[str], function: str, q: Optional[float], z: float) -> Tuple[float, float, float, int]:
+    """Estimate, confidence bounds and sampled rows used for one metric over one domain."""
+    w = sample.weights
+    if column is None:
+        values = np.ones(len(domain))
+    else:
+        values = pd.to_numeric(sample.rows[column], errors="coerce").to_numpy(dtype=float) if function != "count" else np.where(sample.rows[column].notna(), 1.0, np.nan)
+    used = domain & ~np.isnan(values)
+    y = np.where(used, values, 0.0)
+    if function in ("count", "sum"):
+        total = float((w * y).sum())
+        half = z * np.sqrt(sample.total_variance(y))
+        return total, total - half, total + half, int(used.sum())
+    if not used.any():
+        return float("nan"), float("nan"), float("nan"), 0
+    if function == "mean":
+        size = float((w * used).sum())
+        mean = float((w * y).sum()) / size
+        # Linearized variance of a ratio estimator
+        residuals = np.where(used, values - mean, 0.0)
+        half = z * np.sqrt(sample.total_variance(residuals)) / size
+        return mean, mean - half, mean + half, int(used.sum())
+    # Quantile with bounds from the sampling error of the CDF, using Kish's effective sample size
+    values, weights = values[used], w[used]
+    if sample.complete:
+        # Every row is present, so interpolate like the exact scan does
+        estimate = float(np.quantile(values, q))
+        return estimate, estimate, estimate, int(used.sum())
+    estimate = _weighted_quantile(values, weights, q)
+    n_eff = weights.sum() ** 2 / (weights ** 2).sum()
+    spread = z * np.sqrt(q * (1 - q) / n_eff)
+    low = _weighted_quantile(values, weights, max(q - spread, 0.0))
+    high = _weighted_quantile(values, weights, min(q + spread, 1.0))
+    return estimate, low, high, int(used.sum())
+
+def approx_aggregate(
+    path: str,
+    metrics: List[Tuple[Optional[str], str]],
+    by: Optional[List[str]] = None,
+    where: Optional[str] = None,
+    stratify_by: Optional[str] = None,
+    confidence: float = APPROX_CONFIDENCE,
+) -> Tuple[pd.DataFrame, Sample]:
+    """
+    Estimate (column, function) metrics per group from the dataset's sample. A
+    column of None counts rows. Returns one row per group and metric with the
+    estimate and its confidence interval.
+    """
+    sample = sample_store.get(path, stratify_by)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    rows = sample.rows
+    match = rows.eval(where).to_numpy(dtype=bool) if where else np.ones(len(rows), dtype=bool)
+    if by:
+        keys = rows[by[0]].astype(str) if len(by) == 1 else rows[by].astype(str).agg(" | ".join, axis=1)
+        groups = list(pd.unique(keys[match]))
+    else:
+        keys, groups = None, [None]
+    results = []
+    for group in groups:
+        domain = match if group is None else match & (keys == group).to_numpy()
+        labels = {} if group is None else dict(zip(by, rows.loc[domain].iloc[0][by]))
+        for column, function in metrics:
+            kind, q = parse_function(function)
+            estimate, low, high, used = _estimate(sample, domain, column, kind, q, z)
+            results.append({**labels, "metric": f"{column or '*'}:{function}", "estimate": estimate, "ci_low": low, "ci_high": high, "sampled": used})
+    result = pd.DataFrame(results)
+    if by and len(result):
+        result = result.sort_values(by, kind="stable")
+    return result.reset_index(drop=True), sample
+
+def exact_aggregate(path: str, metrics: List[Tuple[Optional[str], str]], by: Optional[List[str]] = None, where: Optional[str] = None) -> pd.DataFrame:
+    """The same metrics computed over every row with a streaming scan."""
+    by = by or []
+    streamed: Dict[str, List[str]] = {}
+    quantiles: List[Tuple[str, str, float]] = []
+    for column, function in metrics:
+        kind, q = parse_function(function)
+        if kind == "quantile":
+            quantiles.append((column, function, q))
+        elif column is not None:
+            streamed.setdefault(column, []).append(kind)
+    if not streamed:
+        # Group sizes come with any aggregate, so count one of the columns involved
+        anchor = by[0] if by else next((column for column, _, _ in quantiles), None)
+        if anchor is not None:
+            streamed = {anchor: ["count"]}
+    if streamed:
+        totals = datastream.aggregate(path, streamed, by=by, where=where, chunksize=DATASTREAM_CHUNK_ROWS)
+    else:
+        totals = pd.DataFrame({"rows": [datastream.count_rows(path, where=where, chunksize=DATASTREAM_CHUNK_ROWS)]})
+
+    values = None
+    if quantiles:
+        # Exact quantiles need every value of the columns involved in memory
+        needed = list(dict.fromkeys(by + [column for column, _, _ in quantiles]))
+        values = pd.concat(list(datastream.iter_chunks(path, DATASTREAM_CHUNK_ROWS, columns=needed, where=where)), ignore_index=True)
+
+    results = []
+    for _, row in totals.iterrows():
+        labels = {column: row[column] for column in by}
+        group_values = values
+        if values is not None and by:
+            group_values = values[(values[by] == pd.Series(labels)).all(axis=1)]
+        for column, function in metrics:
+            kind, q = parse_function(function)
+            if column is None:
+                estimate = row["rows"]
+            elif kind == "quantile":
+                estimate = pd.to_numeric(group_values[column], errors="coerce").quantile(q)
+            else:
+                estimate = row[f"{column}_{kind}"]
+            results.append({**labels, "metric": f"{column or '*'}:{function}", "estimate": estimate, "ci_low": estimate, "ci_high": estimate})
+    return pd.DataFrame(results)
+
+def parse_metric(metric: str) -> Tuple[Optional[str], str]:
+    """'price:mean' -> ('price', 'mean'); 'count' or '*:count' counts rows."""
+    column, _, function = metric.rpartition(":")
+    if not function:
+        raise ValueError(f"Metric '{metric}' is not of the form 'column:function'")
+    column = column.strip()
+    if column in ("", "*"):
+        if function.strip().lower() != "count":
+            raise ValueError(f"Metric '{metric}' needs a column")
+        column = None
+    return column, function
+
+def _format_number(value: Any) -> Any:
+    return f"{value:.6g}" if isinstance(value, (float, np.floating)) else value
+
+@offload_blocking
+@tool
+def approx_query(
+    data_path: Annotated[str, "Path to the CSV file"],
+    metrics: Annotated[List[str], "Metrics as 'column:function' with count, sum, mean, median or pNN (e.g. 'price:p90'); '*:count' counts rows"],
+    group_by: Annotated[Optional[List[str]], "Columns to group by"] = None,
+    where: Annotated[Optional[str], "Row filter as a pandas query expression, e.g. \"year >= 2020\""] = None,
+    stratify_by: Annotated[Optional[str], "Column to stratify the sample by, so small groups of it are well represented"] = None,
+    exact: Annotated[bool, "Scan every row for exact results instead of estimating from the sample"] = False
+) -> str:
+    """
+    Quickly estimate counts, sums, means and quantiles of a CSV dataset, optionally per
+    group and over filtered rows, from a persisted random sample. Each estimate comes
+    with a confidence interval. Use this for exploratory checks on large datasets and
+    set exact=True only when an exact figure is needed.
+    """
+    try:
+        file_path = normalize_path(data_path)
+        if not os.path.exists(file_path):
+            return f"Error: The file {data_path} was not found."
+        parsed = [parse_metric(metric) for metric in metrics]
+        for _, function in parsed:
+            parse_function(function)
+        if exact:
+            result = exact_aggregate(file_path, parsed, by=group_by, where=where)
+            header = "Exact results over all rows:"
+            result = result.drop(columns=["ci_low", "ci_high"])
+        else:
+            result, sample = approx_aggregate(file_path, parsed, by=group_by, where=where, stratify_by=stratify_by)
+            if sample.complete:
+                header = f"Exact results (the sample holds all {sample.total_rows} rows):"
+                result = result.drop(columns=["ci_low", "ci_high"])
+            else:
+                header = (
+                    f"Estimates with {APPROX_CONFIDENCE:.0%} confidence intervals from a sample of {len(sample.rows)} "
+                    f"of {sample.total_rows} rows ('sampled' = sample rows used); use exact=True for exact figures:"
+                )
+        total = len(result)
+        result = result.head(DATA_TOOL_MAX_ROWS).apply(lambda column: column.map(_format_number))
+        return header + "\n" + format_frame(result, total)
+    except Exception as e:
+        logger.error(f"Error running approximate query: {str(e)}")
+        return f"Error running approximate query: {str(e)}"
@@ -1,11 +1,16 @@
 import os
 import logging
 import platform
-from typing import Annotated
-import subprocess
+from typing import Annotated, Optional
 from langchain_core.tools import tool
 from logger import setup_logger
-from load_cfg import WORKING_DIRECTORY,CONDA_PATH,CONDA_ENV
+from load_cfg import WORKING_DIRECTORY,CONDA_PATH,CONDA_ENV,KERNEL_POOL_ENABLED,EXEC_CACHE_ENABLED
+from tools.executor import offload_blocking
+from tools.kernel_pool import KernelPool, KernelStartError
+from tools.exec_cache import ExecCache
+from tools.limits import apply_shell_limits, clamp_timeout, run_limited
+from core.session import session_key
+from tools.workspace import install_workspace_helpers
 
 # Initialize logger
 logger = setup_logger()
@@ -15,6 +20,9 @@ if not os.path.exists(WORKING_DIRECTORY):
     os.makedirs(WORKING_DIRECTORY)
     logger.info(f"Created storage directory: {WORKING_DIRECTORY}")
 
+# Helper modules for generated code, such as datastream for CSVs larger than memory
+install_workspace_helpers()
+
 def get_platform_specific_command(command: str) -> tuple:
     """
     Get platform-specific command execution details.
@@ -38,23 +46,107 @@ def get_platform_specific_command(command: str) -> tuple:
         ]
         return (" && ".join(conda_commands), True, "/bin/bash")
 
+# Warm, stateful Python kernels shared by all execute_code calls
+kernel_pool = KernelPool(get_platform_specific_command)
+
+def open_exec_cache():
+    """Open the execution cache if it is enabled, without failing the tools if it cannot open"""
+    if not EXEC_CACHE_ENABLED:
+        return None
+    if KERNEL_POOL_ENABLED:
+        # A replayed run would not define its variables in the session's kernel,
+        # so later calls relying on them would fail
+        logger.warning("Execution cache disabled: it requires KERNEL_POOL_ENABLED=false")
+        return None
+    try:
+        return ExecCache()
+    except Exception as e:
+        logger.warning(f"Execution cache disabled: {str(e)}")
+        return None
+
+exec_cache = open_exec_cache()
+
+def run_code_file(code_file_path: str, codefile_name: str, input_code: str, timeout: float) -> dict:
+    """
+    Run code, replaying a cached result when the execution cache is enabled and
+    the same code already ran successfully on unchanged input files in this session.
+
+    Returns:
+    dict: The return code, stdout and stderr of the run.
+    """
+    cache_key = exec_cache.key(input_code, session_key()) if exec_cache else None
+    if cache_key is None:
+        return run_code(code_file_path, codefile_name, input_code, timeout)
+
+    cached = exec_cache.replay(cache_key)
+    if cached is not None:
+        return cached
+    before = exec_cache.snapshot()
+    result = run_code(code_file_path, codefile_name, input_code, timeout)
+    try:
+        exec_cache.store_run(cache_key, result, before, exclude=[code_file_path])
+    except Exception as e:
+        logger.warning(f"Could not cache execution result: {str(e)}")
+    return result
+
+def run_code(code_file_path: str, codefile_name: str, input_code: str, timeout: float) -> dict:
+    """
+    Run code in the session's warm kernel, falling back to a one-shot
+    interpreter when the kernel pool is disabled or a kernel cannot start.
+
+    Returns:
+    dict: The return code, stdout and stderr of the run, whether it timed out and
+    whether its output was truncated.
+    """
+    if KERNEL_POOL_ENABLED:
+        try:
+            return kernel_pool.execute(session_key(), input_code, os.path.abspath(code_file_path), timeout)
+        except KernelStartError as e:
+            logger.warning(f"Python kernel unavailable, running code in a new interpreter: {e}")
+
+    # Get platform-specific command
+    python_cmd = apply_shell_limits(f"python {codefile_name}")
+    full_command, shell, executable = get_platform_specific_command(python_cmd)
+    
+    logger.info(f"Executing command: {full_command}")
+    
+    return run_limited(full_command, shell, executable, timeout)
+
+def describe_limits(result: dict) -> str:
+    """Explain truncated or timed-out output to the agent."""
+    notes = []
+    if result.get("timed_out"):
+        notes.append("Execution hit the time limit.")
+    if result.get("truncated"):
+        paths = [result[key] for key in ("full_output_path", "full_error_path") if key in result]
+        notes.append(f"Output was truncated; the full output is saved in: {', '.join(paths)}")
+    return "\n".join(notes)
+
+@offload_blocking
 @tool
 def execute_code(
     input_code: Annotated[str, "The Python code to execute."],
-    codefile_name: Annotated[str, "The Python code file name or full path."] = 'code.py'
+    codefile_name: Annotated[str, "The Python code file name or full path."] = 'code.py',
+    timeout: Annotated[Optional[int], "Wall-clock time limit in seconds (optional)."] = None
 ):
     """
     Execute Python code in a specified conda environment and return the result.
 
     This function takes Python code as input, writes it to a file, executes it in the specified
     conda environment, and returns the output or any errors encountered during execution.
+    Code runs in a persistent Python session: variables, imports and loaded data from
+    earlier calls by the same agent remain available.
+
+    Long output is truncated to its beginning and end, with the full output saved to a file.
 
     Args:
     input_code (str): The Python code to be executed.
     codefile_name (str): The name of the file to save the code in, or the full path.
+    timeout (int, optional): Wall-clock time limit in seconds.
 
     Returns:
-    dict: A dictionary containing the execution result, output, and file path.
+    dict: A dictionary containing the execution result, output, file path and
+    whether the output was truncated or the run timed out.
     """
     try:
         # Ensure WORKING_DIRECTORY exists
@@ -80,39 +172,36 @@ def execute_code(
         
         logger.info(f"Code has been written to file: {code_file_path}")
         
-        # Get platform-specific command
-        python_cmd = f"python {codefile_name}"
-        full_command, shell, executable = get_platform_specific_command(python_cmd)
-        
-        logger.info(f"Executing command: {full_command}")
-        
-        # Execute the code
-        result = subprocess.run(
-            full_command,
-            shell=shell,
-            capture_output=True,
-            text=True,
-            executable=executable,
-            cwd=WORKING_DIRECTORY
-        )
+        result = run_code_file(code_file_path, codefile_name, input_code, clamp_timeout(timeout))
         
         # Capture standard output and error output
-        output = result.stdout
-        error_output = result.stderr
+        output = result["stdout"]
+        error_output = result["stderr"]
+        limits = {
+            "truncated": result.get("truncated", False),
+            "timed_out": result.get("timed_out", False),
+        }
+        for key in ("full_output_path", "full_error_path"):
+            if key in result:
+                limits[key] = result[key]
+        note = describe_limits(result)
         
-        if result.returncode == 0:
+        if result["returncode"] == 0:
             logger.info("Code executed successfully")
             return {
                 "result": "Code executed successfully",
-                "output": output + "\n\nIf you have completed all tasks, respond with FINAL ANSWER.",
-                "file_path": code_file_path
+                "output": output + (f"\n{note}" if note else "") + "\n\nIf you have completed all tasks, respond with FINAL ANSWER.",
+                "file_path": code_file_path,
+                **limits
             }
         else:
             logger.error(f"Code execution failed: {error_output}")
             return {
                 "result": "Failed to execute",
-                "error": error_output,
-                "file_path": code_file_path
+                "output": output,
+                "error": error_output + (f"\n{note}" if note else ""),
+                "file_path": code_file_path,
+                **limits
             }
     except Exception as e:
         logger.exception("An error occurred while executing code")
@@ -122,9 +211,11 @@ def execute_code(
             "file_path": code_file_path if 'code_file_path' in locals() else "Unknown"
         }
 
+@offload_blocking
 @tool
 def execute_command(
-    command: Annotated[str, "Command to be executed."]
+    command: Annotated[str, "Command to be executed."],
+    timeout: Annotated[Optional[int], "Wall-clock time limit in seconds (optional)."] = None
 ) -> Annotated[str, "Output of the command."]:
     """
     Execute a command in a specified Conda environment and return its output.
@@ -132,34 +223,31 @@ def execute_command(
     This function activates a Conda environment, executes the given command,
     and returns the output or any errors encountered during execution.
     Please use pip to install the package.
+    Long output is truncated to its beginning and end, with the full output saved to a file.
 
     Args:
     command (str): The command to be executed in the Conda environment.
+    timeout (int, optional): Wall-clock time limit in seconds.
 
     Returns:
     str: The output of the command or an error message.
     """
     try:
         # Get platform-specific command
-        full_command, shell, executable = get_platform_specific_command(command)
+        full_command, shell, executable = get_platform_specific_command(apply_shell_limits(command))
         
         logger.info(f"Executing command: {command}")
         
         # Execute the command and capture the output
-        result = subprocess.run(
-            full_command,
-            shell=shell,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            executable=executable,
-            cwd=WORKING_DIRECTORY
-        )
+        result = run_limited(full_command, shell, executable, clamp_timeout(timeout))
+        note = describe_limits(result)
+        if result["returncode"] != 0:
+            logger.error(f"Error executing command: {result['stderr']}")
+            return f"Error: {result['stderr']}" + (f"\n{note}" if note else "")
         logger.info("Command executed successfully")
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error executing command: {e.stderr}")
-        return f"Error: {e.stderr}"
+        return result["stdout"] + (f"\n{note}" if note else "")
+    except Exception as e:
+        logger.error(f"Error executing command: {str(e)}")
+        return f"Error: {str(e)}"
 
 logger.info("Module initialized successfully")
@@ -0,0 +1,94 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+# Very common English words, which only add noise to the ranking
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index with incremental updates.
+
+    Documents can be added, replaced and removed at any time; only the postings
+    of the affected document change. Scoring uses the standard BM25 formula with
+    parameters ``k1`` and ``b``.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc_id: term frequency}
+        self._postings: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self._lengths: Dict[Hashable, int] = {}
+        self._terms: Dict[Hashable, List[str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Index a document, replacing any earlier version with the same ID."""
+        self.add_tokens(doc_id, tokenize(text))
+
+    def add_tokens(self, doc_id: Hashable, tokens: Iterable[str]) -> None:
+        counts = Counter(tokens)
+        with self._lock:
+            self.remove(doc_id)
+            for term, frequency in counts.items():
+                self._postings[term][doc_id] = frequency
+            self._terms[doc_id] = list(counts)
+            length = sum(counts.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+
+    def remove(self, doc_id: Hashable) -> None:
+        """Drop a document from the index, if present."""
+        with self._lock:
+            length = self._lengths.pop(doc_id, None)
+            if length is None:
+                return
+            self._total_length -= length
+            for term in self._terms.pop(doc_id):
+                del self._postings[term][doc_id]
+                if not self._postings[term]:
+                    del self._postings[term]
+
+    def search(
+        self, query: str, k: int = 10, accept: Optional[Callable[[Hashable], bool]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Return up to ``k`` (doc_id, score) pairs, best first, considering only the
+        documents ``accept`` returns True for. Statistics still cover the whole index.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._lengths)
+            if not n or not terms:
+                return []
+            average = self._total_length / n or 1.0
+            scores: Dict[Hashable, float] = defaultdict(float)
+            for term in terms:
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, frequency in docs.items():
+                    if accept is not None and not accept(doc_id):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
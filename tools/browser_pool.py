@@ -0,0 +1,147 @@
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from logger import setup_logger
+from load_cfg import (
+    CHROMEDRIVER_PATH, BROWSER_POOL_SIZE, BROWSER_MAX_PAGES, BROWSER_HEADLESS, BROWSER_PAGE_TIMEOUT
+)
+
+# Set up logger
+logger = setup_logger()
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
+
+class Browser:
+    """A Chrome session owned by the pool, with the number of pages it has loaded."""
+
+    def __init__(self, headless: bool, page_timeout: float):
+        options = Options()
+        options.add_argument(f'--user-agent={USER_AGENT}')
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-extensions")
+        if headless:
+            options.add_argument("--headless=new")
+        self.driver = webdriver.Chrome(options=options, service=Service(CHROMEDRIVER_PATH))
+        self.driver.set_page_load_timeout(page_timeout)
+        self.pages = 0
+
+    def healthy(self) -> bool:
+        """Whether the browser still responds to commands."""
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def quit(self) -> None:
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {str(e)}")
+
+class BrowserPool:
+    """
+    Pool of long-lived browser sessions shared by all agents.
+
+    Browsers are started on demand up to ``size`` and reused across queries.
+    A browser is health-checked before it is handed out, and replaced after
+    ``max_pages`` page loads or when a call using it fails.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_pages: int = BROWSER_MAX_PAGES,
+        headless: bool = BROWSER_HEADLESS,
+        page_timeout: float = BROWSER_PAGE_TIMEOUT
+    ):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.headless = headless
+        self.page_timeout = page_timeout
+        self._idle: List[Browser] = []
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.size)
+        self.started = 0
+        self.recycled = 0
+        self.closed = False
+        atexit.register(self.close)
+
+    @contextmanager
+    def browser(self) -> Iterator[Any]:
+        """
+        Borrow a browser for one query and yield its WebDriver. Blocks while all
+        browsers are in use.
+        """
+        self._slots.acquire()
+        browser = None
+        try:
+            browser = self._checkout()
+            yield browser.driver
+            browser.pages += 1
+        except WebDriverException:
+            # The session may be broken; do not hand it out again
+            if browser is not None:
+                browser.quit()
+                self.recycled += 1
+                browser = None
+            raise
+        finally:
+            if browser is not None:
+                self._checkin(browser)
+            self._slots.release()
+
+    def _checkout(self) -> Browser:
+        while True:
+            with self._lock:
+                browser = self._idle.pop() if self._idle else None
+            if browser is None:
+                logger.info("Starting browser for the search pool")
+                self.started += 1
+                return Browser(self.headless, self.page_timeout)
+            if browser.healthy():
+                return browser
+            logger.warning("Discarding unresponsive browser")
+            browser.quit()
+            self.recycled += 1
+
+    def _checkin(self, browser: Browser) -> None:
+        if self.closed or (self.max_pages and browser.pages >= self.max_pages):
+            logger.info(f"Recycling browser after {browser.pages} pages")
+            browser.quit()
+            self.recycled += 1
+            return
+        with self._lock:
+            self._idle.append(browser)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+        return {"idle": idle, "started": self.started, "recycled": self.recycled}
+
+    def close(self) -> None:
+        """Quit all idle browsers; browsers in use are closed when they are returned."""
+        self.closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for browser in idle:
+            browser.quit()
+
+# Shared pool used by the search tools
+browser_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    """Return the shared browser pool, creating it on first use."""
+    global browser_pool
+    with _pool_lock:
+        if browser_pool is None:
+            browser_pool = BrowserPool()
+        return browser_pool
@@ -0,0 +1,279 @@
+import os
+import json
+from typing import Annotated, Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import (
+    DATASET_PROFILE_PATH, DATASET_IN_MEMORY_MB, DATASET_PROFILE_CHUNK_ROWS,
+    DATASET_PROFILE_SAMPLE_ROWS, DATASET_PROFILE_MAX_DISTINCT, DATASET_PROFILE_MAX_MB
+)
+from core.disk_cache import DiskCache
+from tools.datasets import fingerprint, load_dataset
+from tools.executor import offload_blocking
+from tools.FileEdit import normalize_path
+from tools.workspace.datastream import iter_chunks
+
+# Set up logger
+logger = setup_logger()
+
+QUANTILES = (0.25, 0.5, 0.75)
+# Most frequent values listed per column, and strongest correlations listed per dataset
+TOP_VALUES = 5
+TOP_CORRELATIONS = 10
+# Columns shown when no columns are asked for
+MAX_COLUMNS_SHOWN = 40
+
+def _scalar(value: Any) -> Any:
+    """JSON-friendly version of a pandas/NumPy scalar."""
+    if isinstance(value, (np.integer, np.bool_)):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    return value
+
+class ProfileAccumulator:
+    """
+    Column statistics merged chunk by chunk, so a dataset of any size is profiled
+    in one pass with bounded memory.
+
+    Counts, means, variances, minima and maxima are exact. Value counts are kept
+    while a column has at most ``max_distinct`` values. Quantiles and correlations
+    come from a uniform reservoir sample of ``sample_rows`` rows, which is the
+    whole dataset when it is small enough.
+    """
+
+    def __init__(self, sample_rows: int = DATASET_PROFILE_SAMPLE_ROWS, max_distinct: int = DATASET_PROFILE_MAX_DISTINCT):
+        self.sample_rows = sample_rows
+        self.max_distinct = max_distinct
+        self.rows = 0
+        self.chunks = 0
+        self.columns: List[str] = []
+        self.dtypes: Dict[str, str] = {}
+        self.nulls = pd.Series(dtype="int64")
+        # Running moments of the numeric columns
+        self.numeric: Optional[pd.DataFrame] = None
+        # Value counts per column, or None once a column has too many distinct values
+        self.counts: Dict[str, Optional[pd.Series]] = {}
+        self.distinct_at_least: Dict[str, int] = {}
+        self.sample: Optional[pd.DataFrame] = None
+        self.sample_keys = np.empty(0)
+        self.rng = np.random.default_rng(0)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        if not self.columns:
+            self.columns = [str(c) for c in chunk.columns]
+        chunk.columns = [str(c) for c in chunk.columns]
+        self.rows += len(chunk)
+        self.chunks += 1
+        self.nulls = self.nulls.add(chunk.isna().sum(), fill_value=0)
+        for column, dtype in chunk.dtypes.items():
+            known = self.dtypes.setdefault(column, str(dtype))
+            if known != str(dtype):
+                # Chunks can infer different types for one column: integers widen to floats, anything else is text
+                self.dtypes[column] = "float64" if {known, str(dtype)} <= {"int64", "float64"} else "object"
+        numeric = chunk.select_dtypes(include="number")
+        numeric = numeric[[c for c in numeric.columns if self.dtypes[c] != "object"]]
+        self._add_moments(numeric)
+        self._add_counts(chunk)
+        self._add_sample(numeric)
+
+    def _add_moments(self, numeric: pd.DataFrame) -> None:
+        chunk = pd.DataFrame({
+            "n": numeric.count(),
+            "mean": numeric.mean(),
+            "m2": numeric.var(ddof=0) * numeric.count(),
+            "min": numeric.min(),
+            "max": numeric.max(),
+        }).fillna({"m2": 0.0})
+        if self.numeric is None:
+            self.numeric = chunk
+            return
+        # Columns no longer numeric are dropped, columns new to this chunk are added
+        known = self.numeric.reindex([c for c in self.numeric.index if self.dtypes[c] != "object"])
+        a, b = known.align(chunk, join="outer", axis=0)
+        a = a.fillna({"n": 0, "mean": 0.0, "m2": 0.0})
+        b = b.fillna({"n": 0, "mean": 0.0, "m2": 0.0})
+        n = a["n"] + b["n"]
+        delta = b["mean"] - a["mean"]
+        safe_n = n.where(n > 0, 1)
+        # Chan et al. parallel update of mean and sum of squared deviations
+        self.numeric = pd.DataFrame({
+            "n": n,
+            "mean": a["mean"] + delta * b["n"] / safe_n,
+            "m2": a["m2"] + b["m2"] + delta ** 2 * a["n"] * b["n"] / safe_n,
+            "min": pd.concat([a["min"], b["min"]], axis=1).min(axis=1),
+            "max": pd.concat([a["max"], b["max"]], axis=1).max(axis=1),
+        })
+
+    def _add_counts(self, chunk: pd.DataFrame) -> None:
+        for column in chunk.columns:
+            if column in self.counts and self.counts[column] is None:
+                continue
+            counts = chunk[column].value_counts(dropna=True)
+            known = self.counts.get(column)
+            merged = counts if known is None else known.add(counts, fill_value=0)
+            if len(merged) > self.max_distinct:
+                self.counts[column] = None
+                self.distinct_at_least[column] = len(merged)
+            else:
+                self.counts[column] = merged
+
+    def _add_sample(self, numeric: pd.DataFrame) -> None:
+        keys = self.rng.random(len(numeric))
+        if self.sample is None:
+            sample, sample_keys = numeric, keys
+        else:
+            sample = pd.concat([self.sample, numeric], ignore_index=True)
+            sample_keys = np.concatenate([self.sample_keys, keys])
+        if len(sample) > self.sample_rows:
+            # Rows with the smallest random keys form a uniform sample
+            keep = np.argpartition(sample_keys, self.sample_rows)[:self.sample_rows]
+            sample, sample_keys = sample.iloc[keep].reset_index(drop=True), sample_keys[keep]
+        self.sample, self.sample_keys = sample, sample_keys
+
+    def result(self) -> Dict[str, Any]:
+        numeric = self.numeric if self.numeric is not None else pd.DataFrame()
+        numeric_columns = [c for c in numeric.index if self.dtypes.get(c) != "object"]
+        sample = self.sample[numeric_columns] if self.sample is not None else pd.DataFrame()
+        quantiles = sample.quantile(list(QUANTILES)) if len(sample) else pd.DataFrame()
+
+        columns = {}
+        for column in self.columns:
+            counts = self.counts.get(column)
+            info: Dict[str, Any] = {
+                "dtype": self.dtypes.get(column, "object"),
+                "nulls": int(self.nulls.get(column, 0)),
+            }
+            if counts is not None:
+                info["distinct"] = len(counts)
+                top = counts.nlargest(TOP_VALUES)
+                info["top"] = [[str(value)[:40], int(count)] for value, count in top.items()]
+            elif self.chunks == 1:
+                # Counted over the whole dataset at once, so exact
+                info["distinct"] = self.distinct_at_least.get(column, 0)
+            else:
+                info["distinct_at_least"] = self.distinct_at_least.get(column, 0)
+            if column in numeric_columns:
+                stats = numeric.loc[column]
+                n = stats["n"]
+                info.update({
+                    "mean": _scalar(stats["mean"]) if n else None,
+                    "std": float(np.sqrt(stats["m2"] / (n - 1))) if n > 1 else None,
+                    "min": _scalar(stats["min"]),
+                    "max": _scalar(stats["max"]),
+                    "quantiles": [_scalar(quantiles.at[q, column]) for q in QUANTILES] if column in quantiles else None,
+                })
+            columns[column] = info
+
+        correlations = []
+        if len(sample.columns) > 1:
+            corr = sample.corr()
+            values = corr.to_numpy()
+            upper = np.triu_indices_from(values, k=1)
+            pairs = sorted(
+                ((corr.index[i], corr.columns[j], values[i, j]) for i, j in zip(*upper) if not np.isnan(values[i, j])),
+                key=lambda pair: -abs(pair[2])
+            )
+            correlations = [[a, b, round(float(r), 4)] for a, b, r in pairs[:TOP_CORRELATIONS]]
+
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "sample_rows": len(sample),
+            "columns": columns,
+            "correlations": correlations,
+        }
+
+def profile_frames(chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+    """Profile a dataset given as an iterable of DataFrame chunks."""
+    accumulator = ProfileAccumulator()
+    for chunk in chunks:
+        accumulator.add(chunk)
+    return accumulator.result()
+
+class DatasetProfiler:
+    """Dataset profiles cached on disk by the dataset's fingerprint."""
+
+    def __init__(self, path: str = DATASET_PROFILE_PATH):
+        try:
+            self.store: Optional[DiskCache] = DiskCache(path, max_bytes=int(DATASET_PROFILE_MAX_MB * 1024 * 1024))
+        except Exception as e:
+            logger.warning(f"Dataset profile cache disabled: {str(e)}")
+            self.store = None
+
+    def profile(self, path: str) -> Dict[str, Any]:
+        path = os.path.abspath(path)
+        key = "profile:" + path + ":" + json.dumps(fingerprint(path), sort_keys=True)
+        if self.store is not None:
+            cached = self.store.get_json(key)
+            if cached is not None:
+                return cached
+        if os.path.getsize(path) <= DATASET_IN_MEMORY_MB * 1024 * 1024:
+            # Small enough to profile the cached frame in one go
+            chunks: Iterable[pd.DataFrame] = [load_dataset(path).copy(deep=False)]
+        else:
+            chunks = iter_chunks(path, DATASET_PROFILE_CHUNK_ROWS)
+        profile = profile_frames(chunks)
+        logger.info(f"Profiled {path}: {profile['rows']} rows in {profile['chunks']} chunks")
+        if self.store is not None:
+            self.store.set_json(key, profile)
+        return profile
+
+dataset_profiler = DatasetProfiler()
+
+def _number(value: Any) -> str:
+    return "n/a" if value is None else f"{value:.4g}"
+
+def format_profile(name: str, profile: Dict[str, Any], columns: Optional[List[str]] = None) -> str:
+    """Compact text summary of a dataset profile."""
+    rows = profile["rows"]
+    lines = [f"Dataset {name}: {rows} rows x {len(profile['columns'])} columns"]
+    if profile["sample_rows"] < rows:
+        lines.append(f"(quantiles and correlations from a {profile['sample_rows']}-row random sample)")
+    selected = columns or list(profile["columns"])[:MAX_COLUMNS_SHOWN]
+    for column in selected:
+        info = profile["columns"].get(column)
+        if info is None:
+            lines.append(f"- {column}: no such column")
+            continue
+        null_share = info["nulls"] / rows if rows else 0
+        distinct = info["distinct"] if "distinct" in info else f"{info['distinct_at_least']}+"
+        parts = [f"{info['dtype']}", f"nulls {info['nulls']} ({null_share:.1%})", f"distinct {distinct}"]
+        if "mean" in info:
+            parts.append(f"mean {_number(info['mean'])} std {_number(info['std'])}")
+            quartiles = info["quantiles"] or [None] * len(QUANTILES)
+            parts.append("min/q1/median/q3/max " + "/".join(_number(v) for v in [info["min"], *quartiles, info["max"]]))
+        if info.get("top") and ("mean" not in info or info["distinct"] <= 20):
+            total = rows - info["nulls"] or 1
+            parts.append("top " + ", ".join(f"{value} ({count / total:.0%})" for value, count in info["top"]))
+        lines.append(f"- {column}: " + "; ".join(parts))
+    hidden = len(profile["columns"]) - len(selected)
+    if not columns and hidden > 0:
+        lines.append(f"... {hidden} more columns; pass their names in `columns` to see them")
+    if profile["correlations"]:
+        lines.append("Strongest correlations: " + ", ".join(f"{a}~{b} {r:+.2f}" for a, b, r in profile["correlations"]))
+    return "\n".join(lines)
+
+@offload_blocking
+@tool
+def profile_dataset(
+    data_path: Annotated[str, "Path to the CSV file"] = './data.csv',
+    columns: Annotated[Optional[List[str]], "Columns to describe; all columns when omitted"] = None
+) -> str:
+    """
+    Summarize a CSV dataset: per column the type, null count, number of distinct
+    values, mean, standard deviation, quartiles and most frequent values, plus the
+    strongest correlations between numeric columns. Use this to understand a dataset
+    instead of reading its rows.
+    """
+    try:
+        file_path = normalize_path(data_path)
+        if not os.path.exists(file_path):
+            return f"Error: The file {data_path} was not found."
+        profile = dataset_profiler.profile(file_path)
+        return format_profile(os.path.basename(file_path), profile, columns)
+    except Exception as e:
+        logger.error(f"Error profiling dataset: {str(e)}")
+        return f"Error profiling dataset: {str(e)}"
@@ -0,0 +1,114 @@
+import os
+from typing import Annotated, Dict, List, Optional
+import pandas as pd
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import DATASTREAM_CHUNK_ROWS, DATA_TOOL_MAX_ROWS
+from tools.executor import offload_blocking
+from tools.FileEdit import normalize_path
+from tools.workspace import datastream
+
+# Set up logger
+logger = setup_logger()
+
+WHERE_HELP = "Row filter as a pandas query expression, e.g. \"year >= 2020 and country == 'US'\""
+
+def format_frame(data: pd.DataFrame, total: Optional[int] = None) -> str:
+    """Render at most DATA_TOOL_MAX_ROWS rows of a result as text."""
+    total = len(data) if total is None else total
+    if data.empty:
+        return "No rows."
+    text = data.head(DATA_TOOL_MAX_ROWS).to_string(index=False, max_cols=20, max_colwidth=60)
+    if total > DATA_TOOL_MAX_ROWS:
+        text += f"\n... {total - DATA_TOOL_MAX_ROWS} more rows"
+    return text
+
+def parse_metrics(metrics: List[str]) -> Dict[str, List[str]]:
+    """Turn ['price:mean', 'price:max'] into {'price': ['mean', 'max']}."""
+    parsed: Dict[str, List[str]] = {}
+    for metric in metrics:
+        column, _, function = metric.rpartition(":")
+        if not column:
+            raise ValueError(f"Metric '{metric}' is not of the form 'column:function'")
+        parsed.setdefault(column.strip(), []).append(function.strip().lower())
+    return parsed
+
+def _existing(data_path: str) -> str:
+    file_path = normalize_path(data_path)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"The file {data_path} was not found.")
+    return file_path
+
+@offload_blocking
+@tool
+def aggregate_data(
+    data_path: Annotated[str, "Path to the CSV file"],
+    metrics: Annotated[List[str], "Metrics as 'column:function', e.g. ['price:mean', 'price:max']; functions: count, sum, mean, min, max, std, var"],
+    group_by: Annotated[Optional[List[str]], "Columns to group by"] = None,
+    where: Annotated[Optional[str], WHERE_HELP] = None
+) -> str:
+    """
+    Compute counts, sums, means, extremes and standard deviations of CSV columns,
+    optionally per group and over filtered rows. The file is streamed in chunks,
+    so this works on datasets larger than memory.
+    """
+    try:
+        result = datastream.aggregate(
+            _existing(data_path), parse_metrics(metrics), by=group_by, where=where, chunksize=DATASTREAM_CHUNK_ROWS
+        )
+        return format_frame(result)
+    except Exception as e:
+        logger.error(f"Error aggregating data: {str(e)}")
+        return f"Error aggregating data: {str(e)}"
+
+@offload_blocking
+@tool
+def filter_data(
+    data_path: Annotated[str, "Path to the CSV file"],
+    where: Annotated[str, WHERE_HELP],
+    columns: Annotated[Optional[List[str]], "Columns to return; all when omitted"] = None,
+    limit: Annotated[int, "Number of matching rows to return"] = 20,
+    output_file: Annotated[Optional[str], "CSV file to write all matching rows to instead of returning them"] = None
+) -> str:
+    """
+    Find the rows of a CSV file matching a filter, streaming the file in chunks.
+    Returns the first matching rows, or writes every match to output_file so it
+    can be analyzed further.
+    """
+    try:
+        file_path = _existing(data_path)
+        if output_file:
+            output_path = normalize_path(output_file)
+            written = datastream.filter_rows(
+                file_path, where, columns=columns, output=output_path, chunksize=DATASTREAM_CHUNK_ROWS
+            )
+            return f"Wrote {written} matching rows to {output_path}"
+        limit = max(1, min(limit, DATA_TOOL_MAX_ROWS))
+        result = datastream.filter_rows(file_path, where, columns=columns, limit=limit, chunksize=DATASTREAM_CHUNK_ROWS)
+        return format_frame(result)
+    except Exception as e:
+        logger.error(f"Error filtering data: {str(e)}")
+        return f"Error filtering data: {str(e)}"
+
+@offload_blocking
+@tool
+def sample_data(
+    data_path: Annotated[str, "Path to the CSV file"],
+    n: Annotated[int, "Number of rows to sample"] = 20,
+    where: Annotated[Optional[str], WHERE_HELP] = None,
+    columns: Annotated[Optional[List[str]], "Columns to return; all when omitted"] = None,
+    seed: Annotated[Optional[int], "Random seed for a reproducible sample"] = None
+) -> str:
+    """
+    Draw a uniform random sample of rows from a CSV file, optionally from the rows
+    matching a filter. The file is streamed, so this works on any file size.
+    """
+    try:
+        n = max(1, min(n, DATA_TOOL_MAX_ROWS))
+        result = datastream.sample(
+            _existing(data_path), n, where=where, columns=columns, seed=seed, chunksize=DATASTREAM_CHUNK_ROWS
+        )
+        return format_frame(result)
+    except Exception as e:
+        logger.error(f"Error sampling data: {str(e)}")
+        return f"Error sampling data: {str(e)}"
@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from logger import setup_logger
+from load_cfg import DATASET_CACHE_ENABLED, DATASET_CACHE_DIRECTORY, DATASET_SNIFF_BYTES
+from tools.workspace.datastream import sniff_encoding
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    # Without pyarrow parsed frames are cached as pickles instead of Parquet
+    pyarrow = None
+
+# Set up logger
+logger = setup_logger()
+
+# Bytes hashed from the start and the end of a file for its fingerprint
+FINGERPRINT_SAMPLE_BYTES = 1 << 20
+
+def fingerprint(path: str) -> Dict[str, object]:
+    """Size, modification time and a hash of the first and last MB of a file."""
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(stat.st_size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > 2 * FINGERPRINT_SAMPLE_BYTES:
+            f.seek(-FINGERPRINT_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read())
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+
+def read_csv(path: str, **kwargs) -> Tuple[pd.DataFrame, str]:
+    """Parse a CSV once with its sniffed encoding, falling back to latin1 if the sample misled."""
+    encoding = sniff_encoding(path, DATASET_SNIFF_BYTES)
+    # Infer each column's type from all of its values rather than per internal block
+    kwargs.setdefault("low_memory", False)
+    try:
+        return pd.read_csv(path, encoding=encoding, **kwargs), encoding
+    except UnicodeDecodeError as e:
+        logger.warning(f"{path} is not valid {encoding} past the sniffed sample, reading as latin1: {e}")
+        return pd.read_csv(path, encoding="latin1", **kwargs), "latin1"
+
+class DatasetCache:
+    """
+    Parsed CSV files cached as Parquet (or pickle without pyarrow) under the cache
+    directory, with a sidecar JSON holding the source's fingerprint. A cached frame
+    is used while the CSV's size, modification time and sampled hash are unchanged.
+    """
+
+    def __init__(self, directory: str = DATASET_CACHE_DIRECTORY):
+        self.directory = directory
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, path: str) -> Tuple[str, str]:
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+        stem = os.path.join(self.directory, f"{os.path.splitext(os.path.basename(path))[0]}-{name}")
+        return stem + ".json", stem + (".parquet" if pyarrow is not None else ".pkl")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _read_cached(self, meta_path: str, key: Dict[str, object]) -> Optional[pd.DataFrame]:
+        if not os.path.exists(meta_path):
+            return None
+        data_path = meta_path
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("source") != key:
+                return None
+            data_path = os.path.join(self.directory, meta["data"])
+            if data_path.endswith(".parquet"):
+                return pd.read_parquet(data_path)
+            return pd.read_pickle(data_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable dataset cache {data_path}: {e}")
+            return None
+
+    def _write_cached(self, meta_path: str, data_path: str, key: Dict[str, object], data: pd.DataFrame, encoding: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = data_path + ".tmp"
+        try:
+            if data_path.endswith(".parquet"):
+                try:
+                    data.to_parquet(tmp_path, index=False)
+                except Exception as e:
+                    # Mixed-type object columns cannot always be stored as Parquet
+                    logger.warning(f"Caching dataset as pickle, Parquet failed: {e}")
+                    data_path = data_path[:-len(".parquet")] + ".pkl"
+                    data.to_pickle(tmp_path)
+            else:
+                data.to_pickle(tmp_path)
+            os.replace(tmp_path, data_path)
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"source": key, "encoding": encoding, "data": os.path.basename(data_path)}, f)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            logger.warning(f"Could not cache dataset {data_path}: {e}")
+
+    def load(self, path: str) -> pd.DataFrame:
+        """Return the parsed CSV at ``path``, from the cache when the file is unchanged."""
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such file: {path}")
+        if not DATASET_CACHE_ENABLED:
+            return read_csv(path)[0]
+        # Concurrent loads of one file wait for a single parse
+        with self._lock(path):
+            key = fingerprint(path)
+            meta_path, data_path = self._paths(path)
+            data = self._read_cached(meta_path, key)
+            if data is not None:
+                self.hits += 1
+                logger.info(f"Loaded {path} from dataset cache")
+                return data
+            self.misses += 1
+            data, encoding = read_csv(path)
+            logger.info(f"Parsed {path} with encoding {encoding}: {len(data)} rows")
+            self._write_cached(meta_path, data_path, key, data, encoding)
+            return data
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+# Cache shared by the data tools of all agents
+dataset_cache = DatasetCache()
+
+def load_dataset(path: str) -> pd.DataFrame:
+    return dataset_cache.load(path)
@@ -0,0 +1,236 @@
+import re
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from logger import setup_logger
+from load_cfg import DOCUMENT_STORE_PATH
+from core.disk_cache import DiskCache
+from core.session import get_thread_id
+from tools.extraction import paginate
+from tools.http_cache import canonicalize_url
+
+# Set up logger
+logger = setup_logger()
+
+ARXIV_ID = re.compile(r"(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(v\d+)?", re.IGNORECASE)
+
+def arxiv_key(arxiv_id: str) -> str:
+    """Store key of an arXiv paper; versions share one key."""
+    match = ARXIV_ID.fullmatch(arxiv_id.strip())
+    return f"arxiv:{(match.group(1) if match else arxiv_id.strip()).lower()}"
+
+def wikipedia_key(title: str) -> str:
+    return "wikipedia:" + " ".join(title.replace("_", " ").split()).lower()
+
+def key_for_url(url: str) -> str:
+    """
+    Store key of a URL: arXiv and Wikipedia article links map to the same keys as
+    the arxiv and wikipedia tools, anything else to its canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.endswith("arxiv.org"):
+        match = re.match(r"/(?:abs|pdf)/(.+?)(?:\.pdf)?/?$", parts.path)
+        if match and ARXIV_ID.fullmatch(match.group(1)):
+            return arxiv_key(match.group(1))
+    if host.endswith("wikipedia.org") and parts.path.startswith("/wiki/"):
+        return wikipedia_key(unquote(parts.path[len("/wiki/"):]))
+    return f"url:{canonicalize_url(url)}"
+
+class StoredDocument:
+    """A fetched source held in the document store."""
+
+    def __init__(self, doc_id: str, key: str, source: str, title: str, text: str, fetched: Optional[float] = None):
+        self.doc_id = doc_id
+        self.key = key
+        self.source = source
+        self.title = title
+        self.text = text
+        self.fetched = fetched or time.time()
+        self._pages: Optional[List[str]] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "doc_id": self.doc_id, "key": self.key, "source": self.source,
+            "title": self.title, "text": self.text, "fetched": self.fetched,
+        }
+
+    @property
+    def pages(self) -> List[str]:
+        if self._pages is None:
+            self._pages = paginate(self.text)
+        return self._pages
+
+    def page(self, number: int = 1) -> str:
+        """Return one page of the document, with a pointer to the next page if there is one."""
+        pages = self.pages
+        number = min(max(number, 1), len(pages))
+        text = pages[number - 1]
+        if number < len(pages):
+            text += f"\n\n[Page {number} of {len(pages)}; read_stored_document('{self.doc_id}', page={number + 1}) continues]"
+        return text
+
+def describe(document: StoredDocument, text: str) -> str:
+    """Header identifying a stored document, so agents can cite and re-read it by ID."""
+    return f"[{document.doc_id}] {document.title} ({document.source})\n{text}"
+
+class DocumentStore:
+    """
+    Session-scoped store of fetched sources shared by all agents.
+
+    Documents are keyed by canonical URL, arXiv ID or Wikipedia title, and get
+    a short ID agents can cite and read back instead of repeating the text.
+    Tools check the store before fetching; concurrent requests for the same key
+    are coalesced into a single fetch.
+
+    Documents are also written to a SQLite file per session, so a session resumed
+    in a new process reads back the documents its history cites, and new fetches
+    continue the ID sequence instead of reusing IDs. end_session releases a
+    session's documents from memory.
+    """
+
+    def __init__(self, path: Optional[str] = DOCUMENT_STORE_PATH):
+        self._lock = threading.Lock()
+        # session -> key -> document, and session -> doc_id -> document
+        self._by_key: Dict[str, Dict[str, StoredDocument]] = {}
+        self._by_id: Dict[str, Dict[str, StoredDocument]] = {}
+        # session -> IDs of all documents stored for it, in order
+        self._ids: Dict[str, List[str]] = {}
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self.fetches = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.stored = 0
+        self.store: Optional[DiskCache] = None
+        if path:
+            try:
+                self.store = DiskCache(path)
+            except Exception as e:
+                logger.warning(f"Document persistence disabled: {str(e)}")
+
+    def _persisted(self, session: str) -> bool:
+        # Calls outside a research session share the 'default' session, which is never resumed
+        return self.store is not None and session != "default"
+
+    def _load(self, session: str) -> None:
+        """Read a session's documents from disk the first time it is used. Call with the lock held."""
+        if session in self._ids:
+            return
+        self._by_key[session], self._by_id[session] = {}, {}
+        self._ids[session] = (self.store.get_json(f"session:{session}") if self._persisted(session) else None) or []
+        for doc_id in self._ids[session]:
+            data = self.store.get_json(f"document:{session}:{doc_id}")
+            if data is None:
+                continue
+            document = StoredDocument(**data)
+            self._by_id[session][doc_id] = document
+            self._by_key[session][document.key] = document
+        if self._by_id[session]:
+            logger.info(f"Loaded {len(self._by_id[session])} stored documents of session {session}")
+
+    def get(self, key: str) -> Optional[StoredDocument]:
+        session = get_thread_id()
+        with self._lock:
+            self._load(session)
+            return self._by_key[session].get(key)
+
+    def get_by_id(self, doc_id: str) -> Optional[StoredDocument]:
+        session = get_thread_id()
+        with self._lock:
+            self._load(session)
+            return self._by_id[session].get(doc_id.strip())
+
+    def documents(self) -> List[StoredDocument]:
+        """Documents of the current session, in the order they were stored."""
+        session = get_thread_id()
+        with self._lock:
+            self._load(session)
+            return list(self._by_id[session].values())
+
+    def end_session(self, session: str) -> None:
+        """Release a session's documents from memory; they stay on disk for resuming it."""
+        with self._lock:
+            self._by_key.pop(session, None)
+            self._by_id.pop(session, None)
+            self._ids.pop(session, None)
+
+    def _claim(self, session: str, key: str) -> Tuple[Optional[StoredDocument], Future, bool]:
+        """Return a stored document, or the in-flight fetch and whether the caller must run it."""
+        with self._lock:
+            self._load(session)
+            document = self._by_key[session].get(key)
+            if document is not None:
+                self.hits += 1
+                return document, None, False
+            future = self._inflight.get((session, key))
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+            future = self._inflight[(session, key)] = Future()
+            self.fetches += 1
+            return None, future, True
+
+    def _finish(self, session: str, key: str, source: str, future: Future, result: Any = None, error: Optional[BaseException] = None) -> StoredDocument:
+        with self._lock:
+            del self._inflight[(session, key)]
+            if error is not None:
+                future.set_exception(error)
+                raise error
+            title, text = result
+            self._load(session)
+            ids = self._ids[session]
+            document = StoredDocument(f"doc-{len(ids) + 1}", key, source, title, text)
+            self._by_id[session][document.doc_id] = document
+            self._by_key[session][key] = document
+            ids.append(document.doc_id)
+            self.stored += 1
+            if self._persisted(session):
+                try:
+                    self.store.set_json(f"document:{session}:{document.doc_id}", document.to_json())
+                    self.store.set_json(f"session:{session}", ids)
+                except Exception as e:
+                    logger.warning(f"Could not persist document {document.doc_id}: {str(e)}")
+        future.set_result(document)
+        logger.info(f"Stored {source} document {document.doc_id}: {title}")
+        return document
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Tuple[str, str]], source: str) -> StoredDocument:
+        """
+        Return the stored document for ``key``, calling ``fetch`` for its (title,
+        text) only if it is neither stored nor already being fetched.
+        """
+        session = get_thread_id()
+        document, future, leader = self._claim(session, key)
+        if document is not None:
+            return document
+        if not leader:
+            return future.result()
+        try:
+            result = fetch()
+        except BaseException as e:
+            self._finish(session, key, source, future, error=e)
+        return self._finish(session, key, source, future, result=result)
+
+    async def aget_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Tuple[str, str]]], source: str) -> StoredDocument:
+        """Async version of get_or_fetch."""
+        session = get_thread_id()
+        document, future, leader = self._claim(session, key)
+        if document is not None:
+            return document
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await fetch()
+        except BaseException as e:
+            self._finish(session, key, source, future, error=e)
+        return self._finish(session, key, source, future, result=result)
+
+    def stats(self) -> Dict[str, int]:
+        # Documents stored by this process; ended sessions no longer hold theirs in memory
+        return {"documents": self.stored, "fetches": self.fetches, "hits": self.hits, "coalesced": self.coalesced}
+
+# Store shared by the research tools of all agents
+document_store = DocumentStore()
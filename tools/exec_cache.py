@@ -0,0 +1,188 @@
+import os
+import ast
+import json
+import hashlib
+import builtins
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+from logger import setup_logger
+from core.disk_cache import DiskCache
+from load_cfg import WORKING_DIRECTORY, CONDA_ENV, EXEC_CACHE_PATH, EXEC_CACHE_MAX_MB, EXEC_CACHE_MAX_FILE_MB
+
+# Set up logger
+logger = setup_logger()
+
+_BUILTINS = set(dir(builtins)) | {"__file__", "__name__", "__builtins__", "__doc__"}
+
+def _free_names(tree: ast.AST) -> Set[str]:
+    """
+    Names the code reads but never binds itself. Code with free names depends on
+    variables left in the Python session by earlier calls and is not cached.
+    """
+    loaded, bound = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            bound.add(node.name)
+    return loaded - bound - _BUILTINS
+
+# Calls that list directories or build paths at run time, so the files a run reads
+# cannot be known from its string literals
+PATH_CALLS = {"glob", "iglob", "listdir", "scandir", "walk", "fwalk", "iterdir", "rglob", "joinpath", "Path", "PurePath"}
+
+def _dynamic_paths(tree: ast.AST) -> Set[str]:
+    """Names of the calls in the code that enumerate directories or build paths."""
+    found = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        if isinstance(func, ast.Name) and (func.id in PATH_CALLS or func.id == "join"):
+            # A bare join() is os.path.join imported by name; str.join is always an attribute
+            found.add(func.id)
+        elif isinstance(func, ast.Attribute):
+            owner = func.value.attr if isinstance(func.value, ast.Attribute) else getattr(func.value, "id", None)
+            if func.attr in PATH_CALLS or (func.attr == "join" and owner == "path"):
+                found.add(f"{owner}.{func.attr}" if owner else func.attr)
+    return found
+
+def _string_literals(tree: ast.AST) -> Set[str]:
+    return {node.value for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str)}
+
+class ExecCache:
+    """
+    Content-addressed cache of successful execute_code runs.
+
+    A run is keyed by its session, its code and the content hashes of the
+    workspace files the code names in string literals, so editing an input file
+    invalidates it and sessions and agents never share results. Code that lists
+    directories or builds paths (glob, os.listdir, os.path.join, pathlib) reads
+    files the key cannot see and is not cached. The
+    cache stores the captured output and the files the run created or changed,
+    and restores them on a hit. Entries are evicted least-recently-used once the
+    cache exceeds its size budget.
+    """
+
+    def __init__(self, path: str = EXEC_CACHE_PATH, max_bytes: int = int(EXEC_CACHE_MAX_MB * 1024 * 1024)):
+        self.store = DiskCache(path, max_bytes=max_bytes)
+        self.max_file_bytes = int(EXEC_CACHE_MAX_FILE_MB * 1024 * 1024)
+        # (path, mtime, size) -> sha256, so unchanged inputs are hashed once
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, code: str, session: str) -> Optional[str]:
+        """Return the cache key for the code run by a session, or None if the run cannot be cached."""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+        free = _free_names(tree)
+        if free:
+            logger.debug(f"Not caching code that uses session variables: {sorted(free)[:5]}")
+            return None
+        dynamic = _dynamic_paths(tree)
+        if dynamic:
+            logger.debug(f"Not caching code that finds its input files at run time: {sorted(dynamic)[:5]}")
+            return None
+
+        inputs = []
+        for literal in sorted(_string_literals(tree)):
+            if len(literal) > 500 or "\n" in literal:
+                continue
+            path = os.path.normpath(os.path.join(WORKING_DIRECTORY, literal))
+            if os.path.isfile(path):
+                inputs.append((os.path.relpath(path, WORKING_DIRECTORY), self._file_hash(path)))
+        payload = json.dumps({"session": session, "code": code, "env": CONDA_ENV, "inputs": inputs})
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        fingerprint = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(fingerprint)
+        if cached is not None:
+            return cached
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self._hashes[fingerprint] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Record (mtime, size) of every workspace file, skipping hidden directories."""
+        files = {}
+        for root, dirs, names in os.walk(WORKING_DIRECTORY):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[os.path.relpath(path, WORKING_DIRECTORY)] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def replay(self, key: str) -> Optional[Dict[str, Any]]:
+        """Restore the outputs of a cached run and return its result, or None on a miss."""
+        entry = self.store.get_json(f"run:{key}")
+        if entry is None:
+            self.misses += 1
+            return None
+        blobs = {}
+        for relpath, blob_hash in entry["files"].items():
+            blob = self.store.get(f"blob:{blob_hash}")
+            if blob is None:
+                # An output was evicted, the run has to be repeated
+                self.misses += 1
+                return None
+            blobs[relpath] = (blob_hash, blob)
+        for relpath, (blob_hash, blob) in blobs.items():
+            path = os.path.join(WORKING_DIRECTORY, relpath)
+            if os.path.isfile(path) and os.path.getsize(path) == len(blob) and self._file_hash(path) == blob_hash:
+                continue
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(blob)
+        self.hits += 1
+        logger.info(f"Execution cache hit, restored {len(blobs)} output files")
+        return entry["result"]
+
+    def store_run(self, key: str, result: Dict[str, Any], before: Dict[str, Tuple[int, int]], exclude: List[str]) -> None:
+        """Cache a successful run together with the files it created or changed."""
+        if result.get("returncode") != 0 or result.get("timed_out") or result.get("truncated"):
+            return
+        excluded = {os.path.relpath(os.path.abspath(path), os.path.abspath(WORKING_DIRECTORY)) for path in exclude}
+        files = {}
+        for relpath, stamp in self.snapshot().items():
+            if relpath in excluded or before.get(relpath) == stamp:
+                continue
+            path = os.path.join(WORKING_DIRECTORY, relpath)
+            if stamp[1] > self.max_file_bytes:
+                logger.info(f"Not caching run: output {relpath} is larger than the per-file limit")
+                return
+            with open(path, "rb") as f:
+                blob = f.read()
+            blob_hash = hashlib.sha256(blob).hexdigest()
+            self.store.set(f"blob:{blob_hash}", blob)
+            files[relpath] = blob_hash
+        self.store.set_json(f"run:{key}", {"result": result, "files": files})
+        logger.info(f"Cached execution result with {len(files)} output files")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,51 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from langchain_core.tools import StructuredTool
+from logger import setup_logger
+from load_cfg import TOOL_EXECUTOR_WORKERS
+
+# Set up logger
+logger = setup_logger()
+
+# Shared, bounded pool for blocking tool work (subprocesses, browsers, file IO)
+_executor = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="tool-worker")
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking callable on the bounded tool executor without blocking the event loop.
+
+    The caller's context variables are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def offload_blocking(blocking_tool: StructuredTool) -> StructuredTool:
+    """
+    Give a synchronous tool an async implementation that runs on the bounded executor.
+
+    Use it as the outermost decorator on top of @tool.
+    """
+    func = blocking_tool.func
+
+    async def coroutine(*args: Any, **kwargs: Any) -> Any:
+        return await run_blocking(func, *args, **kwargs)
+
+    blocking_tool.coroutine = coroutine
+    return blocking_tool
+
+def async_implementation(coroutine: Callable[..., Any]) -> Callable[[StructuredTool], StructuredTool]:
+    """
+    Give a synchronous tool a native async implementation.
+
+    Use it as the outermost decorator on top of @tool.
+    """
+    def decorator(sync_tool: StructuredTool) -> StructuredTool:
+        sync_tool.coroutine = coroutine
+        return sync_tool
+    return decorator
+
+logger.info(f"Tool executor initialized with {TOOL_EXECUTOR_WORKERS} workers")
@@ -0,0 +1,213 @@
+import re
+import atexit
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+from bs4 import BeautifulSoup, NavigableString, Tag
+from logger import setup_logger
+from load_cfg import EXTRACTION_WORKERS, SCRAPE_CHUNK_TOKENS, SCRAPE_PAGE_TOKEN_CAP
+from tools.executor import run_blocking
+
+# Set up logger
+logger = setup_logger()
+
+# Elements that never hold page content
+DROP_TAGS = (
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "form", "button",
+    "input", "select", "nav", "footer", "aside", "meta", "link"
+)
+DROP_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog"}
+# class/id names of navigation, cookie banners, share widgets and similar chrome; a class or
+# id matches as a whole word or with a suffix ("sidebar", "sidebar-widget"), so modifier
+# classes of content wrappers such as "has-sidebar" or "comments-open" do not
+BOILERPLATE = re.compile(
+    r"(nav|navbar|menu|footer|masthead|cookie|consent|banner|sidebar|breadcrumbs?|"
+    r"comments?|advert|ads?|share|social|subscribe|newsletter|popup|modal|related|promo)([-_].*)?",
+    re.IGNORECASE
+)
+# Share of the page text above which an element is kept even if its class looks like boilerplate
+MAX_BOILERPLATE_SHARE = 0.5
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+BLOCKS = {"p", "div", "section", "article", "main", "header", "hgroup", "blockquote", "figcaption", "dd", "dt", "li", "pre"}
+
+def _is_boilerplate(tag: Tag) -> bool:
+    if tag.get("role") in DROP_ROLES or tag.get("aria-hidden") == "true":
+        return True
+    names = list(tag.get("class") or []) + (tag.get("id") or "").split()
+    return any(BOILERPLATE.fullmatch(name) for name in names)
+
+def _holds_content(tag: Tag, total: int) -> bool:
+    """Whether an element wraps the main content: a main or article element, or most of the text."""
+    if tag.find(["main", "article"]) is not None or tag.find(attrs={"role": "main"}) is not None:
+        return True
+    return len(tag.get_text(" ", strip=True)) > MAX_BOILERPLATE_SHARE * total
+
+def _cell_text(cell: Tag) -> str:
+    return " ".join(cell.get_text(" ").split()).replace("|", "/")
+
+def _render_table(table: Tag) -> str:
+    """Render a table as Markdown rows."""
+    rows = []
+    for row in table.find_all("tr"):
+        cells = [_cell_text(cell) for cell in row.find_all(["th", "td"])]
+        if any(cells):
+            rows.append("| " + " | ".join(cells) + " |")
+    if not rows:
+        return ""
+    width = rows[0].count("|") - 1
+    return "\n".join([rows[0], "|" + " --- |" * width] + rows[1:])
+
+def _render(node: Tag, out: List[str]) -> None:
+    """Append the text blocks of a node to ``out``, keeping headings, list items and tables."""
+    inline: List[str] = []
+
+    def flush() -> None:
+        text = " ".join("".join(inline).split())
+        if text:
+            out.append(text)
+        inline.clear()
+
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            if child.__class__ is NavigableString:
+                inline.append(str(child))
+            continue
+        if not isinstance(child, Tag):
+            continue
+        name = child.name
+        if name in HEADINGS:
+            flush()
+            text = " ".join(child.get_text(" ").split())
+            if text:
+                out.append("#" * HEADINGS[name] + " " + text)
+        elif name == "table":
+            flush()
+            table = _render_table(child)
+            if table:
+                out.append(table)
+        elif name == "pre":
+            flush()
+            out.append(child.get_text().strip("\n"))
+        elif name == "li":
+            flush()
+            items: List[str] = []
+            _render(child, items)
+            if items:
+                out.append("- " + items[0])
+                out.extend(items[1:])
+        elif name == "br":
+            inline.append("\n")
+        elif name in BLOCKS or name in ("ul", "ol", "dl", "figure"):
+            flush()
+            _render(child, out)
+        else:
+            inline.append(child.get_text(" "))
+    flush()
+
+def _main_root(soup: BeautifulSoup) -> Tag:
+    """The element holding the main content: <main> or <article> if substantial, else <body>."""
+    body = soup.body or soup
+    total = len(body.get_text(" ", strip=True)) or 1
+    for candidate in (soup.find("main"), soup.find(attrs={"role": "main"}), soup.find("article")):
+        if candidate is not None and len(candidate.get_text(" ", strip=True)) >= 0.25 * total:
+            return candidate
+    return body
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of spaces and blank lines and drop repeated consecutive lines."""
+    lines, previous = [], None
+    for line in text.splitlines():
+        line = re.sub(r"[ \t\u00a0]+", " ", line).strip()
+        if line == previous and line:
+            continue
+        if not line and (not lines or not lines[-1]):
+            continue
+        lines.append(line)
+        previous = line
+    return "\n".join(lines).strip()
+
+def extract_main_content(html: str) -> str:
+    """
+    Extract the readable content of an HTML page as Markdown-like text: drops
+    scripts, navigation, footers and other boilerplate, keeps headings, lists
+    and tables, and normalizes whitespace.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = " ".join(soup.title.get_text(" ").split()) if soup.title else ""
+    for tag in soup.find_all(DROP_TAGS):
+        tag.decompose()
+    # Site headers go, but an article's own header holds its title
+    for tag in soup.find_all("header"):
+        if tag.find_parent(["article", "main"]) is None:
+            tag.decompose()
+    total = len((soup.body or soup).get_text(" ", strip=True)) or 1
+    for tag in soup.find_all(True):
+        if (
+            not tag.decomposed and tag.name not in ("html", "body", "main", "article")
+            and _is_boilerplate(tag) and not _holds_content(tag, total)
+        ):
+            tag.decompose()
+
+    blocks: List[str] = []
+    _render(_main_root(soup), blocks)
+    text = normalize_text("\n\n".join(blocks))
+    if title and not text.startswith("# "):
+        text = f"# {title}\n\n{text}"
+    return text
+
+def paginate(text: str, max_tokens: int = SCRAPE_PAGE_TOKEN_CAP, chunk_tokens: int = SCRAPE_CHUNK_TOKENS) -> List[str]:
+    """
+    Split a document into pages of at most ``max_tokens``, made of chunks cut at
+    paragraph boundaries. 0 disables the cap and returns a single page.
+    """
+    # Imported here so extraction workers do not load the tokenizer
+    from core.context_window import count_tokens
+    from core.materials import chunk_text
+
+    if max_tokens <= 0 or count_tokens(text) <= max_tokens:
+        return [text]
+    pages, current, used = [], [], 0
+    for chunk in chunk_text(text, min(chunk_tokens, max_tokens)):
+        tokens = count_tokens(chunk)
+        if current and used + tokens > max_tokens:
+            pages.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(chunk)
+        used += tokens
+    if current:
+        pages.append("\n\n".join(current))
+    return pages
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    with _pool_lock:
+        if _pool is None and EXTRACTION_WORKERS > 0:
+            # By now the process runs the scrape loop, executor and kernel threads, and a
+            # forked worker could inherit a lock one of them holds; start workers clean instead
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context(method))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+async def aextract_main_content(html: str) -> str:
+    """
+    Extract a page in the worker process pool so parsing neither blocks the event
+    loop nor holds the GIL; falls back to a thread if the pool is unavailable.
+    """
+    global _pool
+    pool = _get_pool()
+    if pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, extract_main_content, html)
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Extraction pool unavailable, parsing in a thread: {str(e)}")
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+    return await run_blocking(extract_main_content, html)
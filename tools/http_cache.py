@@ -0,0 +1,192 @@
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from logger import setup_logger
+from core.disk_cache import DiskCache
+from load_cfg import HTTP_CACHE_ENABLED, HTTP_CACHE_PATH, HTTP_CACHE_MAX_MB, HTTP_CACHE_TTL, FIRECRAWL_CACHE_TTL
+
+# Set up logger
+logger = setup_logger()
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+# Longest freshness inferred from Last-Modified when no explicit lifetime is given
+MAX_HEURISTIC_FRESHNESS = 24 * 3600
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL for use as a cache key: lowercase scheme and host, drop
+    default ports, fragments and tracking parameters, and sort the query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for item in value.split(","):
+        name, _, argument = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def freshness_lifetime(headers: Mapping[str, str], now: float) -> Optional[float]:
+    """
+    Seconds a response may be served without revalidation, per Cache-Control,
+    Expires or a Last-Modified heuristic. None means it must not be stored.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    if directives.get("max-age"):
+        try:
+            return max(float(directives["max-age"]), 0.0)
+        except ValueError:
+            return 0.0
+    expires = _http_date(headers.get("Expires"))
+    if expires is not None:
+        date = _http_date(headers.get("Date")) or now
+        return max(expires - date, 0.0)
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return min(max(now - last_modified, 0.0) * 0.1, MAX_HEURISTIC_FRESHNESS)
+    return 0.0
+
+class HttpCache:
+    """
+    Persistent HTTP response cache keyed by canonical URL.
+
+    It stores the raw body and the text extracted from it, so a fresh hit skips
+    both the network and parsing. Stale entries with an ETag or Last-Modified
+    are revalidated with a conditional request. A TTL override, if set, replaces
+    the servers' freshness rules. FireCrawl results are cached next to the
+    responses. The store has a size budget with LRU eviction.
+    """
+
+    def __init__(
+        self,
+        path: str = HTTP_CACHE_PATH,
+        max_bytes: int = int(HTTP_CACHE_MAX_MB * 1024 * 1024),
+        ttl_override: float = HTTP_CACHE_TTL
+    ):
+        self.store = DiskCache(path, max_bytes=max_bytes)
+        self.ttl_override = ttl_override or None
+        # Counters are updated from the tool executor's threads
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _count(self, counter: str) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a URL, fresh or stale, or None."""
+        entry = self.store.get_json(f"meta:{canonicalize_url(url)}")
+        if entry is None:
+            self._count("misses")
+        return entry
+
+    def peek(self, url: str) -> Optional[Dict[str, Any]]:
+        """Like lookup, without counting a miss."""
+        return self.store.get_json(f"meta:{canonicalize_url(url)}")
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        age = time.time() - entry["stored"]
+        if self.ttl_override is not None:
+            return age < self.ttl_override
+        return age < entry["lifetime"]
+
+    def body(self, url: str) -> Optional[bytes]:
+        return self.store.get(f"body:{canonicalize_url(url)}")
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store_response(self, url: str, headers: Mapping[str, str], body: bytes, text: str, extractor: str) -> None:
+        """Cache a 200 response with its extracted text, unless the server forbids it."""
+        now = time.time()
+        lifetime = freshness_lifetime(headers, now)
+        if lifetime is None and self.ttl_override is None:
+            return
+        key = canonicalize_url(url)
+        self.store.set(f"body:{key}", body)
+        self.store.set_json(f"meta:{key}", {
+            "url": url,
+            "stored": now,
+            "lifetime": lifetime or 0.0,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "extractor": extractor,
+            "text": text,
+        })
+
+    def mark_hit(self) -> None:
+        self._count("hits")
+
+    def mark_revalidated(self, url: str, entry: Dict[str, Any], headers: Mapping[str, str]) -> None:
+        """Renew a stale entry after a 304 Not Modified response."""
+        now = time.time()
+        lifetime = freshness_lifetime(headers, now)
+        entry["stored"] = now
+        entry["lifetime"] = lifetime if lifetime is not None else entry["lifetime"]
+        entry["etag"] = headers.get("ETag", entry.get("etag"))
+        entry["last_modified"] = headers.get("Last-Modified", entry.get("last_modified"))
+        self.store.set_json(f"meta:{canonicalize_url(url)}", entry)
+        self._count("revalidated")
+
+    def update_text(self, url: str, entry: Dict[str, Any], text: str, extractor: str) -> None:
+        """Replace the extracted text of an entry, e.g. after the extractor changed."""
+        entry["text"] = text
+        entry["extractor"] = extractor
+        self.store.set_json(f"meta:{canonicalize_url(url)}", entry)
+
+    def get_firecrawl(self, url: str) -> Optional[str]:
+        text = self.store.get_json(f"firecrawl:{canonicalize_url(url)}")
+        if text is not None:
+            self._count("hits")
+        return text
+
+    def set_firecrawl(self, url: str, text: str) -> None:
+        self.store.set_json(f"firecrawl:{canonicalize_url(url)}", text, ttl=self.ttl_override or FIRECRAWL_CACHE_TTL)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), "hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+def open_http_cache() -> Optional[HttpCache]:
+    """Open the HTTP cache if it is enabled, without failing the tools if it cannot open"""
+    if not HTTP_CACHE_ENABLED:
+        return None
+    try:
+        return HttpCache()
+    except Exception as e:
+        logger.warning(f"HTTP cache disabled: {str(e)}")
+        return None
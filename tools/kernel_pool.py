@@ -0,0 +1,331 @@
+import os
+import time
+import atexit
+import secrets
+import signal
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from multiprocessing.connection import Client
+from typing import Any, Callable, Dict, Optional, Tuple
+from logger import setup_logger
+from load_cfg import (
+    WORKING_DIRECTORY, KERNEL_POOL_SIZE, KERNEL_IDLE_TIMEOUT, KERNEL_START_TIMEOUT, KERNEL_PRELOAD,
+    EXEC_CPU_LIMIT, EXEC_MEMORY_LIMIT_MB, EXEC_OUTPUT_HEAD_CHARS, EXEC_OUTPUT_TAIL_CHARS
+)
+from tools.limits import SPILL_DIRECTORY, kill_process_tree
+
+# Set up logger
+logger = setup_logger()
+
+# Standalone worker script started inside the configured conda environment
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernel_worker.py")
+
+class KernelError(Exception):
+    """The kernel process died or the connection to it broke."""
+
+class KernelStartError(KernelError):
+    """The kernel process could not be started."""
+
+class KernelTimeout(KernelError):
+    """A call exceeded its timeout and the kernel could not be interrupted."""
+
+# Seconds an interrupted call gets to unwind before the kernel is killed
+INTERRUPT_GRACE = 5.0
+
+class Kernel:
+    """
+    A long-lived Python process that executes code in a persistent namespace.
+    """
+
+    def __init__(self, key: str, command_builder: Callable[[str], Tuple[str, bool, Optional[str]]]):
+        """
+        Start the kernel.
+
+        Args:
+            key (str): Session key the kernel belongs to.
+            command_builder: Turns a shell command into (command, shell, executable)
+                that runs it inside the configured conda environment.
+        """
+        self.key = key
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self.calls = 0
+        self.process: Optional[subprocess.Popen] = None
+        self.conn = None
+        self.worker_pid: Optional[int] = None
+        self._start(command_builder)
+
+    def _start(self, command_builder: Callable[[str], Tuple[str, bool, Optional[str]]]) -> None:
+        port_file = os.path.join(tempfile.gettempdir(), f"kernel-{secrets.token_hex(8)}.port")
+        log = tempfile.TemporaryFile()
+        authkey = secrets.token_bytes(16)
+        env = dict(
+            os.environ,
+            KERNEL_AUTHKEY=authkey.hex(),
+            KERNEL_PRELOAD=",".join(KERNEL_PRELOAD),
+            KERNEL_MEMORY_LIMIT_MB=str(EXEC_MEMORY_LIMIT_MB),
+            MPLBACKEND="Agg",
+        )
+        command, shell, executable = command_builder(f'python "{WORKER_PATH}" "{port_file}"')
+        popen_kwargs: Dict[str, Any] = {}
+        if os.name == "posix":
+            popen_kwargs["start_new_session"] = True
+        else:
+            popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+
+        started = time.time()
+        self.process = subprocess.Popen(
+            command,
+            shell=shell,
+            executable=executable,
+            cwd=WORKING_DIRECTORY,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+            **popen_kwargs
+        )
+        try:
+            deadline = started + KERNEL_START_TIMEOUT
+            while not os.path.exists(port_file):
+                if self.process.poll() is not None:
+                    log.seek(0)
+                    detail = log.read().decode("utf-8", errors="replace")[-2000:]
+                    raise KernelStartError(f"kernel exited with code {self.process.returncode}: {detail}")
+                if time.time() > deadline:
+                    raise KernelStartError(f"kernel did not start within {KERNEL_START_TIMEOUT}s")
+                time.sleep(0.05)
+            with open(port_file) as f:
+                port = int(f.read())
+            self.conn = Client(("127.0.0.1", port), authkey=authkey)
+            if not self.conn.poll(max(deadline - time.time(), 1.0)):
+                raise KernelStartError("kernel did not complete its handshake")
+            self.worker_pid = self.conn.recv()["pid"]
+        except Exception as e:
+            self.kill()
+            raise e if isinstance(e, KernelStartError) else KernelStartError(str(e))
+        finally:
+            log.close()
+            if os.path.exists(port_file):
+                os.remove(port_file)
+        logger.info(f"Started Python kernel for {self.key} in {time.time() - started:.2f}s (pid {self.process.pid})")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def execute(self, code: str, filename: str, timeout: float) -> Dict[str, Any]:
+        """
+        Run code and return its return code, (truncated) stdout and stderr.
+
+        A call running past ``timeout`` seconds is interrupted; its partial
+        result is returned with timed_out set, and the namespace is kept.
+
+        Raises:
+            KernelTimeout: If the call could not be interrupted in time.
+            KernelError: If the kernel died during the call.
+        """
+        try:
+            self.conn.send({
+                "op": "exec",
+                "code": code,
+                "filename": filename,
+                "cpu_limit": EXEC_CPU_LIMIT,
+                "head": EXEC_OUTPUT_HEAD_CHARS,
+                "tail": EXEC_OUTPUT_TAIL_CHARS,
+                "spill_dir": os.path.abspath(SPILL_DIRECTORY),
+            })
+            timed_out = not self.conn.poll(timeout)
+            if timed_out:
+                logger.warning(f"Python kernel for {self.key} exceeded its {timeout:.0f}s timeout, interrupting")
+                self.interrupt()
+                if not self.conn.poll(INTERRUPT_GRACE):
+                    raise KernelTimeout(f"timed out after {timeout:.0f} seconds")
+            result = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise KernelError(f"connection to kernel lost: {e!r}")
+        self.calls += 1
+        result["timed_out"] = timed_out
+        if timed_out:
+            result["returncode"] = result.get("returncode") or 1
+            result["stderr"] += f"\nTimed out after {timeout:.0f} seconds; execution was interrupted."
+        return result
+
+    def interrupt(self) -> None:
+        """Raise KeyboardInterrupt in the running code."""
+        if self.worker_pid is None or os.name != "posix":
+            return
+        try:
+            os.kill(self.worker_pid, signal.SIGINT)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        """Ask the kernel to exit, killing it if it does not."""
+        try:
+            if self.conn is not None and self.alive():
+                self.conn.send({"op": "shutdown"})
+                self.conn.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.kill()
+
+    def kill(self) -> None:
+        """Kill the kernel and any process it started."""
+        if self.process is not None:
+            kill_process_tree(self.process)
+
+class KernelPool:
+    """
+    Warm Python kernels, one per session key (research thread and agent).
+
+    Kernels are started on first use, restarted after a crash, closed after
+    ``idle_timeout`` seconds without calls and evicted least-recently-used when
+    more than ``max_kernels`` sessions are active.
+    """
+
+    def __init__(
+        self,
+        command_builder: Callable[[str], Tuple[str, bool, Optional[str]]],
+        max_kernels: int = KERNEL_POOL_SIZE,
+        idle_timeout: float = KERNEL_IDLE_TIMEOUT
+    ):
+        self.command_builder = command_builder
+        self.max_kernels = max(1, max_kernels)
+        self.idle_timeout = idle_timeout
+        self._kernels: "OrderedDict[str, Kernel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self.starts = 0
+        self.crashes = 0
+        atexit.register(self.shutdown)
+
+    def execute(self, key: str, code: str, filename: str, timeout: float) -> Dict[str, Any]:
+        """
+        Run code in the session's kernel with a wall-clock timeout.
+
+        Raises:
+            KernelStartError: If no kernel could be started; callers fall back to one-shot execution.
+        """
+        kernel = self._acquire(key)
+        with kernel.lock:
+            kernel.last_used = time.time()
+            try:
+                return kernel.execute(code, filename, timeout)
+            except KernelTimeout as e:
+                logger.error(f"Python kernel for {key} did not respond to an interrupt, killing it")
+                self._discard(key, kernel)
+                return {
+                    "returncode": -1,
+                    "stdout": "",
+                    "stderr": (
+                        f"Execution {e} and could not be interrupted, so the Python kernel was restarted. "
+                        "Variables from earlier calls were lost."
+                    ),
+                    "timed_out": True,
+                    "truncated": False,
+                }
+            except KernelError as e:
+                self.crashes += 1
+                logger.error(f"Python kernel for {key} crashed: {e}")
+                self._discard(key, kernel)
+                return {
+                    "returncode": -1,
+                    "stdout": "",
+                    "stderr": (
+                        f"The Python kernel crashed while running this code ({e}). "
+                        "Variables from earlier calls were lost; the next call starts a fresh kernel."
+                    ),
+                    "timed_out": False,
+                    "truncated": False,
+                }
+            finally:
+                kernel.last_used = time.time()
+
+    def _acquire(self, key: str) -> Kernel:
+        with self._lock:
+            kernel = self._kernels.get(key)
+            if kernel is not None and not kernel.alive():
+                logger.warning(f"Python kernel for {key} is no longer running, restarting it")
+                self.crashes += 1
+                del self._kernels[key]
+                kernel = None
+            if kernel is not None:
+                self._kernels.move_to_end(key)
+                return kernel
+
+        # Starting takes a while, so it happens outside the pool lock
+        kernel = Kernel(key, self.command_builder)
+        evicted = []
+        with self._lock:
+            existing = self._kernels.get(key)
+            if existing is not None and existing.alive():
+                evicted.append(kernel)
+                kernel = existing
+            else:
+                self.starts += 1
+                self._kernels[key] = kernel
+                evicted.extend(self._evict_over_capacity())
+            self._ensure_reaper()
+        for extra in evicted:
+            extra.close()
+        return kernel
+
+    def _evict_over_capacity(self) -> list:
+        """Remove least-recently-used idle kernels beyond the pool size. Call with the lock held."""
+        evicted = []
+        for key in list(self._kernels):
+            if len(self._kernels) <= self.max_kernels:
+                break
+            if not self._kernels[key].lock.locked():
+                logger.info(f"Evicting Python kernel for {key} (pool full)")
+                evicted.append(self._kernels.pop(key))
+        return evicted
+
+    def _discard(self, key: str, kernel: Kernel) -> None:
+        with self._lock:
+            if self._kernels.get(key) is kernel:
+                del self._kernels[key]
+        kernel.kill()
+
+    def _ensure_reaper(self) -> None:
+        if self.idle_timeout and (self._reaper is None or not self._reaper.is_alive()):
+            self._reaper = threading.Thread(target=self._reap, name="kernel-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        """Close kernels that have been idle longer than the idle timeout."""
+        while True:
+            time.sleep(max(1.0, min(self.idle_timeout / 2, 30.0)))
+            now = time.time()
+            idle = []
+            with self._lock:
+                for key, kernel in list(self._kernels.items()):
+                    if not kernel.lock.locked() and now - kernel.last_used > self.idle_timeout:
+                        idle.append(self._kernels.pop(key))
+                empty = not self._kernels
+            for kernel in idle:
+                logger.info(f"Closing idle Python kernel for {kernel.key}")
+                kernel.close()
+            if empty:
+                break
+
+    def reset(self, key: str) -> None:
+        """Close the session's kernel so its next call starts from a clean namespace."""
+        with self._lock:
+            kernel = self._kernels.pop(key, None)
+        if kernel is not None:
+            kernel.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"kernels": len(self._kernels), "starts": self.starts, "crashes": self.crashes}
+
+    def shutdown(self) -> None:
+        """Close every kernel."""
+        with self._lock:
+            kernels = list(self._kernels.values())
+            self._kernels.clear()
+        for kernel in kernels:
+            kernel.close()
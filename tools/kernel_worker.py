@@ -0,0 +1,214 @@
+"""
+Long-lived Python kernel used by tools.kernel_pool.
+
+Runs inside the configured conda environment, so it only depends on the
+standard library. It listens on a local port, writes that port to the file given
+as its first argument and executes code sent over the connection in a namespace
+that persists between calls.
+
+Usage: python kernel_worker.py <port_file>
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import secrets
+import tempfile
+import traceback
+import importlib
+from multiprocessing.connection import Listener
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows: CPU and memory limits are not enforced there
+    resource = None
+
+class CPUTimeLimitExceeded(Exception):
+    """Raised in the running code when it uses up its CPU time allowance."""
+
+def on_cpu_limit(signum, frame):
+    raise CPUTimeLimitExceeded("CPU time limit for this call exceeded")
+
+# Whether user code is running; interrupts outside of it are ignored
+executing = False
+
+def on_interrupt(signum, frame):
+    """
+    Interrupt the running code. The pool's timeout interrupt can arrive just after
+    a call finished, while the kernel waits for the next request; raising there
+    would kill the kernel and its session state, so it is dropped instead.
+    """
+    if executing:
+        raise KeyboardInterrupt
+
+def apply_memory_limit(limit_mb):
+    """Cap the kernel's address space, including everything the executed code starts."""
+    if resource is None or limit_mb <= 0:
+        return
+    limit = int(limit_mb * 1024 * 1024)
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+def set_cpu_allowance(seconds):
+    """
+    Allow the next call ``seconds`` of CPU time on top of what the kernel has
+    used so far; SIGXCPU is delivered when it runs out. None lifts the limit.
+    """
+    if resource is None or not hasattr(signal, "SIGXCPU"):
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if seconds is None:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+            return
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        allowance = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            allowance = min(allowance, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (allowance, hard))
+    except (ValueError, OSError):
+        pass
+
+def read_head_tail(f, head, tail, spill_dir, kind):
+    """
+    Return the captured output, keeping only its beginning and end if it is long.
+    Long output is copied in full to a spill file whose path is returned.
+    """
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    if size <= head + tail:
+        return f.read().decode("utf-8", errors="replace"), None
+    os.makedirs(spill_dir, exist_ok=True)
+    spill_path = os.path.join(spill_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}.{kind}.log")
+    with open(spill_path, "wb") as spill:
+        shutil.copyfileobj(f, spill)
+    f.seek(0)
+    first = f.read(head).decode("utf-8", errors="replace")
+    f.seek(size - tail)
+    last = f.read().decode("utf-8", errors="replace")
+    return f"{first}\n\n... [{size - head - tail} bytes omitted] ...\n\n{last}", spill_path
+
+def preload(modules):
+    """Import commonly used modules up front so the first call does not pay for them."""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass
+
+def close_figures():
+    """Release matplotlib figures left open by a call."""
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is not None:
+        try:
+            pyplot.close("all")
+        except Exception:
+            pass
+
+def run_code(request, namespace):
+    """
+    Execute code in the namespace, capturing stdout and stderr at the file
+    descriptor level so output from C extensions and child processes is kept.
+    """
+    global executing
+    code, filename = request["code"], request["filename"]
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        returncode = 0
+        try:
+            namespace["__file__"] = filename
+            sys.argv = [filename]
+            set_cpu_allowance(request.get("cpu_limit") or None)
+            try:
+                executing = True
+                exec(compile(code, filename, "exec"), namespace)
+            finally:
+                # An interrupt landing here is still caught below, never in the main loop
+                executing = False
+        except SystemExit as e:
+            if e.code is None or e.code == 0:
+                returncode = 0
+            elif isinstance(e.code, int):
+                returncode = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            # Hide this module's frame so the traceback starts at the user's code
+            etype, value, tb = sys.exc_info()
+            traceback.print_exception(etype, value, tb.tb_next)
+            returncode = 1
+        finally:
+            set_cpu_allowance(None)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            close_figures()
+        head, tail, spill_dir = request["head"], request["tail"], request["spill_dir"]
+        stdout, stdout_spill = read_head_tail(out, head, tail, spill_dir, "stdout")
+        stderr, stderr_spill = read_head_tail(err, head, tail, spill_dir, "stderr")
+    result = {"returncode": returncode, "stdout": stdout, "stderr": stderr, "truncated": bool(stdout_spill or stderr_spill)}
+    if stdout_spill:
+        result["full_output_path"] = stdout_spill
+    if stderr_spill:
+        result["full_error_path"] = stderr_spill
+    return result
+
+def new_namespace():
+    return {"__name__": "__main__", "__builtins__": __builtins__}
+
+def main():
+    port_file = sys.argv[1]
+    authkey = bytes.fromhex(os.environ.pop("KERNEL_AUTHKEY"))
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    apply_memory_limit(float(os.environ.get("KERNEL_MEMORY_LIMIT_MB", "0")))
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, on_cpu_limit)
+    signal.signal(signal.SIGINT, on_interrupt)
+    sys.path.insert(0, os.getcwd())
+    preload([m for m in os.environ.get("KERNEL_PRELOAD", "").split(",") if m])
+
+    listener = Listener(("127.0.0.1", 0), authkey=authkey)
+    with open(port_file + ".tmp", "w") as f:
+        f.write(str(listener.address[1]))
+    os.replace(port_file + ".tmp", port_file)
+
+    conn = listener.accept()
+    listener.close()
+    # The pool interrupts long-running calls by signalling this process directly
+    conn.send({"pid": os.getpid()})
+    namespace = new_namespace()
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        op = request.get("op")
+        if op == "exec":
+            conn.send(run_code(request, namespace))
+        elif op == "reset":
+            namespace = new_namespace()
+            conn.send({"ok": True})
+        elif op == "ping":
+            conn.send({"ok": True})
+        elif op == "shutdown":
+            conn.send({"ok": True})
+            break
+    conn.close()
+
+if __name__ == "__main__":
+    main()
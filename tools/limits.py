@@ -0,0 +1,122 @@
+import os
+import time
+import signal
+import secrets
+import subprocess
+from typing import Any, Dict, Optional, Tuple
+from logger import setup_logger
+from load_cfg import (
+    WORKING_DIRECTORY, EXEC_TIMEOUT, EXEC_MAX_TIMEOUT, EXEC_CPU_LIMIT, EXEC_MEMORY_LIMIT_MB,
+    EXEC_OUTPUT_HEAD_CHARS, EXEC_OUTPUT_TAIL_CHARS
+)
+
+# Set up logger
+logger = setup_logger()
+
+# Full output of truncated runs is kept here; hidden so workspace scans skip it
+SPILL_DIRECTORY = os.path.join(WORKING_DIRECTORY, ".outputs")
+
+def clamp_timeout(timeout: Optional[float]) -> float:
+    """Return the wall-clock timeout for a call, limited to the configured maximum."""
+    if not timeout or timeout <= 0:
+        return EXEC_TIMEOUT
+    return min(float(timeout), EXEC_MAX_TIMEOUT)
+
+def apply_shell_limits(command: str) -> str:
+    """
+    Wrap a shell command so the CPU and memory limits apply to it and everything
+    it starts. Only POSIX shells support ulimit; on Windows the command is unchanged.
+    """
+    if os.name != "posix":
+        return command
+    limits = []
+    if EXEC_CPU_LIMIT > 0:
+        limits.append(f"ulimit -t {int(EXEC_CPU_LIMIT)} 2>/dev/null")
+    if EXEC_MEMORY_LIMIT_MB > 0:
+        limits.append(f"ulimit -v {int(EXEC_MEMORY_LIMIT_MB * 1024)} 2>/dev/null")
+    if not limits:
+        return command
+    return "{ " + "; ".join(limits + [command]) + "; }"
+
+def new_spill_path(kind: str) -> str:
+    """Return a fresh file path for spilled output."""
+    os.makedirs(SPILL_DIRECTORY, exist_ok=True)
+    return os.path.join(SPILL_DIRECTORY, f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}.{kind}.log")
+
+def read_head_tail(path: str, head: int = EXEC_OUTPUT_HEAD_CHARS, tail: int = EXEC_OUTPUT_TAIL_CHARS) -> Tuple[str, bool]:
+    """
+    Read a captured output file, keeping only its beginning and end if it is long.
+
+    Returns:
+        tuple: The (possibly truncated) text and whether it was truncated.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size <= head + tail:
+            return f.read().decode("utf-8", errors="replace"), False
+        first = f.read(head).decode("utf-8", errors="replace")
+        f.seek(size - tail)
+        last = f.read().decode("utf-8", errors="replace")
+    omitted = size - head - tail
+    return f"{first}\n\n... [{omitted} bytes omitted] ...\n\n{last}", True
+
+def kill_process_tree(process: subprocess.Popen) -> None:
+    """Kill a process started in its own session or process group, with its children."""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    except Exception:
+        process.kill()
+    process.wait()
+
+def run_limited(full_command: str, shell: bool, executable: Optional[str], timeout: float) -> Dict[str, Any]:
+    """
+    Run a shell command with a wall-clock timeout, streaming its output to spill
+    files and returning only the head and tail of each stream.
+
+    Returns:
+        dict: returncode, stdout, stderr, timed_out, truncated and, for truncated
+        streams, full_output_path / full_error_path.
+    """
+    stdout_path, stderr_path = new_spill_path("stdout"), new_spill_path("stderr")
+    popen_kwargs: Dict[str, Any] = {}
+    if os.name == "posix":
+        popen_kwargs["start_new_session"] = True
+    else:
+        popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+
+    timed_out = False
+    with open(stdout_path, "wb") as out, open(stderr_path, "wb") as err:
+        process = subprocess.Popen(
+            full_command,
+            shell=shell,
+            executable=executable,
+            cwd=WORKING_DIRECTORY,
+            stdin=subprocess.DEVNULL,
+            stdout=out,
+            stderr=err,
+            **popen_kwargs
+        )
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Command exceeded its {timeout:.0f}s timeout, killing it")
+            timed_out = True
+            kill_process_tree(process)
+
+    result = {"returncode": process.returncode, "timed_out": timed_out, "truncated": False}
+    for stream, path, path_key in (("stdout", stdout_path, "full_output_path"), ("stderr", stderr_path, "full_error_path")):
+        text, truncated = read_head_tail(path)
+        result[stream] = text
+        if truncated:
+            result["truncated"] = True
+            result[path_key] = path
+        else:
+            os.remove(path)
+    if timed_out:
+        result["stderr"] += f"\nTimed out after {timeout:.0f} seconds; the process was killed."
+    return result
@@ -0,0 +1,190 @@
+import os
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+from typing import BinaryIO, Optional, Tuple
+from logger import setup_logger
+from core.disk_cache import DiskCache
+from load_cfg import LINE_INDEX_PATH, LINE_INDEX_MIN_FILE_MB, LINE_INDEX_STEP, LINE_INDEX_MAX_MB
+
+# Set up logger
+logger = setup_logger()
+
+BLOCK_SIZE = 1 << 20
+
+def _skip_lines(f: BinaryIO, position: int, count: int) -> int:
+    """Byte offset of the line starting ``count`` lines after the line start at ``position``."""
+    f.seek(position)
+    while count > 0:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            break
+        found = -1
+        while count > 0:
+            found = block.find(b"\n", found + 1)
+            if found == -1:
+                break
+            count -= 1
+        if count == 0:
+            return position + found + 1
+        position += len(block)
+    return position
+
+class LineIndex:
+    """
+    Sparse index of the line starts of a file: the byte offset of every
+    ``step``-th line. A line is found by seeking to the nearest checkpoint before
+    it and scanning at most ``step - 1`` lines, so the index stays small for
+    files with hundreds of millions of lines.
+    """
+
+    def __init__(self, mtime_ns: int, size: int, line_count: int, step: int, offsets: array):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.line_count = line_count
+        self.step = step
+        # offsets[i] is where line i * step starts
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, path: str, step: int = LINE_INDEX_STEP) -> "LineIndex":
+        stat = os.stat(path)
+        step = max(1, step)
+        offsets = array("Q", [0])
+        lines, position, last = 0, 0, b"\n"
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                newlines = block.count(b"\n")
+                first = step - lines % step - 1
+                if first < newlines:
+                    # Newline i of the block ends at the summed length of the first i + 1 parts plus i
+                    ends = list(accumulate(map(len, block.split(b"\n"))))
+                    for i in range(first, newlines, step):
+                        offsets.append(position + ends[i] + i + 1)
+                lines += newlines
+                position += len(block)
+                last = block[-1:]
+        if last != b"\n":
+            # Last line without a trailing newline
+            lines += 1
+        if offsets[-1] == position and len(offsets) > 1:
+            # A checkpoint at the end of the file does not start a line
+            offsets.pop()
+        return cls(stat.st_mtime_ns, stat.st_size, lines, step, offsets)
+
+    def line_offset(self, f: BinaryIO, line: int) -> int:
+        """Byte offset where ``line`` starts in the open file, or the file size past the last line."""
+        if line >= self.line_count:
+            return self.size
+        checkpoint = min(line // self.step, len(self.offsets) - 1)
+        return _skip_lines(f, self.offsets[checkpoint], line - checkpoint * self.step)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "mtime_ns": self.mtime_ns, "size": self.size, "line_count": self.line_count, "step": self.step
+        }).encode("utf-8")
+        return len(header).to_bytes(4, "little") + header + self.offsets.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LineIndex":
+        length = int.from_bytes(data[:4], "little")
+        header = json.loads(data[4:4 + length])
+        offsets = array("Q")
+        offsets.frombytes(data[4 + length:])
+        return cls(header["mtime_ns"], header["size"], header["line_count"], header["step"], offsets)
+
+class LineIndexCache:
+    """
+    Line indexes kept in memory, with those of large files also persisted so they
+    survive restarts. An index is rebuilt when the file's mtime or size changes.
+    The persisted indexes share a size budget with LRU eviction.
+    """
+
+    def __init__(self, path: str = LINE_INDEX_PATH, max_memory_entries: int = 64):
+        self.max_memory_entries = max_memory_entries
+        self.min_persist_bytes = int(LINE_INDEX_MIN_FILE_MB * 1024 * 1024)
+        self._memory: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            self.store: Optional[DiskCache] = DiskCache(path, max_bytes=int(LINE_INDEX_MAX_MB * 1024 * 1024))
+        except Exception as e:
+            logger.warning(f"Line index persistence disabled: {str(e)}")
+            self.store = None
+
+    def get(self, path: str) -> LineIndex:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            index = self._memory.get(path)
+            if index is not None and (index.mtime_ns, index.size) == stamp:
+                self._memory.move_to_end(path)
+                return index
+
+        persist = self.store is not None and stat.st_size >= self.min_persist_bytes
+        key = f"sparse-lines:{path}"
+        index = None
+        if persist:
+            data = self.store.get(key)
+            if data is not None:
+                index = LineIndex.from_bytes(data)
+                if (index.mtime_ns, index.size) != stamp or index.step != LINE_INDEX_STEP:
+                    index = None
+        if index is None:
+            index = LineIndex.build(path)
+            if persist:
+                self.store.set(key, index.to_bytes())
+
+        with self._lock:
+            self._memory[path] = index
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+        return index
+
+def read_lines(
+    path: str, index: LineIndex, start: int, end: Optional[int], max_bytes: int, column: int = 0
+) -> Tuple[str, int, int, bool]:
+    """
+    Read lines [start, end) of a file (0-based, negative values count from the end),
+    beginning ``column`` bytes into the start line, and stopping early at ``max_bytes``.
+    A cut read ends after the last whole line that fits, or inside the line when a
+    single line is longer than ``max_bytes``.
+
+    Returns:
+        tuple: The text, the line and column to continue from, and whether the range was cut short.
+    """
+    total = index.line_count
+    start = max(total + start, 0) if start < 0 else min(start, total)
+    end = total if end is None else (max(total + end, 0) if end < 0 else min(end, total))
+    if end <= start:
+        return "", start, 0, False
+
+    with open(path, "rb") as f:
+        stop = index.line_offset(f, end)
+        line_start = index.line_offset(f, start)
+        begin = min(line_start + max(column, 0), stop)
+        length = stop - begin
+        if max_bytes <= 0 or length <= max_bytes:
+            f.seek(begin)
+            return f.read(length).decode("utf-8", errors="replace"), end, 0, False
+        f.seek(begin)
+        data = f.read(max_bytes)
+
+    newline = data.rfind(b"\n")
+    if newline != -1:
+        data = data[:newline + 1]
+        return data.decode("utf-8", errors="replace"), start + data.count(b"\n"), 0, True
+    # The line is longer than the budget: cut it at a character boundary and resume inside it
+    cut = len(data)
+    while cut > 1 and data[cut - 1] & 0xC0 == 0x80:
+        cut -= 1
+    if cut > 1 and data[cut - 1] >= 0xC0:
+        # Leave out the lead byte of the split character
+        cut -= 1
+    return data[:cut].decode("utf-8", errors="replace"), start, begin - line_start + cut, True
+
+# Shared cache used by read_document
+line_indexes = LineIndexCache()
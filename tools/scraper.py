@@ -0,0 +1,373 @@
+import time
+import atexit
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Mapping, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+import aiohttp
+from langchain_community.document_loaders import FireCrawlLoader
+from logger import setup_logger
+from load_cfg import (
+    FIRECRAWL_API_KEY, SCRAPE_MAX_CONCURRENCY, SCRAPE_PER_HOST, SCRAPE_TIMEOUT,
+    SCRAPE_HEDGE_ENABLED, SCRAPE_HEDGE_DELAY, SCRAPE_HEDGE_ADAPTIVE, SCRAPE_MIN_TEXT_CHARS
+)
+from tools.executor import run_blocking
+from tools.extraction import aextract_main_content, normalize_text
+from tools.http_cache import HttpCache, open_http_cache
+
+# Set up logger
+logger = setup_logger()
+
+T = TypeVar("T")
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
+
+# Identifies how cached text was extracted; cached pages are re-extracted from
+# their stored body when this changes
+EXTRACTOR = "main-content-1"
+
+def decode_body(body: bytes, content_type: Optional[str]) -> str:
+    """Decode a response body using the charset from its Content-Type, defaulting to UTF-8."""
+    encoding = "utf-8"
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset" and value:
+            encoding = value.strip('"')
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+class ScrapeError(Exception):
+    """A page could not be fetched or extracted."""
+
+class BackendStats:
+    """Latency and success rate of a scraping backend over its most recent attempts."""
+
+    def __init__(self, window: int = 200):
+        self.attempts: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.cancelled = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.attempts.append((latency, ok))
+
+    def success_rate(self) -> Optional[float]:
+        if not self.attempts:
+            return None
+        return sum(ok for _, ok in self.attempts) / len(self.attempts)
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """Latency quantile of the successful attempts."""
+        latencies = sorted(latency for latency, ok in self.attempts if ok)
+        if not latencies:
+            return None
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+    def summary(self) -> Dict[str, Any]:
+        p50, p95 = self.latency_quantile(0.5), self.latency_quantile(0.95)
+        rate = self.success_rate()
+        return {
+            "attempts": len(self.attempts),
+            "cancelled": self.cancelled,
+            "success_rate": round(rate, 3) if rate is not None else None,
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+        }
+
+class ScrapeEngine:
+    """
+    Async scraping engine running on its own event loop thread.
+
+    All requests share one keep-alive connection pool. Concurrency is capped
+    globally and per host, every request has a timeout, and batches return their
+    results in input order. Sync callers use run(), async callers use arun().
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = SCRAPE_MAX_CONCURRENCY,
+        per_host: int = SCRAPE_PER_HOST,
+        timeout: float = SCRAPE_TIMEOUT,
+        cache: Optional[HttpCache] = None,
+        hedge: bool = SCRAPE_HEDGE_ENABLED,
+        hedge_delay: float = SCRAPE_HEDGE_DELAY,
+        adaptive_hedge: bool = SCRAPE_HEDGE_ADAPTIVE,
+        min_text_chars: int = SCRAPE_MIN_TEXT_CHARS
+    ):
+        self.cache = cache
+        self.hedge = hedge
+        self.hedge_delay = max(0.0, hedge_delay)
+        self.adaptive_hedge = adaptive_hedge
+        self.min_text_chars = min_text_chars
+        self.backend_stats = {"firecrawl": BackendStats(), "direct": BackendStats()}
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="scrape-engine", daemon=True)
+                thread.start()
+                self._loop = loop
+        return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the engine loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def arun(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the engine loop from another event loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()))
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily on the engine loop, which owns the connection pool
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": USER_AGENT}
+            )
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def request(self, url: str, headers: Optional[Mapping[str, str]] = None) -> Tuple[int, Mapping[str, str], bytes]:
+        """
+        Send a GET request.
+
+        Returns:
+            tuple: The status code, response headers and raw body.
+        """
+        session = self._get_session()
+        async with self._global_limit, self._host_limit(url):
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status >= 400:
+                        raise ScrapeError(f"HTTP {response.status} for {url}")
+                    return response.status, response.headers.copy(), await response.read()
+            except asyncio.TimeoutError:
+                raise ScrapeError(f"Timed out after {self.timeout:.0f}s fetching {url}")
+            except aiohttp.ClientError as e:
+                raise ScrapeError(f"Request failed for {url}: {e}")
+
+    async def fetch(self, url: str) -> str:
+        """Download a page and return its decoded body."""
+        status, headers, body = await self.request(url)
+        return decode_body(body, headers.get("Content-Type"))
+
+    async def _cached_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the usable cache entry for a URL, re-extracting its text if the extractor changed."""
+        # Cache reads write access times to SQLite, so they stay off the event loop too
+        entry = await run_blocking(self.cache.lookup, url)
+        if entry is None or entry["extractor"] == EXTRACTOR:
+            return entry
+        body = await run_blocking(self.cache.body, url)
+        if body is None:
+            return None
+        html = decode_body(body, entry.get("content_type"))
+        text = await aextract_main_content(html)
+        await run_blocking(self.cache.update_text, url, entry, text, EXTRACTOR)
+        return entry
+
+    async def scrape_web(self, url: str) -> str:
+        """
+        Fetch a page and extract its text. Fresh cached pages are returned without
+        a request, stale ones are revalidated with a conditional request.
+        """
+        entry = await self._cached_entry(url) if self.cache is not None else None
+        conditional = {}
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.cache.mark_hit()
+                logger.info(f"HTTP cache hit for {url}")
+                return entry["text"]
+            conditional = self.cache.conditional_headers(entry)
+
+        status, headers, body = await self.request(url, conditional)
+        if status == 304 and entry is not None:
+            logger.info(f"HTTP cache revalidated {url}")
+            await run_blocking(lambda: self.cache.mark_revalidated(url, entry, headers))
+            return entry["text"]
+
+        html = decode_body(body, headers.get("Content-Type"))
+        # Parsing is CPU-bound, keep it off the event loop
+        text = await aextract_main_content(html)
+        if self.cache is not None:
+            await run_blocking(lambda: self.cache.store_response(url, headers, body, text, EXTRACTOR))
+        return text
+
+    async def scrape_firecrawl(self, url: str) -> str:
+        """Scrape a page through FireCrawl, whose client is blocking."""
+        if not FIRECRAWL_API_KEY:
+            raise ScrapeError("FireCrawl API key is not set")
+        if self.cache is not None:
+            cached = await run_blocking(self.cache.get_firecrawl, url)
+            if cached is not None:
+                logger.info(f"FireCrawl cache hit for {url}")
+                return cached
+
+        def load() -> str:
+            loader = FireCrawlLoader(api_key=FIRECRAWL_API_KEY, url=url, mode="scrape")
+            # FireCrawl already returns the main content as Markdown
+            return normalize_text("\n\n".join(doc.page_content for doc in loader.load()))
+
+        self._get_session()
+        async with self._global_limit, self._host_limit(url):
+            try:
+                text = await asyncio.wait_for(run_blocking(load), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise ScrapeError(f"FireCrawl timed out after {self.timeout:.0f}s for {url}")
+            except ScrapeError:
+                raise
+            except Exception as e:
+                raise ScrapeError(f"FireCrawl failed for {url}: {e}")
+        if self.cache is not None:
+            await run_blocking(lambda: self.cache.set_firecrawl(url, text))
+        return text
+
+    def is_usable(self, text: str) -> bool:
+        """Quality check for a scraped page: enough extracted text."""
+        return len(text.strip()) >= self.min_text_chars
+
+    async def _timed(self, backend: str, scrape: Callable[[str], Awaitable[str]], url: str) -> str:
+        """Run a backend, recording its latency and whether it produced a usable page."""
+        start = time.monotonic()
+        try:
+            text = await scrape(url)
+        except asyncio.CancelledError:
+            self.backend_stats[backend].cancelled += 1
+            raise
+        except Exception:
+            self.backend_stats[backend].record(time.monotonic() - start, False)
+            raise
+        self.backend_stats[backend].record(time.monotonic() - start, self.is_usable(text))
+        return text
+
+    def current_hedge_delay(self) -> float:
+        """
+        Seconds to wait for FireCrawl before starting the direct fetch. In adaptive
+        mode this is FireCrawl's recent p95 latency, or zero when it mostly fails.
+        """
+        if not self.adaptive_hedge:
+            return self.hedge_delay
+        stats = self.backend_stats["firecrawl"]
+        if len(stats.attempts) < 10:
+            return self.hedge_delay
+        if stats.success_rate() < 0.5:
+            return 0.0
+        p95 = stats.latency_quantile(0.95)
+        return min(p95, self.timeout) if p95 is not None else self.hedge_delay
+
+    def _cached_page(self, url: str) -> Optional[str]:
+        """Return a cached FireCrawl result or a fresh cached page without any request. Blocking."""
+        if self.cache is None:
+            return None
+        if FIRECRAWL_API_KEY:
+            text = self.cache.get_firecrawl(url)
+            if text is not None:
+                return text
+        entry = self.cache.peek(url)
+        if entry is not None and entry["extractor"] == EXTRACTOR and self.cache.is_fresh(entry):
+            self.cache.mark_hit()
+            return entry["text"]
+        return None
+
+    async def scrape_with_fallback(self, url: str) -> str:
+        """Scrape with FireCrawl, falling back to a direct fetch."""
+        if not FIRECRAWL_API_KEY:
+            return await self._timed("direct", self.scrape_web, url)
+        if self.hedge:
+            return await self.scrape_hedged(url)
+        try:
+            logger.info(f"Attempting to scrape {url} with FireCrawl")
+            text = await self._timed("firecrawl", self.scrape_firecrawl, url)
+            if self.is_usable(text):
+                return text
+            logger.warning(f"FireCrawl returned too little text for {url}, fetching directly")
+        except ScrapeError as e:
+            logger.warning(f"FireCrawl failed for {url} ({e}), fetching directly")
+        return await self._timed("direct", self.scrape_web, url)
+
+    async def scrape_hedged(self, url: str) -> str:
+        """
+        Race FireCrawl against a direct fetch. The direct fetch starts once
+        FireCrawl has not produced a usable page within the hedge delay (at once
+        if it fails earlier); the first usable page wins and the other scrape is
+        cancelled. If neither is usable, the longest text is returned.
+        """
+        cached = await run_blocking(self._cached_page, url)
+        if cached is not None:
+            logger.info(f"Cache hit for {url}")
+            return cached
+
+        primary = asyncio.ensure_future(self._timed("firecrawl", self.scrape_firecrawl, url))
+        pending = {primary}
+        delay = self.current_hedge_delay()
+        if delay > 0:
+            await asyncio.wait(pending, timeout=delay)
+        if not primary.done() or primary.exception() is not None or not self.is_usable(primary.result()):
+            logger.info(f"Hedging {url} with a direct fetch after {delay:.2f}s")
+            pending.add(asyncio.ensure_future(self._timed("direct", self.scrape_web, url)))
+
+        best: Optional[str] = None
+        errors: List[str] = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(str(task.exception()))
+                        continue
+                    text = task.result()
+                    if self.is_usable(text):
+                        return text
+                    if best is None or len(text) > len(best):
+                        best = text
+        finally:
+            # Cancel the slower scrape; a FireCrawl call already running in a
+            # worker thread finishes there, but its result is discarded
+            for task in pending:
+                task.cancel()
+        if best is not None:
+            return best
+        raise ScrapeError("; ".join(errors))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-backend latency and success statistics, and the current hedge delay."""
+        stats: Dict[str, Any] = {name: backend.summary() for name, backend in self.backend_stats.items()}
+        stats["hedge_delay"] = round(self.current_hedge_delay(), 3)
+        return stats
+
+    def close(self) -> None:
+        """Close the connection pool and stop the engine loop."""
+        if self._loop is None:
+            return
+        if self._session is not None and not self._session.closed:
+            try:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"Error closing scraping session: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+# Shared engine used by the web scraping tools
+engine = ScrapeEngine(cache=open_http_cache())
+atexit.register(engine.close)
@@ -0,0 +1,252 @@
+import os
+import math
+import time
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+from bs4 import BeautifulSoup
+from logger import setup_logger
+from core.disk_cache import DiskCache
+from core.session import get_thread_id
+from load_cfg import (
+    BROWSER_PAGE_TIMEOUT, CAPTCHA_WAIT_TIMEOUT, SEARCH_BACKEND, SEARCH_QUOTA, SEARCH_QUOTA_REFILL_SECONDS,
+    SEARCH_CACHE_ENABLED, SEARCH_CACHE_PATH, SEARCH_CACHE_TTL, SEARCH_LOCAL_DIRECTORY
+)
+from tools.bm25 import BM25Index, tokenize
+from tools.serp import RESULTS_CONTAINER, parse_search_results
+
+# Set up logger
+logger = setup_logger()
+
+class SearchError(Exception):
+    """A search backend could not return results."""
+
+class SearchBackend(ABC):
+    """
+    A source of web search results. Results are dicts with title, snippet and link.
+    """
+
+    name: str = ""
+    # Whether calls count against the per-session search quota
+    uses_quota: bool = True
+
+    @abstractmethod
+    def search(self, query: str, k: int) -> List[Dict[str, str]]:
+        """Return up to ``k`` results for the query, raising SearchError on failure."""
+
+class GoogleSeleniumBackend(SearchBackend):
+    """Google results scraped with a pooled Selenium browser."""
+
+    name = "google"
+    uses_quota = True
+
+    @staticmethod
+    def _captcha_shown(driver) -> bool:
+        source = driver.page_source
+        return "recaptcha" in source or "Our systems have detected unusual traffic" in source
+
+    def search(self, query: str, k: int) -> List[Dict[str, str]]:
+        # Selenium is only needed by this backend
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from tools.browser_pool import get_browser_pool
+
+        pool = get_browser_pool()
+        with pool.browser() as driver:
+            driver.get(f"https://www.google.com/search?q={quote_plus(query)}")
+            # Wait for the results container instead of sleeping a fixed time
+            WebDriverWait(driver, BROWSER_PAGE_TIMEOUT).until(
+                lambda d: d.find_elements(By.CSS_SELECTOR, RESULTS_CONTAINER) or self._captcha_shown(d)
+            )
+
+            # Check if CAPTCHA is present and wait for it to be solved if the browser is visible
+            if self._captcha_shown(driver):
+                logger.info("CAPTCHA detected")
+                if pool.headless:
+                    raise SearchError("Google requested a CAPTCHA; set BROWSER_HEADLESS=false to solve it manually")
+                print("CAPTCHA detected! Please solve it manually in the browser window.")
+                print("The script will wait until you complete the CAPTCHA.")
+                try:
+                    WebDriverWait(driver, CAPTCHA_WAIT_TIMEOUT, poll_frequency=5).until(
+                        lambda d: not self._captcha_shown(d) and d.find_elements(By.CSS_SELECTOR, RESULTS_CONTAINER)
+                    )
+                    print("CAPTCHA appears to be solved! Continuing...")
+                except TimeoutException:
+                    logger.warning("Maximum wait time for CAPTCHA exceeded")
+                    raise SearchError("CAPTCHA solving timeout exceeded")
+
+            html = driver.page_source
+        return parse_search_results(html, limit=k)
+
+class LocalIndexBackend(SearchBackend):
+    """
+    Offline search over a directory of text, Markdown and HTML documents, ranked
+    with BM25. Files are re-indexed when they change.
+    """
+
+    name = "local"
+    uses_quota = False
+    EXTENSIONS = (".txt", ".md", ".html", ".htm")
+
+    def __init__(self, directory: str = SEARCH_LOCAL_DIRECTORY):
+        self.directory = directory
+        self.index = BM25Index()
+        # path -> (mtime, size, title, text)
+        self._documents: Dict[str, Tuple[int, int, str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path: str) -> Tuple[str, str]:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        if path.lower().endswith((".html", ".htm")):
+            soup = BeautifulSoup(content, "html.parser")
+            title = soup.title.get_text(strip=True) if soup.title else ""
+            text = soup.get_text(" ")
+        else:
+            text = content
+            title = next((line.strip("# ").strip() for line in content.splitlines() if line.strip()), "")
+        return title or os.path.basename(path), " ".join(text.split())
+
+    def refresh(self) -> None:
+        """Index new and changed files and drop deleted ones."""
+        seen = set()
+        for root, dirs, names in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in names:
+                if not name.lower().endswith(self.EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                known = self._documents.get(path)
+                if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                title, text = self._load(path)
+                self._documents[path] = (stat.st_mtime_ns, stat.st_size, title, text)
+                self.index.add(path, f"{title} {text}")
+        for path in set(self._documents) - seen:
+            del self._documents[path]
+            self.index.remove(path)
+
+    @staticmethod
+    def _snippet(text: str, query: str, width: int = 240) -> str:
+        """A window of the text around the first query term it contains."""
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in tokenize(query)]
+        positions = [p for p in positions if p >= 0]
+        start = max(min(positions) - width // 4, 0) if positions else 0
+        snippet = text[start:start + width]
+        return ("..." if start else "") + snippet + ("..." if start + width < len(text) else "")
+
+    def search(self, query: str, k: int) -> List[Dict[str, str]]:
+        if not os.path.isdir(self.directory):
+            raise SearchError(f"Local search directory {self.directory} does not exist")
+        with self._lock:
+            self.refresh()
+            hits = self.index.search(query, k)
+            return [
+                {"title": self._documents[path][2], "snippet": self._snippet(self._documents[path][3], query), "link": path}
+                for path, _ in hits
+            ]
+
+BACKENDS = {
+    GoogleSeleniumBackend.name: GoogleSeleniumBackend,
+    LocalIndexBackend.name: LocalIndexBackend,
+}
+
+class TokenBucket:
+    """Allows ``capacity`` calls at once, refilled by one token every ``refill_seconds``."""
+
+    def __init__(self, capacity: int, refill_seconds: float):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.refill_seconds > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.refill_seconds)
+        self.updated = now
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a token. Returns None on success, otherwise seconds until one is available (inf if never)."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        if self.refill_seconds <= 0:
+            return float("inf")
+        return (1 - self.tokens) * self.refill_seconds
+
+class SessionQuotas:
+    """One token bucket per research session, so sessions do not use up each other's searches."""
+
+    def __init__(self, capacity: int = SEARCH_QUOTA, refill_seconds: float = SEARCH_QUOTA_REFILL_SECONDS):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, session: str) -> Optional[float]:
+        with self._lock:
+            bucket = self._buckets.get(session)
+            if bucket is None:
+                bucket = self._buckets[session] = TokenBucket(self.capacity, self.refill_seconds)
+            return bucket.try_acquire()
+
+class SearchService:
+    """
+    Runs searches through a backend with a persistent query cache and per-session
+    quotas. Cached queries skip both the quota and the backend.
+    """
+
+    def __init__(self, backend: SearchBackend, cache: Optional[DiskCache] = None, quotas: Optional[SessionQuotas] = None):
+        self.backend = backend
+        self.cache = cache
+        self.quotas = quotas or SessionQuotas()
+
+    def _cache_key(self, query: str, k: int) -> str:
+        return f"{self.backend.name}:{k}:{' '.join(query.lower().split())}"
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, str]]:
+        key = self._cache_key(query, k)
+        if self.cache is not None:
+            cached = self.cache.get_json(key)
+            if cached is not None:
+                logger.info(f"Search cache hit for query: {query}")
+                return cached
+
+        if self.backend.uses_quota:
+            session = get_thread_id()
+            wait = self.quotas.try_acquire(session)
+            if wait is not None:
+                logger.warning(f"Search quota reached for session {session}")
+                if wait == float("inf"):
+                    raise SearchError(f"Maximum number of searches ({self.quotas.capacity}) reached for this session")
+                raise SearchError(f"Search quota reached for this session, next search available in {math.ceil(wait)} seconds")
+
+        logger.info(f"Searching {self.backend.name} for query: {query}")
+        results = self.backend.search(query, k)
+        if self.cache is not None and results:
+            self.cache.set_json(key, results)
+        return results
+
+def open_search_service() -> SearchService:
+    """Build the search service for the configured backend."""
+    backend_class = BACKENDS.get(SEARCH_BACKEND)
+    if backend_class is None:
+        logger.warning(f"Unknown search backend {SEARCH_BACKEND!r}, using google")
+        backend_class = GoogleSeleniumBackend
+    cache = None
+    if SEARCH_CACHE_ENABLED:
+        try:
+            cache = DiskCache(SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Search cache disabled: {str(e)}")
+    return SearchService(backend_class(), cache=cache)
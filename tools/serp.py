@@ -0,0 +1,79 @@
+"""
+Parsing of Google search result pages.
+
+Kept free of browser code so it can be benchmarked on saved result pages offline:
+
+    python -m tools.serp page1.html page2.html --repeat 50
+"""
+import sys
+import time
+import argparse
+from typing import Dict, List
+from bs4 import BeautifulSoup
+
+# Result blocks, snippet containers and the results container, newest markup first
+RESULT_SELECTORS = ("#rso div.MjjYud", "#rso .g", ".g")
+SNIPPET_SELECTORS = (".VwiC3b", "[data-sncf]", ".IsZvec")
+RESULTS_CONTAINER = "#search, #rso, #botstuff"
+
+def parse_search_results(html: str, limit: int = 5) -> List[Dict[str, str]]:
+    """
+    Extract the organic results from a Google result page.
+
+    Returns:
+        list: Up to ``limit`` dicts with title, snippet and link, in page order.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    blocks = []
+    for selector in RESULT_SELECTORS:
+        blocks = soup.select(selector)
+        if blocks:
+            break
+
+    results, seen = [], set()
+    for block in blocks:
+        title_element = block.select_one("h3")
+        if title_element is None:
+            continue
+        link_element = title_element.find_parent("a") or block.select_one("a[href]")
+        link = link_element.get("href", "") if link_element else ""
+        if not link or link in seen:
+            continue
+        seen.add(link)
+        snippet_element = None
+        for selector in SNIPPET_SELECTORS:
+            snippet_element = block.select_one(selector)
+            if snippet_element is not None:
+                break
+        results.append({
+            "title": title_element.get_text(" ", strip=True),
+            "snippet": snippet_element.get_text(" ", strip=True) if snippet_element else "No Snippet",
+            "link": link,
+        })
+        if len(results) >= limit:
+            break
+    return results
+
+def format_search_results(results: List[Dict[str, str]]) -> str:
+    """Format results the way the search tools return them to agents."""
+    return "".join(f"{r['title']}\n{r['snippet']}\n{r['link']}\n\n" for r in results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark search result parsing on saved pages")
+    parser.add_argument("files", nargs="+", help="Saved result pages (HTML)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = parse_search_results(html)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{path}: {len(results)} results, {elapsed * 1000:.2f} ms per parse")
+        for result in results:
+            print(f"  {result['title'][:70]} -> {result['link'][:70]}")
+
+if __name__ == "__main__":
+    sys.exit(main())
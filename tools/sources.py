@@ -0,0 +1,96 @@
+from typing import Annotated, List, Tuple
+from langchain_core.tools import tool
+from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
+from logger import setup_logger
+from tools.document_store import ARXIV_ID, arxiv_key, describe, document_store, wikipedia_key
+from tools.executor import offload_blocking
+
+# Set up logger
+logger = setup_logger()
+
+wikipedia_api = WikipediaAPIWrapper()
+arxiv_api = ArxivAPIWrapper()
+
+@offload_blocking
+@tool
+def wikipedia(query: Annotated[str, "Search query or article title"]) -> str:
+    """
+    Search Wikipedia and return the summaries of the best matching articles.
+    The full articles are kept in the document store; read them with read_stored_document.
+    """
+    try:
+        titles = wikipedia_api.wiki_client.search(query[:300], results=wikipedia_api.top_k_results)
+        summaries = []
+        for title in titles[:wikipedia_api.top_k_results]:
+            def fetch(title: str = title) -> Tuple[str, str]:
+                page = wikipedia_api._fetch_page(title)
+                if page is None:
+                    raise LookupError(f"No Wikipedia page for {title}")
+                return page.title, page.content
+
+            try:
+                document = document_store.get_or_fetch(wikipedia_key(title), fetch, "wikipedia")
+            except LookupError:
+                continue
+            summary = document.text.split("\n\n")[0][:2000]
+            summaries.append(describe(document, f"Summary: {summary}"))
+        if not summaries:
+            return "No good Wikipedia Search Result was found"
+        return "\n\n".join(summaries)
+    except Exception as e:
+        logger.error(f"Error searching Wikipedia: {str(e)}")
+        return f"Error searching Wikipedia: {str(e)}"
+
+def _format_paper(result) -> Tuple[str, str]:
+    text = (
+        f"Published: {result.updated.date()}\n"
+        f"Title: {result.title}\n"
+        f"Authors: {', '.join(a.name for a in result.authors)}\n"
+        f"Link: {result.entry_id}\n"
+        f"Summary: {result.summary}"
+    )
+    return result.title, text
+
+@offload_blocking
+@tool("arxiv")
+def arxiv_search(query: Annotated[str, "Search query or arXiv IDs separated by spaces"]) -> str:
+    """
+    Search arXiv for papers on physics, mathematics, computer science, statistics and
+    related fields. Returns the publication date, title, authors and abstract of each paper.
+    """
+    try:
+        ids = query.split()
+        if ids and all(ARXIV_ID.fullmatch(i) for i in ids):
+            # Papers asked for by ID are served from the store when possible
+            stored = [document_store.get(arxiv_key(i)) for i in ids]
+            if all(stored):
+                return "\n\n".join(describe(d, d.text) for d in stored)
+
+        papers: List[str] = []
+        for result in arxiv_api._fetch_results(query):
+            title, text = _format_paper(result)
+            document = document_store.get_or_fetch(
+                arxiv_key(result.get_short_id()), lambda: (title, text), "arxiv"
+            )
+            papers.append(describe(document, document.text))
+        if not papers:
+            return "No good Arxiv Result was found"
+        return "\n\n".join(papers)
+    except Exception as e:
+        logger.error(f"Error searching arXiv: {str(e)}")
+        return f"Error searching arXiv: {str(e)}"
+
+@tool
+def read_stored_document(
+    doc_id: Annotated[str, "Document ID such as 'doc-3', as shown by the search and scraping tools"],
+    page: Annotated[int, "Page of the document to read, starting at 1"] = 1
+) -> str:
+    """
+    Read a source already fetched in this session by any agent (web page, Wikipedia
+    article or arXiv paper) by its document ID, instead of fetching it again.
+    """
+    document = document_store.get_by_id(doc_id)
+    if document is None:
+        available = "\n".join(f"{d.doc_id}: {d.title} ({d.source})" for d in document_store.documents())
+        return f"Error: No stored document {doc_id}. Available documents:\n{available or 'none'}"
+    return describe(document, document.page(page))
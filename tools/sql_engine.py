@@ -0,0 +1,370 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Annotated, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import pandas as pd
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import (
+    WORKING_DIRECTORY, SQL_ENGINE, SQL_DATABASE_PATH, SQL_TIMEOUT, DATA_TOOL_MAX_ROWS, DATASTREAM_CHUNK_ROWS
+)
+from tools.executor import offload_blocking
+from tools.workspace.datastream import iter_chunks, sniff_encoding
+
+try:
+    import duckdb
+except ImportError:
+    # Without DuckDB the SQLite engine is used
+    duckdb = None
+
+# Set up logger
+logger = setup_logger()
+
+TABLE_EXTENSIONS = (".csv", ".tsv")
+
+# DuckDB's read_csv name for each sniffed encoding; cp1252 is read as its latin-1 subset
+DUCKDB_ENCODINGS = {"utf-8": "utf-8", "utf-8-sig": "utf-8", "utf-16": "utf-16", "cp1252": "latin-1", "latin1": "latin-1"}
+
+class SQLError(Exception):
+    """A query was rejected or failed."""
+
+def table_name(relpath: str, taken: set) -> str:
+    """SQL-friendly table name for a file: 'sales/2024 Q1.csv' -> 'sales_2024_q1'."""
+    name = re.sub(r"\W+", "_", os.path.splitext(relpath)[0]).strip("_").lower() or "data"
+    if name[0].isdigit():
+        name = f"t_{name}"
+    candidate, suffix = name, 2
+    while candidate in taken:
+        candidate, suffix = f"{name}_{suffix}", suffix + 1
+    return candidate
+
+def scan_tables(root: str = WORKING_DIRECTORY) -> Dict[str, Tuple[str, int, int]]:
+    """Table name -> (path, size, mtime) for every CSV/TSV file under ``root``."""
+    files = []
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+        for name in sorted(names):
+            if name.lower().endswith(TABLE_EXTENSIONS):
+                files.append(os.path.join(directory, name))
+    tables: Dict[str, Tuple[str, int, int]] = {}
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        tables[table_name(os.path.relpath(path, root), set(tables))] = (path, stat.st_size, stat.st_mtime_ns)
+    return tables
+
+def referenced_tables(sql: str, tables: Iterable[str]) -> Set[str]:
+    """Names among ``tables`` that appear as identifiers in a query."""
+    identifiers = {(quoted or bare).lower() for quoted, bare in re.findall(r'"([^"]+)"|([A-Za-z_]\w*)', sql)}
+    return identifiers & set(tables)
+
+class SQLEngine(ABC):
+    """
+    An embedded SQL database holding the CSV files of the working directory as
+    tables. A file is ingested when a query first uses its table and re-ingested
+    when its size or modification time changes; queries are read-only. A file
+    that cannot be ingested is skipped and not retried until it changes.
+    """
+
+    name: str = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # Table name -> (path, size, mtime) of the ingested files
+        self._sources: Dict[str, Tuple[str, int, int]] = {}
+        # Table name -> (path, size, mtime) and error of files that failed to ingest
+        self._failed: Dict[str, Tuple[Tuple[str, int, int], str]] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def refresh(self, names: Optional[Iterable[str]] = None) -> None:
+        """
+        Ingest the new and changed files of the tables in ``names`` (all tables when
+        None), skipping files that already failed unchanged, and drop the tables
+        of deleted files.
+        """
+        available = scan_tables()
+        names = available if names is None else [name for name in names if name in available]
+        changed = {
+            name: available[name] for name in names
+            if self._sources.get(name) != available[name] and self._failed.get(name, (None,))[0] != available[name]
+        }
+        removed = [name for name in self._sources if name not in available]
+        self._failed = {name: failure for name, failure in self._failed.items() if name in available}
+        if not changed and not removed:
+            return
+        started = time.time()
+        failures: Dict[str, str] = {}
+        with self._writer() as conn:
+            for name in removed:
+                self._drop_table(conn, name)
+                del self._sources[name]
+            for name, source in changed.items():
+                try:
+                    self._load_table(conn, name, source)
+                except Exception as e:
+                    logger.warning(f"Skipping {source[0]}, it could not be loaded as table {name}: {str(e)}")
+                    failures[name] = str(e)
+                    self._failed[name] = (source, str(e))
+                    # Never answer from an outdated version of the file
+                    if name in self._sources:
+                        self._drop_table(conn, name)
+                        del self._sources[name]
+                    continue
+                self._sources[name] = source
+                self._failed.pop(name, None)
+        logger.info(
+            f"SQL engine ingested {len(changed) - len(failures)} tables, skipped {len(failures)} "
+            f"and dropped {len(removed)} in {time.time() - started:.1f}s"
+        )
+
+    @abstractmethod
+    def _writer(self) -> Iterator[Any]:
+        """Context manager giving the connection used to ingest and drop tables."""
+
+    @abstractmethod
+    def _load_table(self, conn: Any, name: str, source: Tuple[str, int, int]) -> None:
+        """Load a file into its table, replacing any earlier version, and record its source."""
+
+    @abstractmethod
+    def _drop_table(self, conn: Any, name: str) -> None:
+        """Drop a table and its source record."""
+
+    @abstractmethod
+    def _execute(self, sql: str, max_rows: int, timeout: float) -> Tuple[List[str], List[tuple], bool]:
+        """Run one read-only query; returns column names, up to ``max_rows`` rows and whether there were more."""
+
+    def query(self, sql: str, max_rows: int = DATA_TOOL_MAX_ROWS, timeout: float = SQL_TIMEOUT) -> Tuple[List[str], List[tuple], bool]:
+        with self._lock:
+            referenced = referenced_tables(sql, scan_tables())
+            self.refresh(referenced)
+            try:
+                return self._execute(sql, max_rows, timeout)
+            except SQLError as e:
+                failed = [f"{name} could not be loaded ({self._failed[name][1]})" for name in sorted(referenced) if name in self._failed]
+                if failed:
+                    raise SQLError(f"{str(e)}; " + "; ".join(failed))
+                raise
+
+    def tables(self) -> List[Tuple[str, str, List[Tuple[str, str]], int]]:
+        """(table, file, [(column, type)], rows) for every table that could be loaded."""
+        with self._lock:
+            self.refresh()
+            return [(name, os.path.relpath(source[0], WORKING_DIRECTORY), *self._describe(name)) for name, source in sorted(self._sources.items())]
+
+    def failures(self) -> Dict[str, Tuple[str, str]]:
+        """Table name -> (file, error) of the files that could not be loaded."""
+        with self._lock:
+            return {name: (os.path.relpath(source[0], WORKING_DIRECTORY), error) for name, (source, error) in sorted(self._failed.items())}
+
+    @abstractmethod
+    def _describe(self, table: str) -> Tuple[List[Tuple[str, str]], int]:
+        """Columns with their types and the row count of a table."""
+
+class DuckDBEngine(SQLEngine):
+    """
+    DuckDB database file with the CSVs ingested as columnar tables, so queries get
+    projection and predicate pushdown. Queries run on a read-only connection that
+    cannot read or write files.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        with duckdb.connect(path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS _sources (name VARCHAR PRIMARY KEY, path VARCHAR, size BIGINT, mtime BIGINT)")
+            self._sources = {name: (source, size, mtime) for name, source, size, mtime in conn.execute("SELECT * FROM _sources").fetchall()}
+        self._reader = None
+
+    def _read_connection(self):
+        if self._reader is None:
+            self._reader = duckdb.connect(self.path, read_only=True, config={"enable_external_access": False})
+        return self._reader
+
+    @contextmanager
+    def _writer(self) -> Iterator[Any]:
+        # DuckDB allows one configuration per database file and process, so the reader closes while writing
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        with duckdb.connect(self.path) as conn:
+            yield conn
+
+    def _load_table(self, conn: Any, name: str, source: Tuple[str, int, int]) -> None:
+        path, size, mtime = source
+        encoding = DUCKDB_ENCODINGS[sniff_encoding(path)]
+        try:
+            conn.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM read_csv(?, encoding = ?, sample_size = 100000)', [path, encoding])
+        except duckdb.Error as e:
+            # Types guessed from the first rows did not fit later ones: infer from the whole file
+            logger.warning(f"Re-reading {path} with full type inference: {str(e)}")
+            conn.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM read_csv(?, encoding = ?, sample_size = -1)', [path, encoding])
+        conn.execute("INSERT OR REPLACE INTO _sources VALUES (?, ?, ?, ?)", [name, path, size, mtime])
+
+    def _drop_table(self, conn: Any, name: str) -> None:
+        conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute("DELETE FROM _sources WHERE name = ?", [name])
+
+    def _execute(self, sql: str, max_rows: int, timeout: float) -> Tuple[List[str], List[tuple], bool]:
+        conn = self._read_connection()
+        try:
+            statements = conn.extract_statements(sql)
+        except duckdb.Error as e:
+            raise SQLError(str(e))
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise SQLError("Only a single SELECT query is allowed")
+        timer = threading.Timer(timeout, conn.interrupt)
+        timer.start()
+        try:
+            cursor = conn.execute(sql)
+            rows = cursor.fetchmany(max_rows + 1)
+        except duckdb.InterruptException:
+            raise SQLError(f"Query cancelled after {timeout:.0f}s")
+        except duckdb.Error as e:
+            raise SQLError(str(e))
+        finally:
+            timer.cancel()
+        return [column[0] for column in cursor.description], rows[:max_rows], len(rows) > max_rows
+
+    def _describe(self, table: str) -> Tuple[List[Tuple[str, str]], int]:
+        conn = self._read_connection()
+        columns = [(row[0], row[1]) for row in conn.execute(f'DESCRIBE "{table}"').fetchall()]
+        return columns, conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+# SQLite authorizer actions a read-only query needs
+SQLITE_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, getattr(sqlite3, "SQLITE_RECURSIVE", 33)}
+
+class SQLiteEngine(SQLEngine):
+    """SQLite fallback: CSVs are ingested in chunks with pandas and queried read-only."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS _sources (name TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime INTEGER)")
+            self._sources = {name: (source, size, mtime) for name, source, size, mtime in conn.execute("SELECT * FROM _sources")}
+        conn.close()
+        self._reader = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._reader.set_authorizer(lambda action, *args: sqlite3.SQLITE_OK if action in SQLITE_READ_ACTIONS else sqlite3.SQLITE_DENY)
+
+    @contextmanager
+    def _writer(self) -> Iterator[Any]:
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _load_table(self, conn: Any, name: str, source: Tuple[str, int, int]) -> None:
+        path, size, mtime = source
+        # One transaction per file, so a file failing halfway leaves no partial table
+        with conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            sep = "\t" if path.lower().endswith(".tsv") else ","
+            for chunk in iter_chunks(path, DATASTREAM_CHUNK_ROWS, sep=sep):
+                chunk.to_sql(name, conn, if_exists="append", index=False)
+            conn.execute("INSERT OR REPLACE INTO _sources VALUES (?, ?, ?, ?)", (name, path, size, mtime))
+
+    def _drop_table(self, conn: Any, name: str) -> None:
+        with conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            conn.execute("DELETE FROM _sources WHERE name = ?", (name,))
+
+    def _execute(self, sql: str, max_rows: int, timeout: float) -> Tuple[List[str], List[tuple], bool]:
+        # The authorizer rejects anything but reads, and sqlite3 runs one statement at a time
+        deadline = time.time() + timeout
+        self._reader.set_progress_handler(lambda: time.time() > deadline, 10000)
+        try:
+            cursor = self._reader.execute(sql)
+            rows = cursor.fetchmany(max_rows + 1)
+        except (sqlite3.DatabaseError, sqlite3.ProgrammingError) as e:
+            if "interrupted" in str(e):
+                raise SQLError(f"Query cancelled after {timeout:.0f}s")
+            raise SQLError(str(e))
+        finally:
+            self._reader.set_progress_handler(None, 0)
+        return [column[0] for column in cursor.description or []], rows[:max_rows], len(rows) > max_rows
+
+    def _describe(self, table: str) -> Tuple[List[Tuple[str, str]], int]:
+        # PRAGMA is not a read action for the authorizer, so use a separate connection
+        with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as conn:
+            columns = [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table}")')]
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        conn.close()
+        return columns, rows
+
+ENGINES = {
+    DuckDBEngine.name: DuckDBEngine,
+    SQLiteEngine.name: SQLiteEngine,
+}
+
+_engine: Optional[SQLEngine] = None
+_engine_lock = threading.Lock()
+
+def get_sql_engine() -> SQLEngine:
+    """The configured engine, created on first use; SQLite when DuckDB is not installed."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            name = SQL_ENGINE if SQL_ENGINE in ENGINES else DuckDBEngine.name
+            if name == DuckDBEngine.name and duckdb is None:
+                logger.info("DuckDB is not installed, using SQLite for query_data")
+                name = SQLiteEngine.name
+            _engine = ENGINES[name](f"{SQL_DATABASE_PATH}.{name}")
+        return _engine
+
+def _format_value(value: Any) -> Any:
+    return "NULL" if value is None else value
+
+@offload_blocking
+@tool
+def query_data(sql: Annotated[str, "A single SELECT query; tables are named after the CSV files, e.g. sales.csv -> sales"]) -> str:
+    """
+    Answer questions about the CSV files in the working directory with SQL: filters,
+    group-bys, joins and aggregates run in an embedded database in milliseconds.
+    Each CSV file is a table named after the file. Only SELECT queries are allowed and
+    at most a limited number of rows is returned, so aggregate or LIMIT large results.
+    Use list_data_tables to see the tables and their columns.
+    """
+    try:
+        columns, rows, more = get_sql_engine().query(sql)
+        if not rows:
+            return "No rows."
+        text = pd.DataFrame([[_format_value(v) for v in row] for row in rows], columns=columns).to_string(index=False, max_colwidth=60)
+        if more:
+            text += f"\n... more rows not shown (limit {DATA_TOOL_MAX_ROWS}); aggregate or add LIMIT/OFFSET"
+        return text
+    except SQLError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error querying data: {str(e)}")
+        return f"Error querying data: {str(e)}"
+
+@offload_blocking
+@tool
+def list_data_tables() -> str:
+    """List the tables available to query_data with their source files, columns and row counts."""
+    try:
+        engine = get_sql_engine()
+        tables = engine.tables()
+        failures = engine.failures()
+        if not tables and not failures:
+            return "No CSV files in the working directory."
+        lines = [
+            f"{name} ({path}, {rows} rows): " + ", ".join(f"{column} {dtype}" for column, dtype in columns)
+            for name, path, columns, rows in tables
+        ]
+        lines += [f"{name} ({path}): could not be loaded: {error}" for name, (path, error) in failures.items()]
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error listing tables: {str(e)}")
+        return f"Error listing tables: {str(e)}"
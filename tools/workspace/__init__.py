@@ -0,0 +1,28 @@
+import os
+import shutil
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY
+
+# Set up logger
+logger = setup_logger()
+
+# Standalone modules copied into the working directory so generated code can import them
+HELPERS = ("datastream.py",)
+
+def install_workspace_helpers(directory: str = WORKING_DIRECTORY) -> None:
+    """Copy the helper modules into ``directory`` when missing or outdated."""
+    source_directory = os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(directory, exist_ok=True)
+    for name in HELPERS:
+        source, target = os.path.join(source_directory, name), os.path.join(directory, name)
+        try:
+            with open(source, "rb") as f:
+                content = f.read()
+            if os.path.exists(target):
+                with open(target, "rb") as f:
+                    if f.read() == content:
+                        continue
+            shutil.copyfile(source, target)
+            logger.info(f"Installed workspace helper {target}")
+        except OSError as e:
+            logger.warning(f"Could not install workspace helper {name}: {str(e)}")
@@ -0,0 +1,230 @@
+"""
+Streaming helpers for CSV files too large to load into memory at once.
+
+Every function reads the file in chunks of ``chunksize`` rows, so memory use
+depends on the chunk size and the size of the result, not on the size of the
+file. Only pandas and NumPy are needed, and a copy of this module is placed in
+the working directory, so generated code can use it directly:
+
+    import datastream
+    datastream.count_rows("trips.csv", where="distance > 10")
+    datastream.aggregate("trips.csv", {"fare": ["mean", "max"]}, by=["vendor"])
+    datastream.filter_rows("trips.csv", "fare > 100", output="expensive_trips.csv")
+    datastream.sample("trips.csv", 10_000, seed=0)
+
+``where`` filters are pandas query expressions, evaluated on each chunk.
+"""
+import codecs
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 250_000
+AGGREGATES = ("count", "sum", "mean", "min", "max", "std", "var")
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+def sniff_encoding(path: str, sample_bytes: int = 1 << 20) -> str:
+    """
+    Guess the encoding of a text file from its leading bytes: a byte order mark,
+    else UTF-8 if the sample decodes as UTF-8, else cp1252, else latin1.
+    """
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            # Not final, so a character cut at the end of the sample is fine
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
+def iter_chunks(
+    path: str,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    encoding: Optional[str] = None,
+    **read_csv_kwargs
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the rows of a CSV as DataFrames of at most ``chunksize`` rows, keeping
+    only rows matching ``where`` and only ``columns`` when given.
+    """
+    encoding = encoding or sniff_encoding(path)
+    if encoding == "utf-8":
+        # A byte past the sniffed sample could still be invalid; keep going rather than fail mid-stream
+        read_csv_kwargs.setdefault("encoding_errors", "replace")
+    if columns is not None and where is None:
+        # Only parse the columns that are needed
+        read_csv_kwargs.setdefault("usecols", list(columns))
+    with pd.read_csv(path, encoding=encoding, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            if where:
+                chunk = chunk.query(where)
+            if columns is not None:
+                chunk = chunk[list(columns)]
+            yield chunk
+
+def count_rows(path: str, where: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Number of rows, or of rows matching ``where``."""
+    return sum(len(chunk) for chunk in iter_chunks(path, chunksize, where=where))
+
+def _partial(chunk: pd.DataFrame, columns: List[str], by: Optional[List[str]]) -> Dict[str, pd.DataFrame]:
+    """Mergeable statistics of one chunk per group."""
+    keys = [chunk[c] for c in by] if by else np.zeros(len(chunk), dtype=np.int8)
+    values = chunk[columns].apply(pd.to_numeric, errors="coerce")
+    grouped = values.groupby(keys, dropna=False, sort=False)
+    n = grouped.count()
+    return {
+        "rows": grouped.size().to_frame("rows"),
+        "count": chunk[columns].groupby(keys, dropna=False, sort=False).count(),
+        "n": n,
+        "sum": grouped.sum(),
+        "mean": grouped.mean(),
+        "m2": (grouped.var(ddof=0) * n).fillna(0.0),
+        "min": grouped.min(),
+        "max": grouped.max(),
+    }
+
+def _merge(a: Dict[str, pd.DataFrame], b: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Combine the statistics of two sets of rows (Chan et al. for mean and variance)."""
+    aligned = {name: a[name].align(b[name], join="outer") for name in a}
+    (an, bn) = (frame.fillna(0) for frame in aligned["n"])
+    (amean, bmean) = (frame.fillna(0.0) for frame in aligned["mean"])
+    (am2, bm2) = (frame.fillna(0.0) for frame in aligned["m2"])
+    n = an + bn
+    safe_n = n.where(n > 0, 1)
+    delta = bmean - amean
+    return {
+        "rows": aligned["rows"][0].fillna(0) + aligned["rows"][1].fillna(0),
+        "count": aligned["count"][0].fillna(0) + aligned["count"][1].fillna(0),
+        "n": n,
+        "sum": aligned["sum"][0].fillna(0) + aligned["sum"][1].fillna(0),
+        "mean": (amean + delta * bn / safe_n).where(n > 0),
+        "m2": am2 + bm2 + delta ** 2 * an * bn / safe_n,
+        "min": np.fmin(*aligned["min"]),
+        "max": np.fmax(*aligned["max"]),
+    }
+
+def aggregate(
+    path: str,
+    metrics: Dict[str, Union[str, Sequence[str]]],
+    by: Optional[Union[str, Sequence[str]]] = None,
+    where: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> pd.DataFrame:
+    """
+    Group-by aggregation in one streaming pass, e.g.
+    ``aggregate("sales.csv", {"amount": ["sum", "mean"]}, by="region")``.
+
+    Supported functions: count (non-null values), sum, mean, min, max, std and var;
+    all but count treat non-numeric values as missing. The result has a 'rows'
+    column with the group sizes and one '<column>_<function>' column per metric.
+    Memory grows with the number of groups, not the number of rows.
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    metrics = {column: [functions] if isinstance(functions, str) else list(functions) for column, functions in metrics.items()}
+    for functions in metrics.values():
+        unknown = set(functions) - set(AGGREGATES)
+        if unknown:
+            raise ValueError(f"Unknown aggregate(s) {sorted(unknown)}; use {', '.join(AGGREGATES)}")
+    columns = list(metrics)
+    state = None
+    for chunk in iter_chunks(path, chunksize, columns=list(dict.fromkeys(by + columns)) if not where else None, where=where):
+        if chunk.empty:
+            continue
+        partial = _partial(chunk, columns, by)
+        state = partial if state is None else _merge(state, partial)
+
+    if state is None:
+        return pd.DataFrame(columns=by + ["rows"] + [f"{c}_{f}" for c, fs in metrics.items() for f in fs])
+    n = state["n"]
+    derived = {
+        "count": state["count"],
+        "sum": state["sum"].where(n > 0),
+        "mean": state["mean"],
+        "min": state["min"],
+        "max": state["max"],
+        "var": (state["m2"] / (n - 1)).where(n > 1),
+    }
+    derived["std"] = np.sqrt(derived["var"])
+    result = state["rows"].astype("int64")
+    for column, functions in metrics.items():
+        for function in functions:
+            result[f"{column}_{function}"] = derived[function][column]
+    if not by:
+        return result.reset_index(drop=True)
+    result = result.sort_index()
+    result.index.names = by
+    return result.reset_index()
+
+def filter_rows(
+    path: str,
+    where: str,
+    columns: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    output: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> Union[pd.DataFrame, int]:
+    """
+    Rows matching ``where``. Returns a DataFrame of at most ``limit`` rows, or
+    with ``output`` writes every match to that CSV file and returns the number
+    of rows written, which works for results larger than memory.
+    """
+    if output is not None:
+        written = 0
+        for chunk in iter_chunks(path, chunksize, columns=columns, where=where):
+            chunk.to_csv(output, mode="w" if written == 0 else "a", header=written == 0, index=False)
+            written += len(chunk)
+        if written == 0:
+            # Still leave a file with the header behind
+            next(iter_chunks(path, 1, columns=columns)).head(0).to_csv(output, index=False)
+        return written
+    parts, kept = [], 0
+    for chunk in iter_chunks(path, chunksize, columns=columns, where=where):
+        if limit is not None:
+            chunk = chunk.head(limit - kept)
+        parts.append(chunk)
+        kept += len(chunk)
+        if limit is not None and kept >= limit:
+            break
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def sample(
+    path: str,
+    n: int,
+    where: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    seed: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> pd.DataFrame:
+    """A uniform random sample of ``n`` rows (of those matching ``where``), in file order."""
+    rng = np.random.default_rng(seed)
+    kept, keys, positions, offset = None, np.empty(0), np.empty(0, dtype=np.int64), 0
+    for chunk in iter_chunks(path, chunksize, columns=columns, where=where):
+        chunk_keys = rng.random(len(chunk))
+        chunk_positions = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        if kept is None:
+            kept, keys, positions = chunk, chunk_keys, chunk_positions
+        else:
+            kept = pd.concat([kept, chunk], ignore_index=True)
+            keys = np.concatenate([keys, chunk_keys])
+            positions = np.concatenate([positions, chunk_positions])
+        if len(kept) > n:
+            # The rows with the n smallest random keys are a uniform sample
+            keep = np.argpartition(keys, n)[:n]
+            kept, keys, positions = kept.iloc[keep].reset_index(drop=True), keys[keep], positions[keep]
+    if kept is None:
+        return pd.DataFrame()
+    order = np.argsort(positions, kind="stable")
+    return kept.iloc[order].reset_index(drop=True)
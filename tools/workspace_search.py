@@ -0,0 +1,181 @@
+import os
+import threading
+from typing import Annotated, Dict, List, Set, Tuple
+from langchain_core.tools import tool
+from logger import setup_logger
+from load_cfg import WORKING_DIRECTORY, WORKSPACE_SEARCH_PASSAGE_LINES, WORKSPACE_SEARCH_MAX_FILE_MB
+from core.session import get_thread_id
+from tools.bm25 import BM25Index
+from tools.document_store import document_store
+from tools.executor import offload_blocking
+
+# Set up logger
+logger = setup_logger()
+
+TEXT_EXTENSIONS = (".md", ".txt", ".py", ".json", ".log", ".rst", ".html")
+# Only the header row of tables is indexed
+TABLE_EXTENSIONS = (".csv", ".tsv")
+
+# Characters of a passage shown in results
+MAX_PASSAGE_CHARS = 1500
+
+# Passage IDs: ("file", relpath, first line, last line) or ("doc", session, doc_id, first line, last line)
+PassageId = Tuple
+
+def split_passages(lines: List[str], size: int) -> List[Tuple[int, int]]:
+    """
+    Group lines into passages of about ``size`` lines, ending them at blank lines
+    where possible. Returns 1-based inclusive (first, last) line ranges.
+    """
+    passages, start = [], 0
+    for i, line in enumerate(lines):
+        length = i - start + 1
+        if (length >= size and not line.strip()) or length >= 2 * size:
+            passages.append((start + 1, i + 1))
+            start = i + 1
+    if start < len(lines):
+        passages.append((start + 1, len(lines)))
+    return passages
+
+class WorkspaceIndex:
+    """
+    BM25 index over passages of the text files in the working directory and of the
+    documents fetched in each session. All passages share one index, so their
+    scores are comparable; a search only returns file passages and those of the
+    current session's documents. Files are re-indexed when their modification
+    time or size changes; only their passages are replaced. A session's document
+    passages are dropped when the session ends.
+    """
+
+    def __init__(self, root: str = WORKING_DIRECTORY, passage_lines: int = WORKSPACE_SEARCH_PASSAGE_LINES):
+        self.root = root
+        self.passage_lines = passage_lines
+        self.max_file_bytes = int(WORKSPACE_SEARCH_MAX_FILE_MB * 1024 * 1024)
+        self.index = BM25Index()
+        # relpath -> (mtime, size, passage IDs)
+        self._files: Dict[str, Tuple[int, int, List[PassageId]]] = {}
+        # session -> doc IDs already indexed, and their passage IDs
+        self._documents: Dict[str, Set[str]] = {}
+        self._document_passages: Dict[str, List[PassageId]] = {}
+        self._text: Dict[PassageId, str] = {}
+        self._lock = threading.Lock()
+
+    def _read_lines(self, path: str, size: int) -> List[str]:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            if path.lower().endswith(TABLE_EXTENSIONS):
+                return [f.readline().rstrip("\n")]
+            if size > self.max_file_bytes:
+                return []
+            return f.read().splitlines()
+
+    def _add_passages(self, prefix: Tuple, lines: List[str], label: str) -> List[PassageId]:
+        ids = []
+        for first, last in split_passages(lines, self.passage_lines):
+            text = "\n".join(lines[first - 1:last])
+            if not text.strip():
+                continue
+            passage_id = prefix + (first, last)
+            self.index.add(passage_id, f"{label}\n{text}")
+            self._text[passage_id] = text
+            ids.append(passage_id)
+        return ids
+
+    def _drop(self, passage_ids: List[PassageId]) -> None:
+        for passage_id in passage_ids:
+            self.index.remove(passage_id)
+            self._text.pop(passage_id, None)
+
+    def refresh(self) -> int:
+        """Index new and changed files and drop deleted ones. Returns the number of files (re)indexed."""
+        updated, seen = 0, set()
+        for root, dirs, names in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+            for name in names:
+                if not name.lower().endswith(TEXT_EXTENSIONS + TABLE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, self.root)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(relpath)
+                known = self._files.get(relpath)
+                if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                if known:
+                    self._drop(known[2])
+                try:
+                    lines = self._read_lines(path, stat.st_size)
+                except OSError:
+                    continue
+                ids = self._add_passages(("file", relpath), lines, relpath)
+                self._files[relpath] = (stat.st_mtime_ns, stat.st_size, ids)
+                updated += 1
+        for relpath in set(self._files) - seen:
+            self._drop(self._files.pop(relpath)[2])
+        return updated
+
+    def refresh_documents(self, session: str) -> None:
+        """Index the documents fetched in the current session that are not indexed yet."""
+        indexed = self._documents.setdefault(session, set())
+        passages = self._document_passages.setdefault(session, [])
+        for document in document_store.documents():
+            if document.doc_id in indexed:
+                continue
+            label = f"{document.title} {document.doc_id}"
+            passages.extend(self._add_passages(("doc", session, document.doc_id), document.text.splitlines(), label))
+            indexed.add(document.doc_id)
+
+    def end_session(self, session: str) -> None:
+        """Drop the passages of a session's documents."""
+        with self._lock:
+            self._documents.pop(session, None)
+            self._drop(self._document_passages.pop(session, []))
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float, str]]:
+        """
+        Return up to ``k`` (reference, score, passage) results, where reference is
+        'path:first-last' for files or 'doc-N:first-last' for stored documents.
+        """
+        session = get_thread_id()
+        with self._lock:
+            updated = self.refresh()
+            self.refresh_documents(session)
+            if updated:
+                logger.info(f"Workspace index updated {updated} files")
+            hits = self.index.search(query, k, accept=lambda passage_id: passage_id[0] == "file" or passage_id[1] == session)
+            results = []
+            for passage_id, score in hits:
+                if passage_id[0] == "doc":
+                    _, _, doc_id, first, last = passage_id
+                    reference = f"{doc_id}:{first}-{last}"
+                else:
+                    _, relpath, first, last = passage_id
+                    reference = f"{relpath}:{first}-{last}"
+                results.append((reference, score, self._text[passage_id]))
+            return results
+
+workspace_index = WorkspaceIndex()
+
+@offload_blocking
+@tool
+def search_workspace(
+    query: Annotated[str, "Keywords to search for"],
+    k: Annotated[int, "Number of passages to return"] = 5
+) -> str:
+    """
+    Search the text files in the working directory (reports, notes, code, CSV headers)
+    and the sources fetched in this session. Returns the best matching passages with
+    file and line references, so only the relevant lines need to be read.
+    """
+    try:
+        results = workspace_index.search(query, max(1, min(k, 20)))
+        if not results:
+            return f"No passages found for: {query}"
+        return "\n\n".join(
+            f"--- {reference} (score {score:.2f}) ---\n{text[:MAX_PASSAGE_CHARS]}" for reference, score, text in results
+        )
+    except Exception as e:
+        logger.error(f"Error searching workspace: {str(e)}")
+        return f"Error searching workspace: {str(e)}"